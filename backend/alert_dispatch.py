@@ -0,0 +1,205 @@
+"""
+Multi-channel alert dispatch: one incident, every channel at once.
+
+/alerts/dispatch sends an incident to SMS (TextBee), Telegram and n8n
+concurrently, so notifying everyone takes as long as the slowest channel
+rather than the sum of them. Results are yielded per channel as each one
+finishes (the route streams them as NDJSON).
+
+Each channel has its own concurrency cap (ULINZI_DISPATCH_*_CONCURRENCY),
+so a burst of alerts can't open unbounded connections to one provider.
+When a channel is saturated, waiting sends are served by priority
+(CRITICAL before HIGH before MEDIUM before LOW), then in arrival order.
+
+Sends that have started are not cancelled if the client disconnects; the
+alert still goes out.
+
+Geofence enter/exit events on alerting zones (ULINZI_GEOFENCE_ALERT_KINDS)
+are dispatched the same way, one alert per telemetry batch, to the
+recipients configured in the environment.
+"""
+import time
+import heapq
+import asyncio
+import itertools
+from datetime import datetime
+from contextlib import asynccontextmanager
+
+from . import logic
+from . import metrics
+from . import startup
+from .models import AlertDispatchRequest
+from .config import DISPATCH_LIMITS, TEXTBEE_API_KEY, TEXTBEE_DEVICE_ID, TELEGRAM_BOT_TOKEN
+from .config import GEOFENCE_ALERT_KINDS, GEOFENCE_ALERT_PHONES, GEOFENCE_ALERT_CHAT_IDS, GEOFENCE_ALERT_WEBHOOK
+
+PRIORITIES = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3}
+DEFAULT_PRIORITY = PRIORITIES["MEDIUM"]
+
+class PriorityLimiter:
+    """A semaphore whose waiters are woken lowest priority number first."""
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+
+    async def acquire(self, priority):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # the slot was handed to us just as we were cancelled
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():  # skip waiters that were cancelled
+                fut.set_result(None)  # the slot passes straight to the next waiter
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def describe(self):
+        return {"limit": self.limit, "active": self.active, "waiting": sum(not f.done() for _, _, f in self._waiters)}
+
+# Limiters live on the app's event loop; all requests share them
+limiters = {channel: PriorityLimiter(limit) for channel, limit in DISPATCH_LIMITS.items()}
+
+# Running sends, referenced so they finish even if the client stops reading
+_running = set()
+
+# --- Channels ---
+async def _send_sms(req):
+    return await logic.send_alert_sms(req.textbee_api_key, req.textbee_device_id, req.phones, req.message)
+
+async def _send_telegram(req):
+    telegram_bot = await startup.aload("backend.telegram_bot")
+    return await telegram_bot.send_telegram_to_multiple(
+        bot_token=req.bot_token,
+        chat_ids=req.chat_ids,
+        message=req.message,
+        region=req.region,
+        threat_level=req.threat_level,
+        timestamp=req.timestamp,
+    )
+
+async def _send_n8n(req):
+    data = {**req.data, "region": req.region, "threat_level": req.threat_level, "timestamp": req.timestamp}
+    return await logic.trigger_n8n_webhook(req.webhook_url, {"message": req.message, "data": data})
+
+def channels(req):
+    """{channel: (send, recipients)} for the channels the request has recipients for."""
+    selected = {}
+    if req.phones:
+        selected["sms"] = (_send_sms, len(req.phones))
+    if req.bot_token and req.chat_ids:
+        selected["telegram"] = (_send_telegram, len(req.chat_ids))
+    if req.webhook_url:
+        selected["n8n"] = (_send_n8n, 1)
+    return selected
+
+def priority_of(req):
+    if req.priority is not None:
+        return req.priority
+    return PRIORITIES.get(req.threat_level.upper(), DEFAULT_PRIORITY)
+
+async def _send(channel, send, recipients, req, priority, started):
+    queued = time.perf_counter()
+    async with limiters[channel].slot(priority):
+        t0 = time.perf_counter()
+        try:
+            ok, detail = await send(req)
+        except Exception as e:
+            ok, detail = False, f"Error: {str(e)}"
+        sent = time.perf_counter()
+    metrics.ALERT_DISPATCH.inc(channel, "success" if ok else "error")
+    return {
+        "event": "result",
+        "channel": channel,
+        "ok": ok,
+        "detail": detail,
+        "recipients": recipients,
+        "queued_ms": round((t0 - queued) * 1000, 1),
+        "send_ms": round((sent - t0) * 1000, 1),
+        "elapsed_ms": round((sent - started) * 1000, 1),
+    }
+
+async def dispatch(req):
+    """
+    Sends `req` on every selected channel concurrently. Yields an
+    "accepted" event, then one "result" per channel in completion order,
+    then "done".
+    """
+    started = time.perf_counter()
+    priority = priority_of(req)
+    selected = channels(req)
+    yield {"event": "accepted", "channels": list(selected), "priority": priority}
+
+    tasks = []
+    for channel, (send, recipients) in selected.items():
+        task = asyncio.ensure_future(_send(channel, send, recipients, req, priority, started))
+        _running.add(task)
+        task.add_done_callback(_running.discard)
+        tasks.append(task)
+
+    sent, failed = [], []
+    for finished in asyncio.as_completed(tasks):
+        result = await finished
+        (sent if result["ok"] else failed).append(result["channel"])
+        yield result
+    yield {"event": "done", "sent": sent, "failed": failed,
+           "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+async def send(req):
+    """Dispatches `req` without a client reading the results."""
+    async for _ in dispatch(req):
+        pass
+
+# --- Geofence alerts ---
+def geofence_request(events):
+    """
+    One alert for a batch's events on alerting zones, or None when there are
+    none or no channel is configured.
+    """
+    events = [e for e in events if e["zone_kind"] in GEOFENCE_ALERT_KINDS]
+    if not events:
+        return None
+    by_zone = {}
+    for e in events:
+        by_zone.setdefault((e["type"], e["zone_kind"], e["zone"]), []).append(e["animal"])
+    lines = []
+    for (kind, zone_kind, zone), animals in by_zone.items():
+        shown = ", ".join(map(str, animals[:5])) + (f" +{len(animals) - 5} more" if len(animals) > 5 else "")
+        lines.append(f"{len(animals)} animal(s) {'entered' if kind == 'enter' else 'left'} {zone_kind} {zone}: {shown}")
+    regions = sorted({str(e["animal"]).split(":", 1)[0] for e in events})
+    stamp = events[0]["timestamp"]
+    req = AlertDispatchRequest(
+        message="🚧 Geofence alert\n" + "\n".join(lines),
+        region=", ".join(regions),
+        threat_level="HIGH",
+        timestamp=datetime.fromtimestamp(stamp).isoformat(timespec="seconds") if stamp else "",
+        phones=GEOFENCE_ALERT_PHONES,
+        textbee_api_key=TEXTBEE_API_KEY,
+        textbee_device_id=TEXTBEE_DEVICE_ID,
+        bot_token=TELEGRAM_BOT_TOKEN,
+        chat_ids=GEOFENCE_ALERT_CHAT_IDS,
+        webhook_url=GEOFENCE_ALERT_WEBHOOK,
+        data={"geofence_events": events[:100]},
+    )
+    return req if channels(req) else None
+
+def describe():
+    return {channel: limiter.describe() for channel, limiter in limiters.items()}
@@ -0,0 +1,152 @@
+"""
+Request coalescing (single-flight) with a short-TTL response cache.
+
+When several operators open the same region, identical requests arrive
+together. A Coalescer runs the first one (the leader); identical requests
+that arrive while it runs wait for its result instead of recomputing it,
+and the result is then kept for `ttl` seconds in a bounded LRU. Errors
+are shared with the waiting requests but never cached.
+
+call() is for code running on threads; acall() is the same for async
+routes, where waiting requests await the leader instead of blocking a
+thread.
+
+Results are shared between callers, so they must not be mutated.
+"""
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from . import metrics
+
+def make_key(*parts):
+    """Stable key for JSON-like request parameters (dict order doesn't matter)."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(blob.encode(), digest_size=16).hexdigest()
+
+def frame_key(df, *parts):
+    """Key for a DataFrame payload: vectorised row hashes instead of serialising every row."""
+    import pandas as pd
+    try:
+        rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    except TypeError:
+        # Unhashable cells (list/dict fields): serialise the rows instead
+        return make_key(df.to_dict("records"), list(df.columns), *parts)
+    digest = hashlib.blake2b(rows.tobytes(), digest_size=16)
+    digest.update(make_key(list(df.columns), *parts).encode())
+    return digest.hexdigest()
+
+class Coalescer:
+    def __init__(self, name, ttl=5.0, maxsize=256, enabled=True):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self._cache = OrderedDict()  # key -> (expires_at, result)
+        self._inflight = {}  # key -> Future of the leader's result
+        self._ainflight = {}  # key -> asyncio.Future, for acall() (one event loop)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def _count(self, result):
+        self.stats[{"hit": "hits", "miss": "misses", "coalesced": "coalesced"}[result]] += 1
+        metrics.RESPONSE_CACHE_REQUESTS.inc(self.name, result)
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            try:
+                self._cache.move_to_end(key)
+            except KeyError:
+                pass  # evicted meanwhile; the entry we hold is still valid
+            return True, entry[1]
+        return False, None
+
+    def call(self, key, compute):
+        """Returns compute()'s result for `key`, shared with identical concurrent or recent calls."""
+        if not self.enabled:
+            return compute()
+        found, result = self._cached(key)
+        if found:
+            self._count("hit")
+            return result
+
+        with self._lock:
+            found, result = self._cached(key)  # the leader may have just finished
+            flight = self._inflight.get(key)
+            leader = not found and flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+        if found:
+            self._count("hit")
+            return result
+        if not leader:
+            self._count("coalesced")
+            return flight.result()
+
+        self._count("miss")
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            flight.set_exception(e)
+            raise
+        with self._lock:
+            if self.ttl > 0:
+                self._cache[key] = (time.monotonic() + self.ttl, result)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+            del self._inflight[key]
+        flight.set_result(result)
+        return result
+
+    async def acall(self, key, compute):
+        """Async call(): `compute` is a zero-argument coroutine function."""
+        if not self.enabled:
+            return await compute()
+        found, result = self._cached(key)
+        if found:
+            self._count("hit")
+            return result
+        flight = self._ainflight.get(key)
+        if flight is not None:
+            self._count("coalesced")
+            return await asyncio.shield(flight)  # a waiter giving up doesn't cancel the leader
+
+        flight = self._ainflight[key] = asyncio.get_running_loop().create_future()
+        self._count("miss")
+        try:
+            result = await compute()
+        except BaseException as e:
+            del self._ainflight[key]
+            flight.set_exception(e)
+            flight.exception()  # retrieved: no "never retrieved" warning when nobody waited
+            raise
+        with self._lock:
+            if self.ttl > 0:
+                self._cache[key] = (time.monotonic() + self.ttl, result)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        del self._ainflight[key]
+        flight.set_result(result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def describe(self):
+        calls = sum(self.stats.values())
+        return {
+            "enabled": self.enabled,
+            "ttl_s": self.ttl,
+            "cached": len(self._cache),
+            "in_flight": len(self._inflight) + len(self._ainflight),
+            **self.stats,
+            "computed_share": round(self.stats["misses"] / calls, 4) if calls else None,
+        }
@@ -15,6 +15,87 @@ TEXTBEE_DEVICE_ID = os.getenv("TEXTBEE_DEVICE_ID", "")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
 
+# Provider endpoints (override to point the backend at local stand-ins, e.g. load_test.py)
+TEXTBEE_BASE_URL = os.getenv("TEXTBEE_BASE_URL", "https://api.textbee.dev/api/v1").rstrip("/")
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org/bot")
+# Outbound provider calls share one async HTTP client per process (see http_client.py)
+PROVIDER_TIMEOUT = float(os.getenv("ULINZI_PROVIDER_TIMEOUT", "30"))
+PROVIDER_MAX_CONNECTIONS = int(os.getenv("ULINZI_PROVIDER_MAX_CONNECTIONS", "100"))
+# Concurrent sends per channel for /alerts/dispatch (see alert_dispatch.py)
+DISPATCH_LIMITS = {
+    "sms": int(os.getenv("ULINZI_DISPATCH_SMS_CONCURRENCY", "4")),
+    "telegram": int(os.getenv("ULINZI_DISPATCH_TELEGRAM_CONCURRENCY", "8")),
+    "n8n": int(os.getenv("ULINZI_DISPATCH_N8N_CONCURRENCY", "4")),
+}
+# Threads for CPU-bound model work (scoring, forecasts), separate from the route threadpool.
+# At least 4 even on small boxes: numpy/torch release the GIL, and one slow batch shouldn't queue the rest
+MODEL_WORKERS = int(os.getenv("ULINZI_MODEL_WORKERS", str(max(4, min(8, os.cpu_count() or 4)))))
+# Threads for long jobs (LSTM training, tuning), so they never occupy the scoring threads
+TRAIN_WORKERS = int(os.getenv("ULINZI_TRAIN_WORKERS", "2"))
+
+# On-demand request profiling (see profiling.py). Profiling is off unless an
+# admin token is set and sent in X-Ulinzi-Profile, or a sample rate is given.
+ULINZI_ADMIN_TOKEN = os.getenv("ULINZI_ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("ULINZI_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_KEEP = int(os.getenv("ULINZI_PROFILE_KEEP", "20"))
+PROFILE_INTERVAL_MS = float(os.getenv("ULINZI_PROFILE_INTERVAL_MS", "5"))
+
+# Cattle anomaly model: "batch" (IsolationForest), "streaming" (Half-Space
+# Trees, keeps learning) or "both" (a point is a threat if either flags it)
+ANOMALY_MODEL = os.getenv("ULINZI_ANOMALY_MODEL", "both").lower()
+STATE_DIR = os.getenv("ULINZI_STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "state"))
+STREAM_CHECKPOINT_EVERY = int(os.getenv("ULINZI_STREAM_CHECKPOINT_EVERY", "500"))
+# Trained models shared by all workers, memory-mapped (see model_store.py)
+MODEL_DIR = os.getenv("ULINZI_MODEL_DIR", os.path.join(STATE_DIR, "models"))
+# LSTM hyperparameter search (see lstm_tuning.py); best configs are kept per location
+TUNE_DIR = os.getenv("ULINZI_TUNE_DIR", os.path.join(STATE_DIR, "lstm_tuning"))
+TUNE_WORKERS = int(os.getenv("ULINZI_TUNE_WORKERS", str(min(4, os.cpu_count() or 1))))
+TUNE_TRIALS = int(os.getenv("ULINZI_TUNE_TRIALS", "12"))
+TUNE_MAX_EPOCHS = int(os.getenv("ULINZI_TUNE_MAX_EPOCHS", "90"))
+
+# Monitored regions and their centre (lat, lon). Each gets its own anomaly model.
+REGIONS = {
+    "West Pokot": (1.433, 35.115),
+    "Turkana": (3.116, 35.600),
+    "Baringo": (0.669, 35.953),
+    "Samburu": (1.204, 36.926),
+}
+REGION_MODEL_CACHE_SIZE = int(os.getenv("ULINZI_REGION_MODEL_CACHE_SIZE", "32"))
+
+# Raid rules (see rules.py); edits are picked up without a restart
+RULES_PATH = os.getenv("ULINZI_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json"))
+
+# Geofence layers: every *.geojson in this directory (see geofence.py)
+GEOFENCE_DIR = os.getenv("ULINZI_GEOFENCE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "geofences"))
+# Membership is forgotten for animals silent GEOFENCE_ANIMAL_TTL seconds, and
+# beyond GEOFENCE_MAX_ANIMALS tracked the least recently seen go first
+GEOFENCE_MAX_ANIMALS = int(os.getenv("ULINZI_GEOFENCE_MAX_ANIMALS", "200000"))
+GEOFENCE_ANIMAL_TTL = float(os.getenv("ULINZI_GEOFENCE_ANIMAL_TTL", "86400"))
+# Enter/exit events on zones of these kinds are sent through alert dispatch
+# to whichever channels are configured (SMS phones, Telegram chats, n8n webhook)
+GEOFENCE_ALERT_KINDS = [k.strip() for k in os.getenv("ULINZI_GEOFENCE_ALERT_KINDS", "raid_corridor,border").split(",") if k.strip()]
+GEOFENCE_ALERT_PHONES = [p.strip() for p in os.getenv("ULINZI_GEOFENCE_ALERT_PHONES", "").split(",") if p.strip()]
+GEOFENCE_ALERT_CHAT_IDS = [c.strip() for c in os.getenv("ULINZI_GEOFENCE_ALERT_CHAT_IDS", TELEGRAM_CHAT_ID).split(",") if c.strip()]
+GEOFENCE_ALERT_WEBHOOK = os.getenv("ULINZI_GEOFENCE_ALERT_WEBHOOK", "")
+
+# Telemetry recording for replay.py (off unless a directory is given)
+RECORD_DIR = os.getenv("ULINZI_RECORD_DIR", "")
+
+# Identical concurrent requests share one computation; results are reused
+# for RESPONSE_CACHE_TTL seconds (see coalescing.py). ULINZI_COALESCE=0 disables both.
+COALESCE = os.getenv("ULINZI_COALESCE", "1") != "0"
+RESPONSE_CACHE_TTL = float(os.getenv("ULINZI_RESPONSE_CACHE_TTL", "5"))
+RESPONSE_CACHE_SIZE = int(os.getenv("ULINZI_RESPONSE_CACHE_SIZE", "256"))
+
+# Live map decimation (see map_layers.py): at most MAP_MAX_POINTS raw points
+# per response; below MAP_RAW_ZOOM larger views come back as per-tile clusters
+MAP_MAX_POINTS = int(os.getenv("ULINZI_MAP_MAX_POINTS", "2000"))
+MAP_RAW_ZOOM = int(os.getenv("ULINZI_MAP_RAW_ZOOM", "15"))
+MAP_MAX_TILES = int(os.getenv("ULINZI_MAP_MAX_TILES", "64"))
+MAP_TILE_CACHE_SIZE = int(os.getenv("ULINZI_MAP_TILE_CACHE_SIZE", "4096"))
+# Rendered heatmap tiles kept in memory (see heatmap_tiles.py)
+HEATMAP_TILE_CACHE_SIZE = int(os.getenv("ULINZI_HEATMAP_TILE_CACHE_SIZE", "2048"))
+
 # Parse multiple chat IDs if provided
 TELEGRAM_CHAT_IDS = os.getenv("TELEGRAM_CHAT_IDS", TELEGRAM_CHAT_ID).split(",") if os.getenv("TELEGRAM_CHAT_IDS") or TELEGRAM_CHAT_ID else []
 TELEGRAM_CHAT_IDS = [cid.strip() for cid in TELEGRAM_CHAT_IDS if cid.strip()]
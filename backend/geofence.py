@@ -0,0 +1,286 @@
+"""
+Polygon geofences: county borders, grazing zones, raid corridors, watering
+points.
+
+Every GeoJSON file in the geofence directory is a layer (named after the
+file). Polygons are "prepared" once: their edges are flattened into numpy
+arrays and their bounding boxes are rasterised onto a grid, so a batch of
+fixes only ray-casts against polygons whose cells it falls in.
+
+The engine remembers which polygons each animal was inside (one bool row
+per animal), so every batch also yields enter/exit events by comparing the
+batch's rows before and after, with no per-animal Python loop. Events are
+handed to the engine's listeners (main.py forwards them to alert dispatch).
+
+Animals not seen for `animal_ttl` seconds are forgotten, and past
+`max_animals` the least recently seen go first; their rows are reused. A
+forgotten animal that reappears inside a zone gets a fresh "enter" event.
+"""
+import os
+import glob
+import json
+import time
+import threading
+import numpy as np
+from collections import deque
+
+KM_PER_DEG = 111.0
+_CELL_OFFSET = 1 << 21  # cell coordinates are shifted non-negative and packed into one int64
+
+def _cell_code(cx, cy):
+    return (cx + _CELL_OFFSET) * (1 << 22) + (cy + _CELL_OFFSET)
+
+def _sorted_unique(a):
+    # Sort-based; much faster than np.unique for the int64 keys used here
+    a = np.sort(a)
+    return a[np.r_[True, a[1:] != a[:-1]]] if len(a) else a
+
+class Layer:
+    def __init__(self, name, features):
+        self.name = name
+        self.features = features  # [{"name":..., "kind":..., "rings": [np.array (k, 2) lon/lat]}]
+
+    @classmethod
+    def from_geojson(cls, name, geojson):
+        features = []
+        for i, feature in enumerate(geojson.get("features", [])):
+            geometry = feature.get("geometry") or {}
+            props = feature.get("properties") or {}
+            if geometry.get("type") == "Polygon":
+                polygons = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            else:
+                continue
+            # Holes are just more rings: even-odd ray casting handles them
+            rings = [np.asarray(ring, dtype=float)[:, :2] for polygon in polygons for ring in polygon]
+            features.append({
+                "name": props.get("name", f"{name}-{i}"),
+                "kind": props.get("kind", name),
+                "properties": props,
+                "rings": rings,
+            })
+        return cls(name, features)
+
+class GeofenceIndex:
+    """Flattened edges + a grid over polygon bounding boxes."""
+    def __init__(self, layers, cell_deg=0.05):
+        self.layers = layers
+        self.cell_deg = cell_deg
+        self.polygons = []  # (layer name, feature)
+        edges, owners = [], []
+        for layer in layers:
+            for feature in layer.features:
+                pid = len(self.polygons)
+                self.polygons.append((layer.name, feature))
+                for ring in feature["rings"]:
+                    a = ring
+                    b = np.roll(ring, -1, axis=0)
+                    edges.append(np.hstack([a, b]))
+                    owners.append(np.full(len(ring), pid))
+        self.edges = np.vstack(edges) if edges else np.zeros((0, 4))
+        owners = np.concatenate(owners) if owners else np.zeros(0, dtype=int)
+        order = np.argsort(owners, kind="stable")
+        self.edges, owners = self.edges[order], owners[order]
+        self.edge_start = np.searchsorted(owners, np.arange(len(self.polygons) + 1))
+
+        self.bbox = np.array([
+            [min(r[:, 0].min() for r in f["rings"]), min(r[:, 1].min() for r in f["rings"]),
+             max(r[:, 0].max() for r in f["rings"]), max(r[:, 1].max() for r in f["rings"])]
+            for _, f in self.polygons
+        ]).reshape(-1, 4)
+
+        # cell code -> polygon ids whose bbox touches the cell
+        self.grid = {}
+        for pid, (x0, y0, x1, y1) in enumerate(self.bbox):
+            for cx in range(int(np.floor(x0 / cell_deg)), int(np.floor(x1 / cell_deg)) + 1):
+                for cy in range(int(np.floor(y0 / cell_deg)), int(np.floor(y1 / cell_deg)) + 1):
+                    self.grid.setdefault(_cell_code(cx, cy), []).append(pid)
+
+        self.layer_of = np.array([self.layer_names().index(name) for name, _ in self.polygons], dtype=int)
+
+    def layer_names(self):
+        return [layer.name for layer in self.layers]
+
+    def candidates(self, lon, lat):
+        """Yields (polygon id, indices of points in cells that polygon's bbox touches)."""
+        cx = np.floor(lon / self.cell_deg).astype(np.int64)
+        cy = np.floor(lat / self.cell_deg).astype(np.int64)
+        cells, inverse = np.unique(_cell_code(cx, cy), return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind="stable")
+        starts = np.searchsorted(inverse[order], np.arange(len(cells) + 1))
+        by_polygon = {}
+        for u, code in enumerate(cells.tolist()):
+            for pid in self.grid.get(code, ()):
+                by_polygon.setdefault(pid, []).append(order[starts[u]:starts[u + 1]])
+        for pid, chunks in by_polygon.items():
+            yield pid, np.concatenate(chunks)
+
+    def test(self, lon, lat, chunk=4_000_000):
+        """
+        Tests every candidate (point, polygon) pair. Returns four aligned
+        arrays: point index, polygon id, whether the point is inside, and its
+        distance (km) to the polygon's boundary.
+        """
+        pts, pids, inside, dist = [], [], [], []
+        for pid, idx in self.candidates(lon, lat):
+            e = self.edges[self.edge_start[pid]:self.edge_start[pid + 1]]
+            x1, y1, x2, y2 = (e[:, i][None, :] for i in range(4))
+            step = max(1, chunk // max(len(e), 1))
+            for s in range(0, len(idx), step):
+                sub = idx[s:s + step]
+                px, py = lon[sub][:, None], lat[sub][:, None]
+                # Even-odd ray casting towards +x
+                crosses = ((y1 > py) != (y2 > py)) & (
+                    px < (x2 - x1) * (py - y1) / np.where(y2 != y1, y2 - y1, 1e-12) + x1
+                )
+                # Point-to-segment distance in local km
+                kx = KM_PER_DEG * np.cos(np.radians(py))
+                ax, ay, bx, by = (x1 - px) * kx, (y1 - py) * KM_PER_DEG, (x2 - px) * kx, (y2 - py) * KM_PER_DEG
+                dx, dy = bx - ax, by - ay
+                t = np.clip(-(ax * dx + ay * dy) / np.where(dx * dx + dy * dy > 0, dx * dx + dy * dy, 1), 0, 1)
+                d = np.hypot(ax + t * dx, ay + t * dy).min(axis=1)
+                pts.append(sub)
+                pids.append(np.full(len(sub), pid))
+                inside.append(crosses.sum(axis=1) % 2 == 1)
+                dist.append(d)
+        if not pts:
+            empty = np.zeros(0, dtype=int)
+            return empty, empty, np.zeros(0, dtype=bool), np.zeros(0)
+        return np.concatenate(pts), np.concatenate(pids), np.concatenate(inside), np.concatenate(dist)
+
+class GeofenceEngine:
+    """
+    The prepared index plus per-animal membership state and a bounded log
+    of enter/exit events.
+    """
+    def __init__(self, directory, border_kinds=("border",), max_events=10_000,
+                 max_animals=200_000, animal_ttl=86_400, listeners=()):
+        self.directory = directory
+        self.border_kinds = set(border_kinds)
+        layers = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.geojson"))):
+            with open(path) as f:
+                layers.append(Layer.from_geojson(os.path.splitext(os.path.basename(path))[0], json.load(f)))
+        self.index = GeofenceIndex(layers)
+        self.is_border = np.array([f["kind"] in self.border_kinds for _, f in self.index.polygons], dtype=bool)
+        self.max_animals = max_animals
+        self.animal_ttl = animal_ttl
+        self.listeners = list(listeners)  # called with each batch's events
+        self._animals = {}  # animal key -> int
+        self._animal_keys = []  # int -> animal key (None once the row is freed)
+        self._free = []  # freed rows, reused before new ones
+        self._inside = np.zeros((1024, len(self.index.polygons)), dtype=bool)  # animal x polygon
+        self._last_seen = np.zeros(len(self._inside))  # monotonic seconds, per row
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+        self.events = deque(maxlen=max_events)
+        self.n_events = 0
+        self.n_evicted = 0
+
+    def _animal_index(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep > self.animal_ttl / 10:
+                self._last_sweep = now
+                self._evict(self._rows_where(self._last_seen < now - self.animal_ttl))
+            out = np.empty(len(keys), dtype=np.int64)
+            for i, key in enumerate(keys):
+                index = self._animals.get(key)
+                if index is None:
+                    if self._free:
+                        index = self._free.pop()
+                        self._animal_keys[index] = key
+                    else:
+                        index = len(self._animal_keys)
+                        self._animal_keys.append(key)
+                    self._animals[key] = index
+                out[i] = index
+            if len(self._animal_keys) > len(self._inside):
+                size = 2 * len(self._animal_keys)
+                grown = np.zeros((size, self._inside.shape[1]), dtype=bool)
+                grown[:len(self._inside)] = self._inside
+                self._inside = grown
+                self._last_seen = np.concatenate([self._last_seen, np.zeros(size - len(self._last_seen))])
+            self._last_seen[out] = now
+            excess = len(self._animals) - self.max_animals
+            if excess > 0:
+                # Least recently seen first; this batch's animals are the most recent
+                rows = self._rows_where(np.ones(len(self._last_seen), dtype=bool))
+                self._evict(rows[np.argsort(self._last_seen[rows], kind="stable")[:excess]])
+            return out
+
+    def _rows_where(self, mask):
+        """Rows in use (held by an animal) where `mask` is set."""
+        mask = mask[:len(self._animal_keys)].copy()
+        if self._free:
+            mask[self._free] = False
+        return np.flatnonzero(mask)
+
+    def _evict(self, rows):
+        for row in rows.tolist():
+            del self._animals[self._animal_keys[row]]
+            self._animal_keys[row] = None
+            self._free.append(row)
+        self._inside[rows] = False
+        self.n_evicted += len(rows)
+
+    def check(self, lon, lat, animal_keys=None, timestamp=None):
+        """
+        Tests a batch of fixes. Returns (columns, events): per-point columns
+        ("in_<layer>" 0/1 and "distance_to_border_km", NaN when no border
+        polygon is nearby) and the enter/exit events since each animal's
+        previous fix. Events need animal_keys.
+        """
+        lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+        n, n_poly = len(lon), len(self.index.polygons)
+        pts, pids, inside, dist = self.index.test(lon, lat)
+
+        columns = {}
+        for li, name in enumerate(self.index.layer_names()):
+            mask = inside & (self.index.layer_of[pids] == li)
+            columns[f"in_{name}"] = np.bincount(pts[mask], minlength=n).clip(max=1)
+        border = self.is_border[pids]
+        d = np.full(n, np.inf)
+        np.minimum.at(d, pts[border], dist[border])
+        columns["distance_to_border_km"] = np.where(np.isinf(d), np.nan, d)
+
+        events = []
+        if animal_keys is not None and n_poly:
+            animals = self._animal_index(animal_keys)
+            rows = _sorted_unique(animals)
+            slot = np.searchsorted(rows, animals)
+            point_of = np.empty(len(rows), dtype=np.int64)  # a point of each row, for its key
+            point_of[slot] = np.arange(len(animals))
+            # Membership of this batch's animals now, as rows aligned with `rows`
+            now = np.zeros((len(rows), n_poly), dtype=bool)
+            now[slot[pts[inside]], pids[inside]] = True
+            with self._lock:
+                before = self._inside[rows]
+                self._inside[rows] = now
+            for kind, changed in (("enter", now & ~before), ("exit", before & ~now)):
+                for r, pid in zip(*np.nonzero(changed)):
+                    layer, feature = self.index.polygons[pid]
+                    events.append({"type": kind, "animal": animal_keys[point_of[r]], "layer": layer,
+                                   "zone": feature["name"], "zone_kind": feature["kind"], "timestamp": timestamp})
+            with self._lock:
+                self.events.extend(events)
+                self.n_events += len(events)
+        if events:
+            for listener in self.listeners:
+                listener(events)
+        return columns, events
+
+    def recent_events(self, limit=100):
+        with self._lock:
+            return list(self.events)[-limit:]
+
+    def describe(self):
+        return {
+            "directory": self.directory,
+            "layers": {layer.name: [f["name"] for f in layer.features] for layer in self.index.layers},
+            "tracked_animals": len(self._animals),
+            "evicted_animals": self.n_evicted,
+            "events_total": self.n_events,
+        }
@@ -0,0 +1,270 @@
+"""
+Heatmap tiles (herd density, incident intensity) for the dashboard maps.
+
+Each layer keeps its points as sorted Morton (Z-order) codes of a fine
+web-mercator grid (level 22, ~10 m), one array per source. In Z-order every
+slippy-map tile z/x/y is one contiguous range of codes, so rendering a tile
+is a couple of searchsorted calls per source, a bincount into 256x256
+pixels, a Gaussian blur and a colour ramp.
+
+Rendered PNGs are kept in an LRU. When a source's points change, only the
+tiles containing changed points (and their neighbours, which the blur
+reaches into) are dropped, at every zoom level that has cached tiles; the
+rest of the map stays cached.
+
+Layers:
+- herd_density: latest positions of every source (replaced per batch)
+- incidents: every position flagged as a threat (accumulated). A batch
+  added again under the same batch key (a repeated or cached request for
+  the same telemetry) is counted once.
+"""
+import io
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from .map_layers import tile_coords
+
+TILE = 256
+RECENT_BATCHES = 1024  # batch keys remembered per source, for add()
+
+LAYERS = {
+    # name: colour ramp (t, RGBA), animals per blurred spot for full colour, grid level
+    "herd_density": {
+        "ramp": [(0.0, (0, 255, 65, 0)), (0.25, (0, 255, 65, 110)), (0.6, (255, 255, 0, 170)), (1.0, (255, 140, 0, 220))],
+        "saturation": 25,
+        "level": 22,
+    },
+    "incidents": {
+        "ramp": [(0.0, (255, 120, 0, 0)), (0.3, (255, 120, 0, 130)), (1.0, (255, 0, 0, 230))],
+        "saturation": 5,
+        "level": 20,  # coarser, so repeated detections merge into weighted cells
+    },
+}
+
+# --- Morton codes ---
+_M = [np.uint64(m) for m in (0x5555555555555555, 0x3333333333333333, 0x0F0F0F0F0F0F0F0F,
+                             0x00FF00FF00FF00FF, 0x0000FFFF0000FFFF, 0x00000000FFFFFFFF)]
+
+def _spread(v):
+    v = np.asarray(v).astype(np.uint64) & _M[5]
+    for shift, mask in ((16, _M[4]), (8, _M[3]), (4, _M[2]), (2, _M[1]), (1, _M[0])):
+        v = (v | (v << np.uint64(shift))) & mask
+    return v
+
+def _compact(v):
+    v = np.asarray(v).astype(np.uint64) & _M[0]
+    for shift, mask in ((1, _M[1]), (2, _M[2]), (4, _M[3]), (8, _M[4]), (16, _M[5])):
+        v = (v | (v >> np.uint64(shift))) & mask
+    return v.astype(np.int64)
+
+def morton(x, y):
+    return (_spread(x) | (_spread(y) << np.uint64(1))).astype(np.int64)
+
+def demorton(code):
+    code = np.asarray(code, dtype=np.int64).astype(np.uint64)
+    return _compact(code), _compact(code >> np.uint64(1))
+
+def _lut(ramp):
+    t = np.linspace(0, 1, 256)
+    stops = [s for s, _ in ramp]
+    return np.stack([np.interp(t, stops, [c[i] for _, c in ramp]) for i in range(4)], axis=1).astype(np.uint8)
+
+def _merge(codes, weights):
+    """Sorts codes and sums the weights of duplicates."""
+    order = np.argsort(codes, kind="stable")
+    codes, weights = codes[order], weights[order]
+    if not len(codes):
+        return codes, weights
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    return codes[starts], np.add.reduceat(weights, starts)
+
+class HeatLayer:
+    def __init__(self, name, ramp, saturation, level=22):
+        self.name = name
+        self.level = level
+        self.saturation = saturation
+        self.lut = _lut(ramp)
+        self.sources = {}  # source -> (sorted codes, weights)
+        self.batches = {}  # source -> OrderedDict of recently added batch keys
+        self.generation = 0
+
+    def encode(self, lon, lat):
+        fx, fy = tile_coords(lon, lat, self.level)
+        n = (1 << self.level) - 1
+        return morton(np.clip(fx, 0, n).astype(np.int64), np.clip(fy, 0, n).astype(np.int64))
+
+    def points(self):
+        return sum(len(codes) for codes, _ in self.sources.values())
+
+class HeatmapTiles:
+    def __init__(self, cache_size=2048, sigma_px=6.0, layers=LAYERS):
+        self.layers = {name: HeatLayer(name, **spec) for name, spec in layers.items()}
+        self.cache_size = cache_size
+        self.sigma_px = sigma_px
+        self.margin = int(np.ceil(3 * sigma_px))
+        self._tiles = OrderedDict()  # (layer, z, x, y) -> png bytes
+        self._cached = {}  # (layer, z) -> {(x, y)}, for invalidation
+        self._lock = threading.Lock()
+        self._empty = None
+        self.stats = {"hits": 0, "misses": 0, "invalidated": 0, "duplicate_batches": 0}
+
+    # --- Data ---
+    def replace(self, layer, source, lon, lat, weights=None):
+        """Replaces `source`'s points in `layer` (e.g. the latest positions of a herd)."""
+        heat = self.layers[layer]
+        codes = heat.encode(lon, lat)
+        w = np.ones(len(codes)) if weights is None else np.asarray(weights, dtype=float)
+        new = _merge(codes, w)
+        with self._lock:
+            old = heat.sources.get(source)
+            heat.sources[source] = new
+            heat.generation += 1
+            self._invalidate(heat, new[0])
+            if old is not None:
+                self._invalidate(heat, old[0])
+
+    def add(self, layer, source, lon, lat, weights=None, batch_key=None):
+        """
+        Adds points to `source` in `layer` (e.g. new incident positions).
+        With a batch_key, a batch that was already added is skipped. Returns
+        whether the points were added.
+        """
+        heat = self.layers[layer]
+        codes = heat.encode(lon, lat)
+        if not len(codes):
+            return False
+        w = np.ones(len(codes)) if weights is None else np.asarray(weights, dtype=float)
+        with self._lock:
+            if batch_key is not None:
+                seen = heat.batches.setdefault(source, OrderedDict())
+                if batch_key in seen:
+                    self.stats["duplicate_batches"] += 1
+                    return False
+                seen[batch_key] = True
+                if len(seen) > RECENT_BATCHES:
+                    seen.popitem(last=False)
+            old_codes, old_w = heat.sources.get(source, (np.zeros(0, dtype=np.int64), np.zeros(0)))
+            heat.sources[source] = _merge(np.concatenate([old_codes, codes]), np.concatenate([old_w, w]))
+            heat.generation += 1
+            self._invalidate(heat, np.sort(codes))
+        return True
+
+    def _invalidate(self, heat, codes):
+        """Drops cached tiles (and their neighbours) that contain any of `codes`. Needs self._lock."""
+        if not len(codes):
+            return
+        for (name, z), cached in list(self._cached.items()):
+            if name != heat.name or not cached:
+                continue
+            if z > heat.level:
+                drop = list(cached)  # finer than the grid; rare, so drop the whole zoom level
+            else:
+                shift = np.int64(2 * (heat.level - z))
+                tiles = codes >> shift  # codes are sorted, so are their tiles
+                tiles = tiles[np.r_[True, tiles[1:] != tiles[:-1]]]
+                tx, ty = demorton(tiles)
+                n = 1 << z
+                near = [morton(np.clip(tx + dx, 0, n - 1), np.clip(ty + dy, 0, n - 1))
+                        for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+                touched = np.concatenate(near)
+                keys = list(cached)
+                hit = np.isin(morton(np.array([k[0] for k in keys]), np.array([k[1] for k in keys])), touched)
+                drop = [k for k, h in zip(keys, hit) if h]
+            for x, y in drop:
+                self._tiles.pop((name, z, x, y), None)
+                cached.discard((x, y))
+            self.stats["invalidated"] += len(drop)
+
+    # --- Tiles ---
+    def tile(self, layer, z, x, y):
+        """PNG bytes of tile z/x/y of `layer`. Returns (png, cache hit)."""
+        heat = self.layers[layer]  # KeyError for unknown layers
+        key = (layer, z, x, y)
+        png = self._tiles.get(key)
+        if png is not None:
+            try:
+                self._tiles.move_to_end(key)
+            except KeyError:
+                pass
+            self.stats["hits"] += 1
+            return png, True
+
+        self.stats["misses"] += 1
+        generation = heat.generation
+        png = self._render(heat, z, x, y)
+        with self._lock:
+            if heat.generation == generation:  # no new data arrived while rendering
+                self._tiles[key] = png
+                self._cached.setdefault((layer, z), set()).add((x, y))
+                while len(self._tiles) > self.cache_size:
+                    (name, ez, ex, ey), _ = self._tiles.popitem(last=False)
+                    self._cached[(name, ez)].discard((ex, ey))
+        return png, False
+
+    def _pixels(self, heat, z, x, y):
+        """Pixel coordinates (relative to the tile, incl. margin) and weights of nearby points."""
+        n, m, level = 1 << z, self.margin, heat.level
+        pixel_level = z + 8
+        xs, ys, ws = [], [], []
+        for codes, weights in list(heat.sources.values()):
+            for nx in range(max(x - 1, 0), min(x + 1, n - 1) + 1):
+                for ny in range(max(y - 1, 0), min(y + 1, n - 1) + 1):
+                    if z <= level:
+                        shift = 2 * (level - z)
+                        prefix = int(morton(nx, ny)) << shift
+                        lo, hi = np.searchsorted(codes, [prefix, prefix + (1 << shift)])
+                    else:
+                        cell = int(morton(nx >> (z - level), ny >> (z - level)))
+                        lo, hi = np.searchsorted(codes, [cell, cell + 1])
+                    if hi > lo:
+                        gx, gy = demorton(codes[lo:hi])
+                        xs.append(gx)
+                        ys.append(gy)
+                        ws.append(weights[lo:hi])
+        if not xs:
+            return None
+        gx, gy, w = np.concatenate(xs), np.concatenate(ys), np.concatenate(ws)
+        if pixel_level >= level:
+            d = pixel_level - level
+            px, py = (gx << d) + (1 << d) // 2, (gy << d) + (1 << d) // 2
+        else:
+            px, py = gx >> (level - pixel_level), gy >> (level - pixel_level)
+        px, py = px - x * TILE + m, py - y * TILE + m
+        keep = (px >= 0) & (px < TILE + 2 * m) & (py >= 0) & (py < TILE + 2 * m)
+        return px[keep], py[keep], w[keep]
+
+    def _render(self, heat, z, x, y):
+        from PIL import Image  # deferred: only needed once tiles are requested
+        from scipy.ndimage import gaussian_filter
+
+        pixels = self._pixels(heat, z, x, y)
+        if pixels is None or not len(pixels[0]):
+            return self.empty_tile()
+        px, py, w = pixels
+        size = TILE + 2 * self.margin
+        grid = np.bincount(py * size + px, weights=w, minlength=size * size).reshape(size, size)
+        grid = gaussian_filter(grid, self.sigma_px, mode="constant")[self.margin:-self.margin, self.margin:-self.margin]
+        # A blurred spot of `saturation` animals reaches full colour, at every zoom
+        scale = heat.saturation / (2 * np.pi * self.sigma_px ** 2)
+        t = 1 - np.exp(-grid / scale)
+        rgba = heat.lut[(t * 255).astype(np.uint8)]
+        buf = io.BytesIO()
+        Image.fromarray(rgba, "RGBA").save(buf, format="PNG", compress_level=1)
+        return buf.getvalue()
+
+    def empty_tile(self):
+        if self._empty is None:
+            from PIL import Image
+            buf = io.BytesIO()
+            Image.new("RGBA", (TILE, TILE), (0, 0, 0, 0)).save(buf, format="PNG")
+            self._empty = buf.getvalue()
+        return self._empty
+
+    def describe(self):
+        return {
+            "layers": {name: {"sources": len(h.sources), "points": h.points(), "generation": h.generation}
+                       for name, h in self.layers.items()},
+            "cached_tiles": len(self._tiles),
+            **self.stats,
+        }
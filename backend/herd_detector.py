@@ -0,0 +1,148 @@
+"""
+Herd-level coordinated-movement detection.
+
+A single fast cow is usually a stray; many cows moving fast in the same
+direction is a raid. Animals are grouped into herds (by `herd_id` when the
+telemetry has one, otherwise by hashing positions onto a grid and joining
+touching cells), and each herd is summarised with bincount reductions, so
+one scoring cycle is O(n) however many herds there are:
+
+- heading_coherence: length of the mean heading vector of the moving
+  animals (1 = all the same way, ~0 = scattered)
+- centroid_speed_kmh: speed of the herd's centre of mass
+- dispersion_km / dispersion_rate_kmh: RMS spread around the centroid and
+  how fast it is changing (mean radial velocity; < 0 means bunching up)
+- fraction_moving: share of animals above MOVING_KMH
+"""
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+KM_PER_DEG = 111.0
+MOVING_KMH = 5.0
+
+# A herd is flagged when all of these hold
+MIN_ANIMALS = 5
+MIN_FRACTION_MOVING = 0.6
+MIN_COHERENCE = 0.8
+MIN_CENTROID_KMH = 5.0
+
+def to_km(lat, lon):
+    """Equirectangular projection around the batch's mean latitude (fine at herd scale)."""
+    lat0 = float(np.mean(lat)) if len(lat) else 0.0
+    return lon * KM_PER_DEG * np.cos(np.radians(lat0)), lat * KM_PER_DEG
+
+def assign_clusters(x_km, y_km, cell_km=0.5):
+    """
+    Grid hash + connected components: animals share a cluster id (0..k-1)
+    when their cell_km cells touch (8-neighbourhood), so a herd straddling a
+    cell border is not split, while herds separated by an empty cell are.
+    """
+    if len(x_km) == 0:
+        return np.zeros(0, dtype=np.int64)
+    ix = np.floor(x_km / cell_km).astype(np.int64)
+    iy = np.floor(y_km / cell_km).astype(np.int64)
+    ix -= ix.min()
+    iy -= iy.min() - 1  # rows start at 1 so iy - 1 never wraps into the previous column
+    width = int(iy.max()) + 2
+    cells, inverse = np.unique(ix * width + iy, return_inverse=True)
+
+    rows, cols = [np.arange(len(cells))], [np.arange(len(cells))]
+    for dx, dy in ((1, -1), (1, 0), (1, 1), (0, 1)):  # half the neighbourhood; edges are undirected
+        neighbour = cells + dx * width + dy
+        pos = np.searchsorted(cells, neighbour)
+        found = pos < len(cells)
+        found[found] = cells[pos[found]] == neighbour[found]
+        rows.append(np.flatnonzero(found))
+        cols.append(pos[found])
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    graph = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(len(cells), len(cells)))
+    _, labels = connected_components(graph, directed=False)
+    return labels[inverse.ravel()]
+
+def herd_stats(cluster, x_km, y_km, speed_kmh, heading_deg):
+    """Per-cluster statistics as a dict of arrays indexed by cluster id."""
+    k = int(cluster.max()) + 1 if len(cluster) else 0
+    count = np.bincount(cluster, minlength=k).astype(float)
+
+    theta = np.radians(heading_deg)
+    vx, vy = speed_kmh * np.sin(theta), speed_kmh * np.cos(theta)  # heading is clockwise from north
+    moving = (speed_kmh > MOVING_KMH).astype(float)
+    n_moving = np.bincount(cluster, moving, minlength=k)
+
+    sum_sin = np.bincount(cluster, moving * np.sin(theta), minlength=k)
+    sum_cos = np.bincount(cluster, moving * np.cos(theta), minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        coherence = np.where(n_moving > 0, np.hypot(sum_sin, sum_cos) / n_moving, 0.0)
+
+    cx = np.bincount(cluster, x_km, minlength=k) / count
+    cy = np.bincount(cluster, y_km, minlength=k) / count
+    cvx = np.bincount(cluster, vx, minlength=k) / count
+    cvy = np.bincount(cluster, vy, minlength=k) / count
+
+    dx, dy = x_km - cx[cluster], y_km - cy[cluster]
+    r = np.hypot(dx, dy)
+    dispersion = np.sqrt(np.bincount(cluster, r ** 2, minlength=k) / count)
+    # Velocity relative to the herd, projected onto the direction away from the centroid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        radial = np.where(r > 0, ((vx - cvx[cluster]) * dx + (vy - cvy[cluster]) * dy) / r, 0.0)
+    dispersion_rate = np.bincount(cluster, radial, minlength=k) / count
+
+    stats = {
+        "count": count.astype(int),
+        "centroid_x_km": cx,
+        "centroid_y_km": cy,
+        "heading_coherence": coherence,
+        "centroid_speed_kmh": np.hypot(cvx, cvy),
+        "centroid_heading_deg": np.degrees(np.arctan2(cvx, cvy)) % 360,
+        "dispersion_km": dispersion,
+        "dispersion_rate_kmh": dispersion_rate,
+        "fraction_moving": n_moving / count,
+    }
+    stats["coordinated"] = (
+        (count >= MIN_ANIMALS)
+        & (stats["fraction_moving"] >= MIN_FRACTION_MOVING)
+        & (coherence >= MIN_COHERENCE)
+        & (stats["centroid_speed_kmh"] >= MIN_CENTROID_KMH)
+    )
+    return stats
+
+def analyze(df, cell_km=0.5):
+    """
+    Groups a telemetry batch into herds and scores them.
+    Returns (cluster id per animal, per-herd stats).
+    """
+    lat, lon = df["lat"].to_numpy(float), df["lon"].to_numpy(float)
+    x_km, y_km = to_km(lat, lon)
+    if "herd_id" in df:
+        _, cluster = np.unique(df["herd_id"].astype(str).to_numpy(), return_inverse=True)
+        cluster = cluster.ravel()
+    else:
+        cluster = assign_clusters(x_km, y_km, cell_km)
+    heading = df["heading_deg"].to_numpy(float) if "heading_deg" in df else np.zeros(len(df))
+    stats = herd_stats(cluster, x_km, y_km, df["speed_kmh"].to_numpy(float), heading)
+    stats["lat"] = np.bincount(cluster, lat) / stats["count"]
+    stats["lon"] = np.bincount(cluster, lon) / stats["count"]
+    return cluster, stats
+
+def animal_columns(cluster, stats):
+    """Herd statistics broadcast back to each animal, for the rule engine."""
+    return {
+        "heading_coherence": stats["heading_coherence"][cluster],
+        "herd_fraction_moving": stats["fraction_moving"][cluster],
+        "herd_speed_kmh": stats["centroid_speed_kmh"][cluster],
+        "herd_size": stats["count"][cluster],
+    }
+
+def herd_records(stats):
+    """Per-herd stats as JSON-friendly records."""
+    skip = ("centroid_x_km", "centroid_y_km")
+    columns = {k: v for k, v in stats.items() if k not in skip}
+    columns["count"] = columns["count"].tolist()
+    columns["coordinated"] = columns["coordinated"].tolist()
+    for k in columns:
+        if k in ("lat", "lon"):
+            columns[k] = np.round(columns[k], 6).tolist()
+        elif k not in ("count", "coordinated"):
+            columns[k] = np.round(columns[k], 4).tolist()
+    return [{"herd": i, **{k: v[i] for k, v in columns.items()}} for i in range(len(stats["count"]))]
@@ -0,0 +1,53 @@
+"""
+One shared httpx.AsyncClient for outbound provider calls (TextBee, n8n).
+
+Created on first use (importing httpx and the SSL setup run on a worker
+thread, not the event loop) and closed at shutdown. Connections are pooled
+and kept alive, and a slow provider only holds an awaiting coroutine, not a
+threadpool thread.
+"""
+import time
+import asyncio
+
+from .config import PROVIDER_TIMEOUT, PROVIDER_MAX_CONNECTIONS
+from .metrics import observe_provider
+from .startup import ensure_ssl
+
+_client = None
+
+def _new_client():
+    import httpx  # deferred: keeps backend startup light
+    ensure_ssl()  # before the client builds its SSL context
+    return httpx.AsyncClient(
+        timeout=PROVIDER_TIMEOUT,
+        limits=httpx.Limits(max_connections=PROVIDER_MAX_CONNECTIONS,
+                            max_keepalive_connections=PROVIDER_MAX_CONNECTIONS // 4),
+    )
+
+async def get_client():
+    global _client
+    if _client is None:
+        client = await asyncio.to_thread(_new_client)
+        if _client is None:
+            _client = client
+        else:
+            await client.aclose()  # another request created one meanwhile
+    return _client
+
+async def provider_request(provider, method, url, **kwargs):
+    """An async request on the shared client, timed into the provider latency/error metrics."""
+    t0 = time.perf_counter()
+    try:
+        client = await get_client()
+        response = await client.request(method, url, **kwargs)
+    except Exception:
+        observe_provider(provider, time.perf_counter() - t0, ok=False)
+        raise
+    observe_provider(provider, time.perf_counter() - t0, ok=response.status_code < 400)
+    return response
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,15 +1,15 @@
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest
-import requests
 from datetime import datetime
 
+from .config import TEXTBEE_BASE_URL
+from .http_client import provider_request
+
 # --- SMS CONFIGURATION (TextBee) ---
-def send_alert_sms(api_key, device_id, recipients, message):
+async def send_alert_sms(api_key, device_id, recipients, message):
     if not api_key or not device_id:
         return False, "Missing API Key or Device ID"
 
-    url = f"https://api.textbee.dev/api/v1/gateway/devices/{device_id}/send-sms"
+    url = f"{TEXTBEE_BASE_URL}/gateway/devices/{device_id}/send-sms"
     
     headers = {
         "x-api-key": api_key,
@@ -27,7 +27,7 @@ def send_alert_sms(api_key, device_id, recipients, message):
     }
     
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = await provider_request("textbee", "POST", url, json=payload, headers=headers)
         if response.status_code == 200 or response.status_code == 201:
             return True, response.json()
         else:
@@ -35,15 +35,15 @@ def send_alert_sms(api_key, device_id, recipients, message):
     except Exception as e:
         return False, str(e)
 
-def check_for_sms_reply(api_key, device_id, sender_phone, min_timestamp=None):
+async def check_for_sms_reply(api_key, device_id, sender_phone, min_timestamp=None):
     if not api_key or not device_id:
         return False, "Missing Credentials", None
         
-    url = f"https://api.textbee.dev/api/v1/gateway/devices/{device_id}/get-received-sms"
+    url = f"{TEXTBEE_BASE_URL}/gateway/devices/{device_id}/get-received-sms"
     headers = {"x-api-key": api_key}
     
     try:
-        response = requests.get(url, headers=headers)
+        response = await provider_request("textbee", "GET", url, headers=headers)
         if response.status_code == 200:
             data = response.json()
             messages = data.get('data', [])
@@ -91,6 +91,7 @@ def check_for_sms_reply(api_key, device_id, sender_phone, min_timestamp=None):
 
 # --- 1. THE DATA SIMULATOR (Generating the Identity) ---
 def get_cattle_data(mode="Normal", num_cows=50, center_lat=1.433, center_lon=35.115):
+    import pandas as pd  # deferred: keeps backend startup light
     # Use dynamic center coordinates
     base_lat = center_lat
     base_lon = center_lon
@@ -100,6 +101,7 @@ def get_cattle_data(mode="Normal", num_cows=50, center_lat=1.433, center_lon=35.
         lat_noise = np.random.normal(0, 0.002, num_cows)
         lon_noise = np.random.normal(0, 0.002, num_cows)
         speed = np.random.uniform(0.5, 3.0, num_cows) # km/h
+        heading = np.random.uniform(0, 360, num_cows) # Wandering in every direction
         hour = 14 # 2:00 PM
         
     else: # RAID MODE
@@ -108,12 +110,14 @@ def get_cattle_data(mode="Normal", num_cows=50, center_lat=1.433, center_lon=35.
         lat_noise = np.random.normal(0.02, 0.005, num_cows) # Shifted location
         lon_noise = np.random.normal(0.02, 0.005, num_cows)
         speed = np.random.uniform(12.0, 18.0, num_cows) # Fast running
+        heading = np.random.normal(45, 12, num_cows) % 360 # Driven together, north-east
         hour = 2 # 2:00 AM
     
     df = pd.DataFrame({
         'lat': base_lat + lat_noise,
         'lon': base_lon + lon_noise,
         'speed_kmh': speed,
+        'heading_deg': heading,
         'hour_of_day': [hour] * num_cows,
         'id': range(num_cows)
     })
@@ -121,6 +125,7 @@ def get_cattle_data(mode="Normal", num_cows=50, center_lat=1.433, center_lon=35.
 
 # --- 2. THE AI MODEL (The Brain) ---
 def train_isolation_forest():
+    from sklearn.ensemble import IsolationForest  # deferred: keeps backend startup light
     # Train on "Normal" grazing patterns
     # Features: Speed and Hour of Day (Simple Identity Signature)
     normal_data = get_cattle_data("Normal", num_cows=500, center_lat=0, center_lon=0) # Lat/Lon don't matter for training
@@ -131,17 +136,34 @@ def train_isolation_forest():
     model.fit(X_train)
     return model
 
+def regional_features(df, center_lat, center_lon):
+    """
+    Features for the per-region models: speed, hour and distance (km) from
+    the region centre, so each region learns where its herds normally graze.
+    """
+    dlat_km = (df['lat'].to_numpy() - center_lat) * 111.0
+    dlon_km = (df['lon'].to_numpy() - center_lon) * 111.0 * np.cos(np.radians(center_lat))
+    return np.column_stack([df['speed_kmh'].to_numpy(), df['hour_of_day'].to_numpy(), np.hypot(dlat_km, dlon_km)])
+
+def train_regional_isolation_forest(center_lat, center_lon, seed=42):
+    """IsolationForest on normal grazing simulated around a region's centre."""
+    from sklearn.ensemble import IsolationForest  # deferred: keeps backend startup light
+    normal_data = get_cattle_data("Normal", num_cows=500, center_lat=center_lat, center_lon=center_lon)
+    model = IsolationForest(contamination=0.05, random_state=seed)
+    model.fit(regional_features(normal_data, center_lat, center_lon))
+    return model
+
 def detect_raid_with_rules(speed, hour):
     """
     Rule-based fallback for raid detection.
     Returns True if characteristics match a raid pattern.
+    Single-animal wrapper over the rule engine (rules.json); batches should
+    call rules.engine.ruleset.matches() directly.
     """
-    # Raid signature: High speed (>10 km/h) during night hours (midnight to 6 AM)
-    if speed > 10.0 and (hour >= 0 and hour <= 6):
-        return True
-    return False
+    from .rules import engine
+    return bool(engine.ruleset.matches({"speed_kmh": [speed], "hour_of_day": [hour]})[0])
 
-def trigger_n8n_webhook(webhook_url, data):
+async def trigger_n8n_webhook(webhook_url, data):
     """
     Sends a JSON payload to an n8n webhook via POST request.
     """
@@ -165,7 +187,7 @@ def trigger_n8n_webhook(webhook_url, data):
             "timestamp": timestamp
         }
         
-        response = requests.post(webhook_url, json=payload, timeout=10)
+        response = await provider_request("n8n", "POST", webhook_url, json=payload, timeout=10)
         if response.status_code == 200:
             return True, "Webhook triggered successfully"
         else:
@@ -4,9 +4,10 @@ import numpy as np
 import pandas as pd
 
 class ThreatLSTM(nn.Module):
-    def __init__(self, input_size=1, hidden_size=50, output_size=1):
+    def __init__(self, input_size=1, hidden_size=50, output_size=1, seq_length=5):
         super(ThreatLSTM, self).__init__()
         self.hidden_size = hidden_size
+        self.seq_length = seq_length  # input window it is trained on
         self.lstm = nn.LSTM(input_size, hidden_size, batch_first=True)
         self.fc = nn.Linear(hidden_size, output_size)
 
@@ -27,30 +28,36 @@ def create_sequences(data, seq_length):
         ys.append(y)
     return np.array(xs), np.array(ys)
 
-def train_model(df, location, epochs=100):
+# Normalize data (simple min-max scaling for 1-5 range)
+# We know threat levels are 1-5, so let's scale to 0-1
+SCALER = (1, 5)
+
+def location_series(df, location):
+    """Scaled Threat_Level series of one location."""
+    loc_data = df[df['Location'] == location]['Threat_Level'].values.astype(float)
+    scaler_min, scaler_max = SCALER
+    return (loc_data - scaler_min) / (scaler_max - scaler_min)
+
+def to_tensors(X, y):
+    X = torch.from_numpy(X).float().unsqueeze(2) # (batch, seq, feature)
+    y = torch.from_numpy(y).float().unsqueeze(1) # (batch, output)
+    return X, y
+
+def train_model(df, location, epochs=100, hidden_size=50, seq_length=5, lr=0.01):
     """
     Trains an LSTM model for a specific location based on Threat_Level.
+    The defaults are the untuned configuration; see lstm_tuning.py.
     """
-    loc_data = df[df['Location'] == location]['Threat_Level'].values.astype(float)
-    
-    # Normalize data (simple min-max scaling for 1-5 range)
-    # We know threat levels are 1-5, so let's scale to 0-1
-    scaler_min = 1
-    scaler_max = 5
-    loc_data_scaled = (loc_data - scaler_min) / (scaler_max - scaler_min)
+    loc_data_scaled = location_series(df, location)
     
-    seq_length = 5
     if len(loc_data_scaled) <= seq_length + 2:
         return None, None # Not enough data
 
-    X, y = create_sequences(loc_data_scaled, seq_length)
+    X, y = to_tensors(*create_sequences(loc_data_scaled, seq_length))
 
-    X = torch.from_numpy(X).float().unsqueeze(2) # (batch, seq, feature)
-    y = torch.from_numpy(y).float().unsqueeze(1) # (batch, output)
-
-    model = ThreatLSTM()
+    model = ThreatLSTM(hidden_size=hidden_size, seq_length=seq_length)
     criterion = nn.MSELoss()
-    optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
 
     model.train()
     for epoch in range(epochs):
@@ -60,7 +67,7 @@ def train_model(df, location, epochs=100):
         loss.backward()
         optimizer.step()
         
-    return model, (scaler_min, scaler_max)
+    return model, SCALER
 
 def predict_next(model, recent_data, scaler_params):
     """
@@ -69,6 +76,8 @@ def predict_next(model, recent_data, scaler_params):
     """
     model.eval()
     scaler_min, scaler_max = scaler_params
+    # Only the window the model was trained on
+    recent_data = np.asarray(recent_data, dtype=float)[-model.seq_length:]
     
     # Scale input
     recent_data_scaled = (np.array(recent_data) - scaler_min) / (scaler_max - scaler_min)
@@ -80,3 +89,22 @@ def predict_next(model, recent_data, scaler_params):
     # Inverse scale
     pred_val = pred.item() * (scaler_max - scaler_min) + scaler_min
     return max(1, min(5, round(pred_val)))
+
+def to_payload(model, scaler_params):
+    """Weights + what is needed to rebuild the model, for torch.save (see model_store.py)."""
+    return {
+        "state_dict": model.state_dict(),
+        "hidden_size": model.hidden_size,
+        "seq_length": model.seq_length,
+        "scaler": list(scaler_params),
+    }
+
+def from_payload(payload):
+    """
+    Rebuilds a model around the loaded tensors. With assign=True the
+    parameters are the (memory-mapped) tensors themselves, not copies.
+    """
+    model = ThreatLSTM(hidden_size=payload["hidden_size"], seq_length=payload.get("seq_length", 5))
+    model.load_state_dict(payload["state_dict"], assign=True)
+    model.eval()
+    return model, tuple(payload["scaler"])
@@ -0,0 +1,202 @@
+"""
+Hyperparameter search for the per-location ThreatLSTM.
+
+Candidate configurations (hidden size, input window, learning rate) are
+trained in parallel on a process pool and scored on a held-out window: the
+last days of the series, which no trial trains on. The search is
+successive halving. Every candidate gets a small epoch budget; the best
+1/ETA continue from where they stopped with ETA times the budget, and so
+on up to the maximum. Inside each trial, training stops early once the
+validation loss hasn't improved for PATIENCE epochs.
+
+The untuned configuration is always one of the candidates. It is also
+trained the old way (20 epochs) alongside the search, as the baseline the
+result is reported against.
+
+The best configuration of each location is saved as JSON in TUNE_DIR and
+used by /history/train from then on.
+"""
+import os
+import json
+import time
+import random
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+
+import numpy as np
+
+from . import lstm_model
+from .config import TUNE_DIR, TUNE_WORKERS, TUNE_TRIALS, TUNE_MAX_EPOCHS
+
+SEARCH_SPACE = {
+    "hidden_size": [16, 32, 50, 64],
+    "seq_length": [3, 5, 7, 10],
+    "lr": [0.003, 0.01, 0.03],
+}
+DEFAULT_CONFIG = {"hidden_size": 50, "seq_length": 5, "lr": 0.01}
+BASELINE_EPOCHS = 20  # what /history/train used before tuning
+MIN_EPOCHS = 10
+ETA = 3
+PATIENCE = 8
+HOLDOUT_FRACTION = 0.2
+MIN_HOLDOUT = 7
+
+# --- Trials (run in the pool's worker processes) ---
+def _init_worker():
+    import torch
+    torch.set_num_threads(1)  # parallelism comes from the processes
+
+def _split(series, seq_length, holdout):
+    """Train / validation sequences; validation targets are the last `holdout` points."""
+    X, y = lstm_model.create_sequences(series, seq_length)
+    targets = np.arange(len(X)) + seq_length
+    val = targets >= len(series) - holdout
+    return lstm_model.to_tensors(X[~val], y[~val]), lstm_model.to_tensors(X[val], y[val])
+
+def run_trial(series, config, epochs, holdout, state=None, patience=PATIENCE, seed=0):
+    """
+    Trains `config` up to `epochs` total epochs, resuming from `state` (the
+    previous rung's). Returns the trial's state: validation loss and weights
+    at its best epoch, and whether early stopping ended it.
+    """
+    import copy
+    import torch
+
+    torch.manual_seed(seed)
+    (X, y), (X_val, y_val) = _split(series, config["seq_length"], holdout)
+    model = lstm_model.ThreatLSTM(hidden_size=config["hidden_size"], seq_length=config["seq_length"])
+    optimizer = torch.optim.Adam(model.parameters(), lr=config["lr"])
+    criterion = torch.nn.MSELoss()
+    if state is None:
+        state = {"config": config, "epoch": 0, "val_loss": float("inf"), "best_epoch": 0,
+                 "best_model": None, "stale": 0, "stopped": False}
+    else:
+        model.load_state_dict(state["model"])
+        optimizer.load_state_dict(state["optimizer"])
+
+    while state["epoch"] < epochs and not state["stopped"]:
+        model.train()
+        optimizer.zero_grad()
+        loss = criterion(model(X), y)
+        loss.backward()
+        optimizer.step()
+        state["epoch"] += 1
+
+        model.eval()
+        with torch.no_grad():
+            val_loss = criterion(model(X_val), y_val).item()
+        if val_loss < state["val_loss"] - 1e-6:
+            state.update(val_loss=val_loss, best_epoch=state["epoch"], stale=0,
+                         best_model=copy.deepcopy(model.state_dict()))
+        else:
+            state["stale"] += 1
+            if patience is not None and state["stale"] >= patience:
+                state["stopped"] = True
+
+    state["model"] = model.state_dict()
+    state["optimizer"] = optimizer.state_dict()
+    return state
+
+# --- Search ---
+def candidates(trials, seed=0):
+    """The default configuration plus trials-1 others drawn from SEARCH_SPACE."""
+    grid = [dict(zip(SEARCH_SPACE, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    grid = [c for c in grid if c != DEFAULT_CONFIG]
+    random.Random(seed).shuffle(grid)
+    return [dict(DEFAULT_CONFIG)] + grid[:max(0, trials - 1)]
+
+def holdout_size(n):
+    return max(MIN_HOLDOUT, int(n * HOLDOUT_FRACTION))
+
+def tune(series, trials=TUNE_TRIALS, max_epochs=TUNE_MAX_EPOCHS, workers=TUNE_WORKERS, seed=0):
+    """
+    Successive-halving search over `trials` configurations. Returns the
+    summary (best config, losses, per-rung results) and the best model's
+    payload for model_store.
+    """
+    series = np.asarray(series, dtype=float)
+    holdout = holdout_size(len(series))
+    longest = max(SEARCH_SPACE["seq_length"])
+    if len(series) - holdout <= longest + 2:
+        raise ValueError(f"Need more than {holdout + longest + 2} days of history to tune, got {len(series)}")
+
+    started = time.perf_counter()
+    configs = candidates(trials, seed)
+    states = [None] * len(configs)
+    rungs = []
+    budget = min(MIN_EPOCHS, max_epochs)
+    ctx = multiprocessing.get_context("spawn")  # forking a process that has torch threads running can deadlock
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker) as pool:
+        baseline = pool.submit(run_trial, series, DEFAULT_CONFIG, BASELINE_EPOCHS, holdout, None, None, seed)
+        while True:
+            futures = [pool.submit(run_trial, series, c, budget, holdout, s, PATIENCE, seed)
+                       for c, s in zip(configs, states)]
+            states = sorted((f.result() for f in futures), key=lambda s: s["val_loss"])
+            configs = [s["config"] for s in states]
+            rungs.append({
+                "epochs": budget,
+                "trials": [{**s["config"], "val_loss": round(s["val_loss"], 6), "best_epoch": s["best_epoch"],
+                            "stopped_early": s["stopped"]} for s in states],
+            })
+            if budget >= max_epochs or len(states) == 1:
+                break
+            keep = max(1, len(states) // ETA)
+            states, configs = states[:keep], configs[:keep]
+            budget = min(budget * ETA, max_epochs)
+        baseline = baseline.result()
+
+    best = states[0]
+    summary = {
+        "config": best["config"],
+        "epochs": best["best_epoch"],
+        "val_loss": best["val_loss"],
+        "baseline_val_loss": baseline["val_loss"],  # untuned config, 20 epochs, same holdout
+        "holdout_days": holdout,
+        "trials": len(rungs[0]["trials"]),
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 2),
+        "rungs": rungs,
+    }
+    payload = {
+        "state_dict": best["best_model"],
+        "hidden_size": best["config"]["hidden_size"],
+        "seq_length": best["config"]["seq_length"],
+        "scaler": list(lstm_model.SCALER),
+    }
+    return summary, payload
+
+# --- Saved configurations ---
+def _path(location):
+    return os.path.join(TUNE_DIR, f"{quote(location, safe='')}.json")
+
+def save_best(location, summary):
+    os.makedirs(TUNE_DIR, exist_ok=True)
+    record = {"location": location, "tuned_at": datetime.now().isoformat(timespec="seconds"),
+              **{k: v for k, v in summary.items() if k != "rungs"}}
+    tmp = f"{_path(location)}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(record, f, indent=2)
+    os.replace(tmp, _path(location))  # every worker reads the file; never a partial one
+    return record
+
+def load_best(location):
+    """The saved tuning result of `location`, or None if it was never tuned."""
+    try:
+        with open(_path(location)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def list_best():
+    if not os.path.isdir(TUNE_DIR):
+        return {}
+    records = {}
+    for name in sorted(os.listdir(TUNE_DIR)):
+        if name.endswith(".json"):
+            with open(os.path.join(TUNE_DIR, name)) as f:
+                record = json.load(f)
+            records[record["location"]] = record
+    return records
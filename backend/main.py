@@ -1,12 +1,52 @@
-from fastapi import FastAPI, HTTPException, Body
-from .models import LoginRequest, SMSRequest, CattleParams, PredictionRequest, WebhookRequest, TelegramRequest, TelegramCheckRequest
-from . import logic, synthetic_data, lstm_model, telegram_bot
+from . import startup  # first, so its clock covers the rest of the imports
+from fastapi import FastAPI, HTTPException, Body, Response, Header, Query
+from fastapi.responses import StreamingResponse
+from .models import LoginRequest, SMSRequest, CattleParams, PredictionRequest, WebhookRequest, TelegramRequest, TelegramCheckRequest, SimulationParams, AlertDispatchRequest
+from . import logic
+from . import metrics
+from . import profiling
+from . import coalescing
+from . import http_client
+from . import alert_dispatch
+from .config import ANOMALY_MODEL, STATE_DIR, MODEL_DIR, STREAM_CHECKPOINT_EVERY, REGIONS, REGION_MODEL_CACHE_SIZE, GEOFENCE_DIR, RECORD_DIR
+from .config import GEOFENCE_MAX_ANIMALS, GEOFENCE_ANIMAL_TTL
+from .config import COALESCE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE, MODEL_WORKERS, TRAIN_WORKERS, TUNE_TRIALS
+from .config import MAP_MAX_POINTS, MAP_RAW_ZOOM, MAP_MAX_TILES, MAP_TILE_CACHE_SIZE, HEATMAP_TILE_CACHE_SIZE
+from .model_registry import ModelRegistry
+from .model_store import ModelStore
+from .map_layers import PointStore
+from .heatmap_tiles import HeatmapTiles
+from .rules import engine as rule_engine
 from typing import List, Dict
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import json
+import asyncio
+import functools
+import contextvars
+import threading
+import time
 import numpy as np
 
 from fastapi.middleware.cors import CORSMiddleware
 
+# Heavy subsystems (torch, sklearn, pandas, telegram) load on first use or in
+# the background warm-up below, never at import time. See startup.py.
+def _pd():
+    return startup.load("pandas")
+
+def _synthetic_data():
+    return startup.load("backend.synthetic_data")
+
+def _lstm_model():
+    return startup.load("backend.lstm_model")
+
+def _lstm_tuning():
+    return startup.load("backend.lstm_tuning")
+
+async def _telegram_bot():
+    return await startup.aload("backend.telegram_bot")
+
 app = FastAPI(title="Ulinzi API")
 
 app.add_middleware(
@@ -16,11 +56,187 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# Trained models live in the shared store; every worker maps the same files
+model_store = ModelStore(MODEL_DIR)
+lstm_models = {}  # location -> (store version, model, scaler), rebuilt when a new version is published
+
+def _fit_iso_forest():
+    t0 = time.perf_counter()
+    model = logic.train_isolation_forest()
+    startup.record("fit:isolation_forest", time.perf_counter() - t0, "model")
+    return model
+
+def get_iso_forest():
+    """Returns the shared IsolationForest, fitting and publishing it if no worker has yet."""
+    return model_store.get_or_create("isolation_forest", _fit_iso_forest)[0]
+
+def _shared_regional_forest(lat, lon, seed):
+    name = f"regional_forest/{lat:.4f},{lon:.4f}/{seed}"
+    return model_store.get_or_create(name, lambda: logic.train_regional_isolation_forest(lat, lon, seed))[0]
+
+# Every scored telemetry batch is recorded for replay.py when ULINZI_RECORD_DIR is set
+recorder = None
+if RECORD_DIR:
+    recorder = startup.load("backend.telemetry_log").TelemetryRecorder(RECORD_DIR)
+
+# One anomaly model per region, trained on that region's grazing
+model_registry = ModelRegistry(REGIONS, _shared_regional_forest, REGION_MODEL_CACHE_SIZE)
+
+# CPU-bound model work runs here, off the event loop and off Starlette's
+# threadpool, so slow provider calls and model scoring never queue behind each other
+model_executor = ThreadPoolExecutor(MODEL_WORKERS, thread_name_prefix="ulinzi-model")
+# Training runs for minutes; it gets its own threads so /cattle/predict never waits behind it
+training_executor = ThreadPoolExecutor(TRAIN_WORKERS, thread_name_prefix="ulinzi-train")
+# One tuning search at a time: each one already spreads over TUNE_WORKERS processes
+tuning_executor = ThreadPoolExecutor(1, thread_name_prefix="ulinzi-tune")
+
+async def run_model(fn, *args, executor=model_executor):
+    """Runs fn(*args) on a model executor, keeping the request's context (profiling)."""
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+# Identical concurrent requests share one computation (see coalescing.py)
+def _coalescer(name):
+    return coalescing.Coalescer(name, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE, enabled=COALESCE)
+
+coalescers = {name: _coalescer(name) for name in ("/history/data", "/history/predict", "/cattle/predict")}
+
+# Latest scored positions per source, for /map/points and the heatmap tiles
+point_store = PointStore(MAP_TILE_CACHE_SIZE)
+heatmaps = HeatmapTiles(HEATMAP_TILE_CACHE_SIZE)
+
+def publish_positions(source, lat, lon, threat, ids=None, speed=None, batch_key=None):
+    """
+    Latest positions of a source -> live map, herd density; threats -> incident
+    heatmap, once per batch_key (a repeated batch doesn't add its incidents again).
+    """
+    point_store.update(source, lat, lon, threat, ids=ids, speed=speed)
+    heatmaps.replace("herd_density", source, lon, lat)
+    if threat.any():
+        heatmaps.add("incidents", source, lon[threat], lat[threat], batch_key=batch_key)
+
+streaming_model = None
+_streaming_lock = threading.Lock()
+
+def get_streaming_model():
+    """Returns the online Half-Space Trees detector, restoring its checkpoint on first use."""
+    global streaming_model
+    if streaming_model is None:
+        with _streaming_lock:
+            if streaming_model is None:
+                t0 = time.perf_counter()
+                model = startup.load("backend.streaming_anomaly").StreamingDetector(STATE_DIR, STREAM_CHECKPOINT_EVERY)
+                startup.record("load:half_space_trees", time.perf_counter() - t0, "model")
+                streaming_model = model
+    return streaming_model
 
-# Global state for models (Hackathon style)
-lstm_models = {}
-lstm_scalers = {}
-iso_forest_model = logic.train_isolation_forest()
+geofences = None
+_geofence_lock = threading.Lock()
+app_loop = None  # set at startup; geofence checks run on worker threads
+
+def alert_geofence_events(events):
+    """Sends a batch's enter/exit events on alerting zones through alert dispatch."""
+    req = alert_dispatch.geofence_request(events)
+    if req is not None and app_loop is not None:
+        asyncio.run_coroutine_threadsafe(alert_dispatch.send(req), app_loop)
+
+def get_geofences():
+    """Returns the geofence engine, loading and indexing the GeoJSON layers on first use."""
+    global geofences
+    if geofences is None:
+        with _geofence_lock:
+            if geofences is None:
+                t0 = time.perf_counter()
+                engine = startup.load("backend.geofence").GeofenceEngine(
+                    GEOFENCE_DIR, max_animals=GEOFENCE_MAX_ANIMALS, animal_ttl=GEOFENCE_ANIMAL_TTL,
+                    listeners=[alert_geofence_events])
+                startup.record("load:geofences", time.perf_counter() - t0, "model")
+                geofences = engine
+    return geofences
+
+def check_geofences(df, region=None):
+    """Geofence columns for a telemetry batch; enter/exit events are logged, counted and alerted."""
+    keys = None
+    if "id" in df:
+        keys = [f"{region or 'global'}:{i}" for i in df["id"].tolist()]
+    columns, events = get_geofences().check(df["lon"].to_numpy(float), df["lat"].to_numpy(float), keys,
+                                            timestamp=time.time())
+    for event in events:
+        metrics.GEOFENCE_EVENTS.inc(event["layer"], event["type"])
+    return columns, events
+
+APP_READY_S = round(time.perf_counter() - startup.PROCESS_START, 4)
+
+@app.on_event("startup")
+async def capture_loop():
+    global app_loop
+    app_loop = asyncio.get_running_loop()
+
+@app.on_event("startup")
+def warm_up():
+    # Returns immediately; uvicorn binds the port while this runs
+    startup.start_warmup([
+        lambda: startup.load("pandas", phase="warmup"),
+        lambda: startup.load("sklearn.ensemble", phase="warmup"),
+        get_iso_forest,
+        model_registry.train_all,
+        get_streaming_model,
+        get_geofences,
+        lambda: startup.load("backend.synthetic_data", phase="warmup"),
+        lambda: startup.load("backend.lstm_model", phase="warmup"),
+        startup.ensure_ssl,  # before the first provider call, so it never happens on a request
+        lambda: startup.load("backend.telegram_bot", phase="warmup"),
+    ])
+
+@app.on_event("shutdown")
+def save_streaming_model():
+    if streaming_model is not None:
+        streaming_model.checkpoint()
+    if recorder is not None:
+        recorder.flush()
+
+@app.on_event("shutdown")
+async def close_clients():
+    await http_client.aclose()
+    if "backend.telegram_bot" in sys.modules:
+        await (await _telegram_bot()).aclose()
+    model_executor.shutdown(wait=False)
+    training_executor.shutdown(wait=False)
+    tuning_executor.shutdown(wait=False)
+
+@app.get("/startup/profile")
+def startup_profile():
+    """Per-module load times, in which phase they happened, and warm-up status."""
+    return startup.report(app_ready_s=APP_READY_S)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    # async so the threadpool gauge is read on the event loop, and a scrape
+    # never waits behind queued sync routes
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# --- Profiling (admin only) ---
+def _require_admin(token):
+    if not profiling.is_admin(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/debug/profiles")
+def list_profiles(x_ulinzi_profile: str = Header(None)):
+    """Most recent captured request profiles, newest first."""
+    _require_admin(x_ulinzi_profile)
+    return profiling.list_profiles()
+
+@app.get("/debug/profiles/{profile_id}")
+def get_profile(profile_id: str, x_ulinzi_profile: str = Header(None)):
+    """Collapsed stacks for one profile (feed to flamegraph.pl or speedscope)."""
+    _require_admin(x_ulinzi_profile)
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(profiling.collapsed(profile), media_type="text/plain")
 
 @app.get("/")
 @app.head("/")
@@ -37,40 +253,41 @@ def login(creds: LoginRequest):
 
 # --- SMS ---
 @app.post("/sms/send")
-def send_sms(req: SMSRequest, api_key: str, device_id: str):
-    success, resp = logic.send_alert_sms(api_key, device_id, req.recipients, req.message)
+async def send_sms(req: SMSRequest, api_key: str, device_id: str):
+    success, resp = await logic.send_alert_sms(api_key, device_id, req.recipients, req.message)
     if success:
         return {"status": "success", "response": resp}
     else:
         raise HTTPException(status_code=500, detail=resp)
 
 @app.get("/sms/check")
-def check_sms(api_key: str, device_id: str, sender_phone: str, min_timestamp: str = None):
+async def check_sms(api_key: str, device_id: str, sender_phone: str, min_timestamp: str = None):
     # sender_phone can be comma separated
     phones = [p.strip() for p in sender_phone.split(",")]
     
     ts = None
     if min_timestamp:
         try:
-            ts = pd.to_datetime(min_timestamp)
+            ts = (await startup.aload("pandas")).to_datetime(min_timestamp)
         except:
             pass
             
-    found, result, debug = logic.check_for_sms_reply(api_key, device_id, phones, ts)
+    found, result, debug = await logic.check_for_sms_reply(api_key, device_id, phones, ts)
     return {"found": found, "result": result, "debug": debug}
 
 @app.post("/alerts/n8n")
-def trigger_n8n(req: WebhookRequest):
-    success, msg = logic.trigger_n8n_webhook(req.webhook_url, {"message": req.message, "data": req.data})
+async def trigger_n8n(req: WebhookRequest):
+    success, msg = await logic.trigger_n8n_webhook(req.webhook_url, {"message": req.message, "data": req.data})
     if success:
         return {"status": "success", "message": msg}
     else:
         raise HTTPException(status_code=500, detail=msg)
 
 @app.post("/alerts/telegram")
-def send_telegram(req: TelegramRequest):
+async def send_telegram(req: TelegramRequest):
     """Send alert directly to Telegram bot (supports multiple users)"""
-    success, msg = telegram_bot.send_telegram_to_multiple(
+    telegram_bot = await _telegram_bot()
+    success, msg = await telegram_bot.send_telegram_to_multiple(
         bot_token=req.bot_token,
         chat_ids=req.chat_ids,
         message=req.message,
@@ -83,8 +300,24 @@ def send_telegram(req: TelegramRequest):
     else:
         raise HTTPException(status_code=500, detail=msg)
 
+@app.post("/alerts/dispatch")
+async def dispatch_alert(req: AlertDispatchRequest):
+    """
+    Sends one incident on SMS, Telegram and n8n concurrently and streams
+    per-channel results (NDJSON, one JSON object per line) as they finish.
+    """
+    if not alert_dispatch.channels(req):
+        raise HTTPException(status_code=400, detail="No recipients: give phones, bot_token + chat_ids or webhook_url")
+    events = (json.dumps(event, default=str) + "\n" async for event in alert_dispatch.dispatch(req))
+    return StreamingResponse(events, media_type="application/x-ndjson")
+
+@app.get("/alerts/dispatch/status")
+def dispatch_status():
+    """Active and waiting sends per channel, against each channel's cap."""
+    return alert_dispatch.describe()
+
 @app.post("/telegram/check")
-def check_telegram(req: TelegramCheckRequest):
+async def check_telegram(req: TelegramCheckRequest):
     """Check for Telegram responses from users"""
     from datetime import datetime as dt
     
@@ -95,7 +328,8 @@ def check_telegram(req: TelegramCheckRequest):
         except:
             pass
     
-    success, responses = telegram_bot.check_telegram_responses(
+    telegram_bot = await _telegram_bot()
+    success, responses = await telegram_bot.check_telegram_responses(
         bot_token=req.bot_token,
         chat_ids=req.chat_ids,
         min_timestamp=min_ts
@@ -119,58 +353,311 @@ def get_cattle_data(params: CattleParams):
     # Convert to list of dicts for JSON
     return df.to_dict(orient="records")
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit / miss / coalesced counts per coalesced endpoint (also in /metrics)."""
+    return {name: c.describe() for name, c in coalescers.items()}
+
+@app.get("/models")
+def list_models():
+    """Published model versions and which of them this worker has mapped."""
+    return model_store.describe()
+
+@app.get("/regions")
+def list_regions():
+    return {name: list(center) for name, center in REGIONS.items()}
+
 @app.post("/cattle/predict")
-def predict_cattle_threat(data: List[Dict]):
-    df = pd.DataFrame(data)
+async def predict_cattle_threat(data: List[Dict], region: str = None, herd: str = None):
+    received_at, started = time.time(), time.perf_counter()
+    if region is not None and region not in REGIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown region: {region}")
+    if herd is not None and region is None:
+        raise HTTPException(status_code=400, detail="herd needs a region")
+    df, key = await run_model(_predict_frame, data, region)
     if df.empty:
         return []
-    
+    threat = await coalescers["/cattle/predict"].acall(key, lambda: run_model(_score_batch, df, region))
+    return await run_model(_publish_batch, df, key, threat, region, herd, received_at, started)
+
+def _predict_frame(data, region):
+    df = _pd().DataFrame(data)
+    return df, (coalescing.frame_key(df, region) if not df.empty else None)  # herd doesn't change the scores
+
+# Herd analysis needs positions as well as headings (video_detector rows may have no position)
+HERD_COLUMNS = {"lat", "lon", "heading_deg"}
+
+@profiling.profiled
+def _score_batch(df, region):
+    """
+    Threat flag per row. The result is cached and shared by identical
+    requests; the per-request side effects are in _publish_batch.
+    """
     features = df[['speed_kmh', 'hour_of_day']]
-    scores = iso_forest_model.predict(features)
-    
-    # Hybrid detection: AI + Rule-based fallback
-    status = []
-    for i, s in enumerate(scores):
-        speed = df.iloc[i]['speed_kmh']
-        hour = df.iloc[i]['hour_of_day']
-        
-        # Use AI prediction OR rule-based detection
-        if s == -1 or logic.detect_raid_with_rules(speed, hour):
-            status.append("THREAT DETECTED")
+    scores = np.ones(len(df), dtype=int)
+    if ANOMALY_MODEL in ("batch", "both"):
+        if region is None:
+            model = get_iso_forest()
+            with metrics.MODEL_INFERENCE_SECONDS.time("isolation_forest"):
+                scores = np.minimum(scores, model.predict(features))
         else:
-            status.append("Safe")
+            # Routed to the region's own model; herd only labels the batch (recorded for replay)
+            model, hit = model_registry.get(region)
+            metrics.MODEL_CACHE_REQUESTS.inc("region_models", "hit" if hit else "miss")
+            with metrics.MODEL_INFERENCE_SECONDS.time("isolation_forest_regional"):
+                scores = np.minimum(scores, model.predict(logic.regional_features(df, *REGIONS[region])))
+    if ANOMALY_MODEL in ("streaming", "both"):
+        stream = get_streaming_model()
+        with metrics.MODEL_INFERENCE_SECONDS.time("half_space_trees"):
+            scores = np.minimum(scores, stream.predict(features.to_numpy()))
+    
+    # Herd-level context (heading coherence etc.) for the coordinated-movement rules
+    columns = {c: df[c].to_numpy() for c in df.columns}
+    if "lat" in df and "lon" in df:
+        columns.update(check_geofences(df, region)[0])
+    if HERD_COLUMNS <= set(df.columns):
+        herd_detector = startup.load("backend.herd_detector")
+        cluster, herd_stats = herd_detector.analyze(df)
+        columns.update(herd_detector.animal_columns(cluster, herd_stats))
+    
+    # Hybrid detection: AI OR rule-based (rules.json, evaluated over the whole batch)
+    threat = (scores == -1) | rule_engine.ruleset.matches(columns)
+    
+    if ANOMALY_MODEL in ("streaming", "both"):
+        # Only points judged Safe are learned, so a raid cannot teach the model that raids are normal.
+        # Learned here, once per distinct batch: a repeated batch is the same data, not more of it.
+        stream.learn(features.to_numpy()[~threat])
+    
+    threat.flags.writeable = False  # shared with every request of this batch
+    return threat
+
+def _publish_batch(df, key, threat, region, herd, received_at, started):
+    """Per request, cache hit or not: map and heatmaps, recording, verdicts."""
+    if "lat" in df and "lon" in df:
+        publish_positions(region or "global", df["lat"].to_numpy(float), df["lon"].to_numpy(float), threat,
+                          ids=df["id"].to_numpy() if "id" in df else None,
+                          speed=df["speed_kmh"].to_numpy(float), batch_key=key)
     
+    if recorder is not None:
+        recorder.record(df, threat, region, herd, received_at, (time.perf_counter() - started) * 1000)
+    
+    return np.where(threat, "THREAT DETECTED", "Safe").tolist()
+
+@app.post("/cattle/herds")
+def analyze_herds(data: List[Dict], cell_km: float = 0.5):
+    """Groups telemetry into herds and flags coordinated movement (see herd_detector.py)."""
+    df = _pd().DataFrame(data)
+    if df.empty:
+        return []
+    missing = sorted({"lat", "lon", "speed_kmh"} - set(df.columns))  # heading_deg is optional here
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Missing telemetry columns: {', '.join(missing)}")
+    herd_detector = startup.load("backend.herd_detector")
+    _, stats = herd_detector.analyze(df, cell_km=cell_km)
+    return herd_detector.herd_records(stats)
+
+# --- Simulation ---
+simulation = None
+_simulation_lock = threading.Lock()
+
+@app.post("/simulation/reset")
+def reset_simulation(params: SimulationParams):
+    """Starts a fresh simulated set of herds (see simulator.py)."""
+    global simulation
+    from datetime import datetime as dt
+    simulator = startup.load("backend.simulator")
+    try:
+        start = dt.fromisoformat(params.start) if params.start else None
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"start is not an ISO timestamp: {params.start}")
+    with _simulation_lock:
+        simulation = simulator.HerdSimulator(params.n_herds, params.animals_per_herd, start=start,
+                                             dt_s=params.dt_s, raid_rate=params.raid_rate, seed=params.seed)
+        return simulation.describe()
+
+@app.post("/simulation/step")
+def step_simulation(steps: int = Query(1, ge=1, le=1440), region: str = None,
+                    limit: int = Query(1000, ge=0, le=100_000)):
+    """Advances the simulation and returns the latest fixes (optionally one region's, at most `limit`)."""
+    global simulation
+    simulator = startup.load("backend.simulator")
+    with _simulation_lock:
+        if simulation is None:
+            simulation = simulator.HerdSimulator()
+        for batch in simulation.run(steps):
+            pass
+        # Ground truth as the threat flag, so the map shows the raided herds
+        publish_positions("simulation", batch["lat"], batch["lon"], batch["raided"],
+                          ids=batch["id"], speed=batch["speed_kmh"])
+        return {"state": simulation.describe(), "fixes": simulator.to_records(batch, region, limit)}
+
+# --- Live map ---
+@app.get("/map/points")
+def map_points(source: str, west: float, south: float, east: float, north: float, zoom: int,
+               max_points: int = MAP_MAX_POINTS):
+    """
+    Positions of `source` (a region, "global" or "simulation") in a viewport:
+    raw points when zoomed in or sparse, per-tile clusters otherwise.
+    """
+    try:
+        view = point_store.query(source, west, south, east, north, zoom, max_points=min(max_points, MAP_MAX_POINTS),
+                                 raw_zoom=MAP_RAW_ZOOM, max_tiles=MAP_MAX_TILES)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No positions for: {source}")
+    if view["mode"] == "clusters":
+        metrics.MAP_TILE_REQUESTS.inc("clusters", "hit", amount=view["tile_cache_hits"])
+        metrics.MAP_TILE_REQUESTS.inc("clusters", "miss", amount=view["tiles"] - view["tile_cache_hits"])
+    return view
+
+@app.get("/map/sources")
+def map_sources():
+    return point_store.sources()
+
+@app.get("/tiles/{layer}/{z}/{x}/{y}.png")
+def heatmap_tile(layer: str, z: int, x: int, y: int):
+    """Heatmap tile (herd_density or incidents) for map overlays such as folium.TileLayer."""
+    if layer not in heatmaps.layers:
+        raise HTTPException(status_code=404, detail=f"Unknown layer: {layer}")
+    if not 0 <= z <= 22 or not (0 <= x < 1 << z and 0 <= y < 1 << z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    png, hit = heatmaps.tile(layer, z, x, y)
+    metrics.MAP_TILE_REQUESTS.inc(layer, "hit" if hit else "miss")
+    # Short browser caching: tiles change as new telemetry arrives
+    return Response(content=png, media_type="image/png", headers={"Cache-Control": "max-age=10"})
+
+@app.get("/tiles")
+def heatmap_status():
+    return heatmaps.describe()
+
+# --- Geofences ---
+@app.post("/geofence/check")
+def geofence_check(data: List[Dict], region: str = None):
+    """Per-fix zone membership and border distance, plus enter/exit events since each animal's last fix."""
+    df = _pd().DataFrame(data)
+    if df.empty:
+        return {"fixes": [], "events": []}
+    columns, events = check_geofences(df, region)
+    fixes = _pd().DataFrame(columns).astype(object).where(lambda c: c.notna(), None)
+    return {"fixes": fixes.to_dict(orient="records"), "events": events}
+
+@app.get("/geofence/events")
+def geofence_events(limit: int = 100):
+    return get_geofences().recent_events(limit)
+
+@app.get("/geofence/layers")
+def geofence_layers():
+    return get_geofences().describe()
+
+@app.get("/rules")
+def list_rules():
+    """Active raid rules, the file they came from and any reload error."""
+    return rule_engine.status()
+
+@app.get("/cattle/model")
+def cattle_model_status():
+    """Which anomaly model is active, the regional shards and the streaming model."""
+    status = {"mode": ANOMALY_MODEL, "regional": model_registry.info()}
+    if ANOMALY_MODEL in ("streaming", "both"):
+        status["streaming"] = get_streaming_model().stats()
     return status
 
 # --- History Data (Regional Dashboard) ---
 @app.get("/history/data")
-def get_history_data(locations: str, days: int = 60):
-    loc_list = locations.split(",")
-    df = synthetic_data.generate_time_series_data(loc_list, days)
+async def get_history_data(locations: str, days: int = 60):
+    loc_list = [loc.strip() for loc in locations.split(",") if loc.strip()]
+    return await coalescers["/history/data"].acall(coalescing.make_key(loc_list, days),
+                                                   lambda: run_model(_history_data, loc_list, days))
+
+def _history_data(loc_list, days):
+    df = _synthetic_data().generate_time_series_data(loc_list, days)
     # Convert dates to string for JSON
     df['Date'] = df['Date'].astype(str)
     return df.to_dict(orient="records")
 
 @app.post("/history/train")
-def train_history_model(data: List[Dict], location: str):
+async def train_history_model(data: List[Dict], location: str):
+    return await run_model(_train_lstm, data, location, executor=training_executor)
+
+@profiling.profiled
+def _train_lstm(data, location):
+    pd = _pd()
     df = pd.DataFrame(data)
     df['Date'] = pd.to_datetime(df['Date'])
     
-    model, scaler = lstm_model.train_model(df, location, epochs=20) # Lower epochs for speed
+    lstm_model = _lstm_model()
+    # The location's tuned configuration if /history/tune has run, else the defaults
+    tuned = _lstm_tuning().load_best(location)
+    params = {"epochs": 20}  # Lower epochs for speed
+    if tuned:
+        params = {"epochs": max(tuned["epochs"], 1), **tuned["config"]}
+    with metrics.MODEL_TRAINING_SECONDS.time("lstm"):
+        model, scaler = lstm_model.train_model(df, location, **params)
     if model:
-        lstm_models[location] = model
-        lstm_scalers[location] = scaler
-        return {"status": "trained"}
+        # Published for every worker; the others pick it up on their next request
+        version = model_store.publish(f"lstm/{location}", lstm_model.to_payload(model, scaler), fmt="torch")
+        return {"status": "trained", "version": version, "tuned": tuned is not None}
     else:
         return {"status": "failed"}
 
+_tuning = set()  # locations with a search queued or running (only touched on the event loop)
+
+@app.post("/history/tune")
+async def tune_history_model(data: List[Dict], location: str, trials: int = Query(TUNE_TRIALS, ge=1, le=48)):
+    """
+    Searches LSTM hyperparameters for a location on a process pool (see
+    lstm_tuning.py), saves the best configuration for /history/train and
+    publishes the best model. Searches run one at a time; a second search
+    for a location that is already being tuned gets a 409.
+    """
+    if location in _tuning:
+        raise HTTPException(status_code=409, detail=f"{location} is already being tuned")
+    _tuning.add(location)
+    search = asyncio.ensure_future(run_model(_tune_lstm, data, location, trials, executor=tuning_executor))
+    search.add_done_callback(lambda _: _tuning.discard(location))  # when it ends, even if the client left
+    return await asyncio.shield(search)
+
+def _tune_lstm(data, location, trials):
+    df = _pd().DataFrame(data)
+    series = _lstm_model().location_series(df, location)
+    tuning = _lstm_tuning()
+    try:
+        with metrics.MODEL_TRAINING_SECONDS.time("lstm_tuning"):
+            summary, payload = tuning.tune(series, trials=trials)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    tuning.save_best(location, summary)
+    version = model_store.publish(f"lstm/{location}", payload, fmt="torch")
+    return {"status": "tuned", "version": version, **summary}
+
+@app.get("/history/tuning")
+def list_tuning():
+    """Saved best LSTM configuration per location."""
+    return _lstm_tuning().list_best()
+
+def get_lstm(location):
+    """(model, scaler, version) for a location from the shared store, or Nones if never trained."""
+    payload, version = model_store.get(f"lstm/{location}")
+    if payload is None:
+        return None, None, None
+    cached = lstm_models.get(location)
+    if cached is None or cached[0] != version:
+        model, scaler = _lstm_model().from_payload(payload)
+        cached = lstm_models[location] = (version, model, scaler)
+    return cached[1], cached[2], version
+
 @app.post("/history/predict")
-def predict_history(location: str, recent_data: List[float]):
-    if location not in lstm_models:
+async def predict_history(location: str, recent_data: List[float]):
+    model, scaler, version = await run_model(get_lstm, location)
+    if model is None:
+        metrics.MODEL_CACHE_REQUESTS.inc("lstm", "miss")
         raise HTTPException(status_code=404, detail="Model not trained for this location")
+    metrics.MODEL_CACHE_REQUESTS.inc("lstm", "hit")
     
-    model = lstm_models[location]
-    scaler = lstm_scalers[location]
-    
-    prediction = lstm_model.predict_next(model, np.array(recent_data), scaler)
-    return {"prediction": prediction}
+    def forecast():
+        lstm_model = _lstm_model()
+        with metrics.MODEL_INFERENCE_SECONDS.time("lstm"):
+            prediction = lstm_model.predict_next(model, np.array(recent_data), scaler)
+        return {"prediction": prediction}
+    # The model version is part of the key, so a retrain is never answered from the cache
+    return await coalescers["/history/predict"].acall(coalescing.make_key(location, recent_data, version),
+                                                      lambda: run_model(forecast))
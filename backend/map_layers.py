@@ -0,0 +1,218 @@
+"""
+Server-side decimation of live positions for the dashboard maps.
+
+Browsers stall when tens of thousands of markers are sent to the map, so
+the backend keeps the latest scored snapshot of every source (a region's
+last /cattle/predict batch, or the simulator) and answers viewport queries
+with a bounded payload:
+
+- zoomed out: per-tile clusters (an 8x8 grid inside each web-mercator
+  tile) with counts and threat breakdown, cached per tile
+- zoomed in, or few animals in view: the raw points, thinned to at most
+  `max_points` by taking every k-th one
+
+Tiles use the usual slippy-map scheme (z/x/y, 256px, as in OpenStreetMap
+or folium), so the cached clusters line up with the map's own tiles.
+"""
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+
+MAX_LAT = 85.05112878
+
+def tile_coords(lon, lat, zoom):
+    """Fractional slippy-map tile coordinates (x, y) of points at `zoom`."""
+    n = 2.0 ** zoom
+    lat = np.radians(np.clip(lat, -MAX_LAT, MAX_LAT))
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n
+    return x, y
+
+def tile_bounds(zoom, x, y):
+    """(west, south, east, north) in degrees of tile z/x/y."""
+    n = 2.0 ** zoom
+    def lat(ty):
+        return float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * ty / n)))))
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+class Snapshot:
+    """The latest fixes of one source, plus per-zoom tile indexes built on demand."""
+    def __init__(self, lat, lon, threat, ids=None, speed=None, version=0):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.threat = np.zeros(len(self.lat), dtype=bool) if threat is None else np.asarray(threat, dtype=bool)
+        self.ids = None if ids is None else np.asarray(ids)
+        self.speed = None if speed is None else np.asarray(speed, dtype=float)
+        self.version = version
+        self.updated_at = time.time()
+        self._indexes = {}  # zoom -> (sorted tile codes, point order, fractional x, fractional y)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.lat)
+
+    def tile_index(self, zoom):
+        index = self._indexes.get(zoom)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(zoom)
+                if index is None:
+                    fx, fy = tile_coords(self.lon, self.lat, zoom)
+                    n = 1 << zoom
+                    codes = np.clip(fx.astype(np.int64), 0, n - 1) * n + np.clip(fy.astype(np.int64), 0, n - 1)
+                    order = np.argsort(codes, kind="stable")
+                    index = self._indexes[zoom] = (codes[order], order, fx, fy)
+        return index
+
+    def tile_points(self, zoom, x, y):
+        """Indices of the points in tile z/x/y, with their fractional tile coordinates."""
+        codes, order, fx, fy = self.tile_index(zoom)
+        code = x * (1 << zoom) + y
+        idx = order[np.searchsorted(codes, code):np.searchsorted(codes, code, side="right")]
+        return idx, fx[idx], fy[idx]
+
+class PointStore:
+    def __init__(self, tile_cache_size=4096, cluster_grid=8):
+        self.tile_cache_size = tile_cache_size
+        self.cluster_grid = cluster_grid
+        self._snapshots = {}  # source -> Snapshot
+        self._tiles = OrderedDict()  # (source, version, z, x, y) -> clusters
+        self._lock = threading.Lock()
+        self._versions = 0
+        self.stats = {"hits": 0, "misses": 0}
+
+    def update(self, source, lat, lon, threat=None, ids=None, speed=None):
+        """Replaces `source`'s snapshot; its cached tiles are dropped."""
+        with self._lock:
+            self._versions += 1
+            self._snapshots[source] = Snapshot(lat, lon, threat, ids, speed, self._versions)
+            for key in [k for k in self._tiles if k[0] == source]:
+                del self._tiles[key]
+
+    def get(self, source):
+        return self._snapshots.get(source)
+
+    def sources(self):
+        return {
+            name: {"points": len(s), "threats": int(s.threat.sum()), "version": s.version, "updated_at": s.updated_at}
+            for name, s in list(self._snapshots.items())
+        }
+
+    def tile_clusters(self, source, zoom, x, y):
+        """Cached clusters of tile z/x/y. Returns (clusters, cache hit)."""
+        snapshot = self._snapshots.get(source)
+        if snapshot is None:
+            raise KeyError(source)
+        key = (source, snapshot.version, zoom, x, y)
+        clusters = self._tiles.get(key)
+        if clusters is not None:
+            try:
+                self._tiles.move_to_end(key)
+            except KeyError:
+                pass  # evicted meanwhile; we still hold the value
+            self.stats["hits"] += 1
+            return clusters, True
+
+        self.stats["misses"] += 1
+        clusters = self._cluster(snapshot, zoom, x, y)
+        with self._lock:
+            if self._snapshots.get(source) is snapshot:  # not replaced while we were clustering
+                self._tiles[key] = clusters
+                while len(self._tiles) > self.tile_cache_size:
+                    self._tiles.popitem(last=False)
+        return clusters, False
+
+    def _cluster(self, snapshot, zoom, x, y):
+        idx, fx, fy = snapshot.tile_points(zoom, x, y)
+        if not len(idx):
+            return []
+        g = self.cluster_grid
+        cell = np.clip(((fx - x) * g).astype(int), 0, g - 1) * g + np.clip(((fy - y) * g).astype(int), 0, g - 1)
+        count = np.bincount(cell, minlength=g * g)
+        threats = np.bincount(cell, weights=snapshot.threat[idx], minlength=g * g)
+        lat = np.bincount(cell, weights=snapshot.lat[idx], minlength=g * g)
+        lon = np.bincount(cell, weights=snapshot.lon[idx], minlength=g * g)
+        max_speed = None
+        if snapshot.speed is not None:
+            max_speed = np.zeros(g * g)
+            np.maximum.at(max_speed, cell, snapshot.speed[idx])
+        clusters = []
+        for c in np.flatnonzero(count).tolist():
+            n = int(count[c])
+            cluster = {
+                "lat": float(lat[c] / n),
+                "lon": float(lon[c] / n),
+                "count": n,
+                "threats": int(threats[c]),
+                "safe": n - int(threats[c]),
+            }
+            if max_speed is not None:
+                cluster["max_speed_kmh"] = float(max_speed[c])
+            clusters.append(cluster)
+        return clusters
+
+    def query(self, source, west, south, east, north, zoom, max_points=2000, raw_zoom=15, max_tiles=64):
+        """
+        Points or clusters for a viewport. Raw points are returned when
+        zoom >= raw_zoom or at most `max_points` are in view (thinned to
+        `max_points` otherwise); else the clusters of the tiles covering the
+        viewport. If the viewport spans more than `max_tiles` tiles, the
+        clustering zoom is lowered until it fits.
+        """
+        snapshot = self._snapshots.get(source)
+        if snapshot is None:
+            raise KeyError(source)
+        zoom = int(np.clip(zoom, 0, 22))
+        in_view = (snapshot.lon >= west) & (snapshot.lon <= east) & (snapshot.lat >= south) & (snapshot.lat <= north)
+        total = int(in_view.sum())
+        result = {
+            "source": source,
+            "version": snapshot.version,
+            "total": total,
+            "threats": int(snapshot.threat[in_view].sum()),
+        }
+
+        if zoom >= raw_zoom or total <= max_points:
+            idx = np.flatnonzero(in_view)
+            step = -(-len(idx) // max_points) if max_points > 0 else 1  # ceil
+            idx = idx[::max(step, 1)]
+            points = {"lat": snapshot.lat[idx], "lon": snapshot.lon[idx], "threat": snapshot.threat[idx]}
+            if snapshot.ids is not None:
+                points["id"] = snapshot.ids[idx]
+            if snapshot.speed is not None:
+                points["speed_kmh"] = snapshot.speed[idx]
+            columns = {k: v.tolist() for k, v in points.items()}
+            result.update({
+                "mode": "points",
+                "zoom": zoom,
+                "decimated": len(idx) < total,
+                "points": [dict(zip(columns, row)) for row in zip(*columns.values())],
+            })
+            return result
+
+        # Tiles covering the viewport, at a zoom where there are at most max_tiles of them
+        while True:
+            x0, y0 = tile_coords(west, north, zoom)
+            x1, y1 = tile_coords(east, south, zoom)
+            n = (1 << zoom) - 1
+            xs = range(int(np.clip(x0, 0, n)), int(np.clip(x1, 0, n)) + 1)
+            ys = range(int(np.clip(y0, 0, n)), int(np.clip(y1, 0, n)) + 1)
+            if len(xs) * len(ys) <= max_tiles or zoom == 0:
+                break
+            zoom -= 1
+
+        clusters, hits = [], 0
+        for x in xs:
+            for y in ys:
+                tile, hit = self.tile_clusters(source, zoom, x, y)
+                clusters.extend(tile)
+                hits += hit
+        result.update({
+            "mode": "clusters",
+            "zoom": zoom,
+            "tiles": len(xs) * len(ys),
+            "tile_cache_hits": hits,
+            "clusters": clusters,
+        })
+        return result
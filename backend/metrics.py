@@ -0,0 +1,225 @@
+"""
+Prometheus-compatible metrics for the backend.
+
+A deliberately small implementation (counters, histograms, callback gauges)
+rendered in the Prometheus text exposition format by GET /metrics. Each
+observation is a bisect plus a couple of additions under a lock, so it can
+sit on the /cattle/predict hot path.
+"""
+import time
+import threading
+from bisect import bisect_left
+
+# Latency buckets in seconds: sub-millisecond model calls up to slow providers
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _format_value(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, v in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def time(self, *labels):
+        """Context manager that observes the elapsed wall time."""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            base = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{base} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+class Gauge:
+    """A gauge whose value is read from a callback at scrape time."""
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback  # returns a number, or {labels tuple: number}
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.callback()
+        except Exception:
+            return lines
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}")
+        return lines
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Metric definitions ---
+HTTP_REQUEST_SECONDS = Histogram(
+    "ulinzi_http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+HTTP_IN_FLIGHT = [0]
+Gauge("ulinzi_http_requests_in_flight", "Requests currently being served.", lambda: HTTP_IN_FLIGHT[0])
+
+MODEL_INFERENCE_SECONDS = Histogram(
+    "ulinzi_model_inference_seconds", "Model inference time.", ("model",),
+)
+MODEL_TRAINING_SECONDS = Histogram(
+    "ulinzi_model_training_seconds", "Model training time.", ("model",),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+MODEL_CACHE_REQUESTS = Counter(
+    "ulinzi_model_cache_requests_total", "Model cache lookups by result (hit/miss).", ("cache", "result"),
+)
+
+PROVIDER_REQUEST_SECONDS = Histogram(
+    "ulinzi_provider_request_duration_seconds", "Outbound provider call latency.", ("provider", "outcome"),
+)
+PROVIDER_ERRORS = Counter(
+    "ulinzi_provider_errors_total", "Failed outbound provider calls.", ("provider",),
+)
+ALERT_DISPATCH = Counter(
+    "ulinzi_alert_dispatch_total", "Per-channel results of /alerts/dispatch (success/error).", ("channel", "result"),
+)
+
+GEOFENCE_EVENTS = Counter(
+    "ulinzi_geofence_events_total", "Geofence enter/exit events.", ("layer", "type"),
+)
+
+MAP_TILE_REQUESTS = Counter(
+    "ulinzi_map_tile_requests_total", "Map tile lookups by layer and cache result (hit/miss).", ("layer", "result"),
+)
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "ulinzi_response_cache_requests_total", "Coalesced endpoint calls by result (hit/miss/coalesced).",
+    ("endpoint", "result"),
+)
+
+def observe_provider(provider, seconds, ok):
+    PROVIDER_REQUEST_SECONDS.observe(seconds, provider, "success" if ok else "error")
+    if not ok:
+        PROVIDER_ERRORS.inc(provider)
+
+def _threadpool_stats():
+    # Starlette runs sync routes on AnyIO's default thread limiter
+    try:
+        import anyio.to_thread
+        stats = anyio.to_thread.current_default_thread_limiter().statistics()
+        return {("in_use",): stats.borrowed_tokens, ("waiting",): stats.tasks_waiting}
+    except Exception:
+        return {}
+
+Gauge("ulinzi_threadpool_tasks", "Sync-route threadpool slots in use and tasks queued for one.",
+      _threadpool_stats, ("state",))
+
+# --- ASGI middleware ---
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task/stream overhead) that
+    times every HTTP request and labels it with the matched route template,
+    so /tiles/1/2/3 and /tiles/4/5/6 share one series.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT[0] += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT[0] -= 1
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], path, str(status[0]))
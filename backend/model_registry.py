@@ -0,0 +1,69 @@
+"""
+Registry of per-region anomaly models.
+
+Shards are keyed by region name. Hot shards stay in an LRU of
+`capacity` models. A cache hit takes no lock (dict lookup + move_to_end,
+both atomic under the GIL), so routing is not serialised behind training.
+A miss trains the shard under a per-key lock, so concurrent first requests
+for the same region train it once while other regions carry on.
+"""
+import zlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class ModelRegistry:
+    def __init__(self, regions, trainer, capacity=32):
+        self.regions = regions  # name -> (lat, lon)
+        self.trainer = trainer  # (lat, lon, seed) -> fitted model
+        self.capacity = capacity
+        self._models = OrderedDict()
+        self._lock = threading.Lock()  # guards insertion/eviction and _key_locks
+        self._key_locks = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def center(self, key):
+        if key not in self.regions:
+            raise KeyError(key)
+        return self.regions[key]
+
+    def get(self, region):
+        key = region
+        model = self._models.get(key)
+        if model is not None:
+            try:
+                self._models.move_to_end(key)
+            except KeyError:
+                pass  # evicted between the lookup and here; we still hold the model
+            self.stats["hits"] += 1
+            return model, True
+        return self._load(key), False
+
+    def _load(self, key):
+        lat, lon = self.center(key)  # unknown regions fail before taking any lock
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model  # trained by the request we waited on
+            self.stats["misses"] += 1
+            # Stable per-shard seed, so a retrained shard matches the evicted one
+            model = self.trainer(lat, lon, seed=zlib.crc32(key.encode()) % 2**31)
+            with self._lock:
+                self._models[key] = model
+                while len(self._models) > self.capacity:
+                    evicted, _ = self._models.popitem(last=False)
+                    self._key_locks.pop(evicted, None)
+                    self.stats["evictions"] += 1
+            return model
+
+    def train_all(self, keys=None, workers=4):
+        """Trains (or loads) the given shards in parallel. Defaults to every region."""
+        keys = list(keys or self.regions)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ulinzi-train") as pool:
+            list(pool.map(self._load, keys))
+        return keys
+
+    def info(self):
+        return {"capacity": self.capacity, "loaded": list(self._models), **self.stats}
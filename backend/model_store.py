@@ -0,0 +1,147 @@
+"""
+Versioned model files shared by every uvicorn worker.
+
+Without this, each worker trains and holds its own copy of every model:
+memory grows with the worker count, workers disagree (training data is
+random), and a model trained through one worker is invisible to the rest.
+
+A model is published once as an immutable file, <name>/<version>.joblib or
+<name>/<version>.pt, and the name's CURRENT pointer is swapped to it with
+os.replace, so readers see either the old version or the new one, never a
+partial file. Workers load the current version memory-mapped (joblib
+mmap_mode="r", torch.load(mmap=True)). The weights stay in the OS page
+cache and every process maps the same read-only pages. Each get() stats the
+pointer, so a new version is picked up on the next request.
+
+get_or_create() trains under a file lock, so when N workers start together
+one of them trains and the others attach to its result.
+"""
+import os
+import time
+import threading
+from urllib.parse import quote, unquote
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock; workers may train the same model twice
+    fcntl = None
+
+FORMATS = ("joblib", "torch")
+
+class ModelStore:
+    def __init__(self, directory, keep=3):
+        self.directory = directory
+        self.keep = keep  # versions kept on disk per model (older ones may still be mapped by a worker)
+        os.makedirs(directory, exist_ok=True)
+        self._loaded = {}  # name -> (pointer stat, version, object)
+        self._lock = threading.Lock()
+        self.stats = {"loads": 0, "publishes": 0}
+
+    def _dir(self, name):
+        return os.path.join(self.directory, quote(name, safe=""))
+
+    def _pointer(self, name):
+        return os.path.join(self._dir(name), "CURRENT")
+
+    def publish(self, name, obj, fmt="joblib"):
+        """Writes `obj` as a new version of `name` and makes it current. Returns the version."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown model format: {fmt}")
+        directory = self._dir(name)
+        os.makedirs(directory, exist_ok=True)
+        version = f"{int(time.time() * 1000)}-{os.getpid()}"
+        filename = f"{version}.{'pt' if fmt == 'torch' else 'joblib'}"
+        path = os.path.join(directory, filename)
+        tmp = path + ".tmp"
+        if fmt == "torch":
+            import torch
+            torch.save(obj, tmp)
+        else:
+            import joblib
+            joblib.dump(obj, tmp)
+        os.replace(tmp, path)
+
+        pointer_tmp = f"{self._pointer(name)}.{os.getpid()}.tmp"
+        with open(pointer_tmp, "w") as f:
+            f.write(filename)
+        os.replace(pointer_tmp, self._pointer(name))
+        self.stats["publishes"] += 1
+        self._prune(directory, filename)
+        return version
+
+    def _prune(self, directory, current):
+        files = sorted(f for f in os.listdir(directory) if f.endswith((".pt", ".joblib")))
+        old = [f for f in files if f != current][:max(0, len(files) - self.keep)]
+        for f in old:
+            try:
+                os.remove(os.path.join(directory, f))  # processes that mapped it keep their pages
+            except OSError:
+                pass
+
+    def get(self, name):
+        """Returns (object, version) of the current version of `name`, or (None, None)."""
+        try:
+            st = os.stat(self._pointer(name))
+        except FileNotFoundError:
+            return None, None
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        loaded = self._loaded.get(name)
+        if loaded is not None and loaded[0] == stamp:
+            return loaded[2], loaded[1]
+
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded is not None and loaded[0] == stamp:
+                return loaded[2], loaded[1]
+            with open(self._pointer(name)) as f:
+                filename = f.read().strip()
+            obj = self._load(os.path.join(self._dir(name), filename))
+            version = filename.rsplit(".", 1)[0]
+            self._loaded[name] = (stamp, version, obj)
+            self.stats["loads"] += 1
+            return obj, version
+
+    def _load(self, path):
+        if path.endswith(".pt"):
+            import torch
+            return torch.load(path, mmap=True, weights_only=True)
+        import joblib
+        return joblib.load(path, mmap_mode="r")
+
+    def get_or_create(self, name, build, fmt="joblib"):
+        """
+        The current version of `name`; if there is none, `build()` is called
+        (in one process at a time) and its result published.
+        """
+        obj, version = self.get(name)
+        if obj is not None:
+            return obj, version
+        os.makedirs(self._dir(name), exist_ok=True)
+        with open(os.path.join(self._dir(name), ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                obj, version = self.get(name)  # another worker may have built it while we waited
+                if obj is None:
+                    self.publish(name, build(), fmt)
+                    obj, version = self.get(name)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        return obj, version
+
+    def describe(self):
+        models = {}
+        for entry in sorted(os.listdir(self.directory)):
+            pointer = os.path.join(self.directory, entry, "CURRENT")
+            if os.path.exists(pointer):
+                with open(pointer) as f:
+                    current = f.read().strip()
+                name = unquote(entry)
+                loaded = self._loaded.get(name)
+                models[name] = {
+                    "current": current.rsplit(".", 1)[0],
+                    "bytes": os.path.getsize(os.path.join(self.directory, entry, current)),
+                    "loaded_here": loaded[1] if loaded else None,
+                }
+        return {"directory": self.directory, "pid": os.getpid(), "models": models, **self.stats}
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
 
 class LoginRequest(BaseModel):
@@ -32,7 +32,31 @@ class TelegramRequest(BaseModel):
     threat_level: str = ""
     timestamp: str = ""
 
+class AlertDispatchRequest(BaseModel):
+    message: str
+    region: str = ""
+    threat_level: str = "HIGH"
+    timestamp: str = ""
+    priority: Optional[int] = None  # overrides the threat level's priority (0 = most urgent)
+    # A channel is used when its recipients are given
+    phones: List[str] = []
+    textbee_api_key: str = ""
+    textbee_device_id: str = ""
+    bot_token: str = ""
+    chat_ids: List[str] = []
+    webhook_url: str = ""
+    data: Dict = {}
+
 class TelegramCheckRequest(BaseModel):
     bot_token: str
     chat_ids: List[str]
     min_timestamp: Optional[str] = None
+
+class SimulationParams(BaseModel):
+    # At most 1M animals; the simulator holds every animal in memory
+    n_herds: int = Field(100, ge=1, le=5000)
+    animals_per_herd: int = Field(50, ge=1, le=200)
+    dt_s: int = Field(60, ge=1, le=3600)
+    raid_rate: float = Field(0.02, ge=0, le=1)  # chance a herd is raided per night hour
+    start: Optional[str] = None  # ISO timestamp, defaults to 06:00 today
+    seed: Optional[int] = None
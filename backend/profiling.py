@@ -0,0 +1,153 @@
+"""
+On-demand sampling profiler for slow routes.
+
+A request is profiled when it carries `X-Ulinzi-Profile: <ULINZI_ADMIN_TOKEN>`
+or is picked by ULINZI_PROFILE_SAMPLE_RATE, and the work its route runs is
+wrapped with @profiled. Async routes hand that work to a thread (see
+run_model in main.py), which carries the request's context along. While it
+runs, a sampler thread reads that thread's stack every few milliseconds; the result is kept as collapsed stacks
+("root;caller;leaf count"), the input format of flamegraph.pl and speedscope.
+The last ULINZI_PROFILE_KEEP profiles are held in memory.
+"""
+import os
+import sys
+import time
+import random
+import secrets
+import inspect
+import functools
+import threading
+import contextvars
+from collections import Counter, deque
+from datetime import datetime
+
+from .config import ULINZI_ADMIN_TOKEN, PROFILE_SAMPLE_RATE, PROFILE_KEEP, PROFILE_INTERVAL_MS
+
+PROFILE_HEADER = b"x-ulinzi-profile"
+PROFILE_ID_HEADER = b"x-ulinzi-profile-id"
+
+# Set by the middleware for requests that should be profiled
+_request = contextvars.ContextVar("ulinzi_profile_request", default=None)
+
+_profiles = deque(maxlen=PROFILE_KEEP)
+_lock = threading.Lock()
+
+def _frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class _Sampler:
+    """Samples one thread's stack on a background thread until stopped."""
+    def __init__(self, thread_id, interval_s):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ulinzi-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+def profiled(func):
+    """
+    Decorator for the synchronous work of a route. Keeps the signature and
+    costs one ContextVar lookup when the request is not being profiled.
+    """
+    if inspect.iscoroutinefunction(func):
+        # A coroutine's frames are not on the thread being sampled while it awaits
+        raise TypeError(f"@profiled needs a synchronous function, got coroutine {func.__qualname__}")
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        request = _request.get()
+        if request is None:
+            return func(*args, **kwargs)
+
+        started = time.perf_counter()
+        with _Sampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000) as sampler:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile_id = secrets.token_hex(6)
+                request["profile_id"] = profile_id
+                with _lock:
+                    _profiles.append({
+                        "id": profile_id,
+                        "method": request["method"],
+                        "route": request["path"],
+                        "reason": request["reason"],
+                        "started_at": datetime.now().isoformat(timespec="seconds"),
+                        "duration_s": round(time.perf_counter() - started, 4),
+                        "interval_ms": PROFILE_INTERVAL_MS,
+                        "samples": sampler.samples,
+                        "stacks": sampler.stacks,
+                    })
+    return wrapper
+
+def is_admin(token):
+    return bool(ULINZI_ADMIN_TOKEN) and secrets.compare_digest(token or "", ULINZI_ADMIN_TOKEN)
+
+def list_profiles():
+    with _lock:
+        return [{k: v for k, v in p.items() if k != "stacks"} for p in reversed(_profiles)]
+
+def get_profile(profile_id):
+    with _lock:
+        for p in _profiles:
+            if p["id"] == profile_id:
+                return p
+    return None
+
+def collapsed(profile):
+    """Collapsed-stack text: one 'frame;frame;frame count' line per unique stack."""
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].most_common())
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that decides whether a request is profiled and, if
+    one was captured, returns its id in X-Ulinzi-Profile-Id.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        reason = None
+        token = dict(scope["headers"]).get(PROFILE_HEADER)
+        if token is not None and is_admin(token.decode("latin-1")):
+            reason = "header"
+        elif PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            reason = "sampled"
+        if reason is None:
+            return await self.app(scope, receive, send)
+
+        request = {"method": scope["method"], "path": scope["path"], "reason": reason, "profile_id": None}
+        _request.set(request)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and request["profile_id"]:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER, request["profile_id"].encode())
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,225 @@
+"""
+Declarative raid rules.
+
+Field teams write rules as Python-style expressions over telemetry columns
+in a JSON file (backend/rules.json by default), e.g.
+
+    {"name": "night_raid", "expr": "speed > 10 and 0 <= hour <= 6", "severity": "high"}
+
+Each expression is parsed once with `ast`, checked against a small whitelist
+and compiled into closures over numpy arrays, so a rule costs a few array
+operations per batch rather than a Python call per animal. Subexpressions
+shared between rules (`speed > 10` in twenty rules) are computed once per
+batch. The file is re-read when its mtime changes; a broken edit is reported
+and the previous rules stay active. A rule that fails on a batch (e.g. a
+comparison on a text column) is skipped for that batch and its error shown
+in /rules.
+"""
+import os
+import ast
+import json
+import time
+import threading
+import operator
+import numpy as np
+
+from .config import RULES_PATH
+
+# Short names field teams can use for telemetry columns
+ALIASES = {
+    "speed": "speed_kmh",
+    "hour": "hour_of_day",
+}
+
+_BINOPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+_CMPOPS = {
+    ast.Gt: operator.gt, ast.GtE: operator.ge, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Eq: operator.eq, ast.NotEq: operator.ne,
+}
+_FUNCS = {"abs": np.abs, "sqrt": np.sqrt, "min": np.minimum, "max": np.maximum}
+
+class RuleError(ValueError):
+    pass
+
+class _Compiler:
+    """Turns an expression AST into fn(columns, memo) -> array."""
+    def __init__(self):
+        self.columns = set()
+
+    def compile(self, node):
+        fn = self._compile(node)
+        key = ast.dump(node)
+
+        def memoized(cols, memo):
+            if key not in memo:
+                memo[key] = fn(cols, memo)
+            return memo[key]
+        return memoized
+
+    def _compile(self, node):
+        if isinstance(node, ast.Expression):
+            return self._compile(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, bool)):
+            value = node.value
+            return lambda cols, memo: value
+        if isinstance(node, ast.Name):
+            column = ALIASES.get(node.id, node.id)
+            self.columns.add(column)
+            return lambda cols, memo: cols[column]
+        if isinstance(node, ast.BoolOp):
+            parts = [self.compile(v) for v in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+            def boolop(cols, memo):
+                out = parts[0](cols, memo)
+                for part in parts[1:]:
+                    out = combine(out, part(cols, memo))
+                return out
+            return boolop
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            operand = self.compile(node.operand)
+            if isinstance(node.op, ast.Not):
+                return lambda cols, memo: np.logical_not(operand(cols, memo))
+            return lambda cols, memo: -operand(cols, memo)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+            op = _BINOPS[type(node.op)]
+            left, right = self.compile(node.left), self.compile(node.right)
+            return lambda cols, memo: op(left(cols, memo), right(cols, memo))
+        if isinstance(node, ast.Compare) and all(type(o) in _CMPOPS for o in node.ops):
+            if len(node.ops) == 1:
+                op = _CMPOPS[type(node.ops[0])]
+                left, right = self.compile(node.left), self.compile(node.comparators[0])
+                return lambda cols, memo: op(left(cols, memo), right(cols, memo))
+            # a < b <= c  ->  (a < b) & (b <= c), each pair memoized on its own
+            operands = [node.left] + node.comparators
+            pairs = [self.compile(ast.Compare(left=l, ops=[o], comparators=[r]))
+                     for l, o, r in zip(operands, node.ops, operands[1:])]
+            return lambda cols, memo: np.logical_and.reduce([p(cols, memo) for p in pairs])
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in _FUNCS and not node.keywords):
+            func = _FUNCS[node.func.id]
+            args = [self.compile(a) for a in node.args]
+            return lambda cols, memo: func(*(a(cols, memo) for a in args))
+        raise RuleError(f"unsupported syntax: {ast.unparse(node)}")
+
+def validate_rules(rules):
+    """Checks the shape of a parsed rules file before anything is compiled."""
+    if not isinstance(rules, list):
+        raise RuleError(f"rules file must be a JSON list of rules, got {type(rules).__name__}")
+    for rule in rules:
+        if not isinstance(rule, dict):
+            raise RuleError(f"each rule must be an object, got {rule!r}")
+        if not isinstance(rule.get("name"), str) or not isinstance(rule.get("expr"), str):
+            raise RuleError(f"rule needs string 'name' and 'expr': {rule}")
+        if not isinstance(rule.get("enabled", True), bool):
+            raise RuleError(f"{rule['name']}: 'enabled' must be true or false")
+    return rules
+
+def compile_rule(rule):
+    """Validates one rule dict and returns it with its evaluator and the columns it reads."""
+    if "name" not in rule or "expr" not in rule:
+        raise RuleError(f"rule needs 'name' and 'expr': {rule}")
+    try:
+        tree = ast.parse(rule["expr"], mode="eval")
+    except SyntaxError as e:
+        raise RuleError(f"{rule['name']}: {e.msg}") from None
+    compiler = _Compiler()
+    try:
+        evaluator = compiler.compile(tree.body)
+    except RuleError as e:
+        raise RuleError(f"{rule['name']}: {e}") from None
+    return {**rule, "columns": sorted(compiler.columns), "evaluator": evaluator}
+
+def _batch_len(columns):
+    for key in columns.keys():
+        return len(columns[key])
+    return 0
+
+class RuleSet:
+    def __init__(self, rules, version=None):
+        self.rules = [compile_rule(r) for r in validate_rules(rules) if r.get("enabled", True)]
+        self.version = version
+        self.errors = {}  # rule name -> last evaluation error
+
+    def evaluate(self, columns):
+        """
+        Evaluates every rule over a batch. `columns` maps column name to a 1-D
+        array (or a DataFrame). Returns {rule name: bool array}; rules whose
+        columns are missing from the batch are left out.
+        """
+        cols = {k: np.asarray(columns[k]) for k in columns.keys()}
+        n = _batch_len(cols)
+        memo = {}
+        results = {}
+        for rule in self.rules:
+            if all(c in cols for c in rule["columns"]):
+                try:
+                    results[rule["name"]] = np.broadcast_to(rule["evaluator"](cols, memo), (n,)).astype(bool)
+                except Exception as e:
+                    # One bad rule (or an odd column) must not fail the whole batch
+                    self.errors[rule["name"]] = f"{type(e).__name__}: {e}"
+        return results
+
+    def matches(self, columns):
+        """Bool array: True where any rule fired."""
+        results = self.evaluate(columns)
+        if not results:
+            return np.zeros(_batch_len(columns), dtype=bool)
+        return np.logical_or.reduce(list(results.values()))
+
+    def describe(self):
+        return [{**{k: v for k, v in r.items() if k != "evaluator"}, "last_error": self.errors.get(r["name"])}
+                for r in self.rules]
+
+class RuleEngine:
+    """
+    Holds the active RuleSet and reloads it when the rules file changes
+    (checked at most every `check_interval` seconds).
+    """
+    def __init__(self, path=RULES_PATH, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.error = None
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._ruleset = RuleSet([])
+        self._reload()
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self.error = f"{self.path} not found"
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path) as f:
+                ruleset = RuleSet(json.load(f), version=mtime)
+        except Exception as e:
+            # Keep serving the last good rules
+            self.error = str(e)
+            print(f"⚠️ Rules not reloaded: {e}")
+        else:
+            self._ruleset, self.error = ruleset, None
+        self._mtime = mtime
+
+    @property
+    def ruleset(self):
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            with self._lock:
+                if now - self._checked >= self.check_interval:
+                    self._checked = now
+                    self._reload()
+        return self._ruleset
+
+    def status(self):
+        ruleset = self.ruleset
+        return {"path": self.path, "version": ruleset.version, "error": self.error, "rules": ruleset.describe()}
+
+engine = RuleEngine()
@@ -0,0 +1,123 @@
+"""
+Lazy loading and startup profiling for the backend.
+
+Heavy subsystems (torch, sklearn, pandas, python-telegram-bot) are imported
+on first use or by a background warm-up that runs after the server has
+bound its port, so Render's cold start is not paying for them up front.
+Every load is timed and exposed through /startup/profile.
+
+Async code (routes on the event loop) uses aload(), which does a first
+import on a worker thread so the loop never blocks on it.
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+import importlib
+
+# Imported first by backend.main, so this is roughly when the app started loading
+PROCESS_START = time.perf_counter()
+
+_lock = threading.RLock()  # guards the profile and _module_locks; never held across an import
+_module_locks = {}  # module name -> lock, so only loads of the same module wait for each other
+_ssl_lock = threading.Lock()
+_profile = []  # one entry per module loaded through load()
+_warmup = {"enabled": os.getenv("ULINZI_WARMUP", "1") != "0", "started": None, "finished": None, "error": None}
+_ssl_ready = False
+
+def _since_start():
+    return round(time.perf_counter() - PROCESS_START, 4)
+
+def _initializing(module):
+    # A module another thread is still importing is in sys.modules but half-built
+    return getattr(getattr(module, "__spec__", None), "_initializing", False)
+
+def load(module_name, phase="first_use"):
+    """
+    Imports a module (once) and records how long it took.
+    Cheap after the first call: a sys.modules lookup.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None and not _initializing(module):
+        return module
+
+    with _lock:
+        module_lock = _module_locks.setdefault(module_name, threading.RLock())
+    with module_lock:
+        module = sys.modules.get(module_name)
+        if module is not None and not _initializing(module):
+            return module
+        t0 = time.perf_counter()
+        module = importlib.import_module(module_name)
+        record(module_name, time.perf_counter() - t0, phase)
+        return module
+
+async def aload(module_name, phase="first_use"):
+    """load() for the event loop: a first import runs on a worker thread."""
+    module = sys.modules.get(module_name)
+    if module is not None and not _initializing(module):
+        return module
+    return await asyncio.to_thread(load, module_name, phase)
+
+def ensure_ssl():
+    """
+    Uses the system certificate store (truststore) with certifi as fallback.
+    Done once, before the first outbound provider call.
+    """
+    global _ssl_ready
+    if _ssl_ready:
+        return
+    with _ssl_lock:
+        if _ssl_ready:
+            return
+        t0 = time.perf_counter()
+        truststore = load("truststore", phase="ssl")
+        certifi = load("certifi", phase="ssl")
+        truststore.inject_into_ssl()
+        os.environ["SSL_CERT_FILE"] = certifi.where()
+        record("ssl_setup", time.perf_counter() - t0, "ssl")
+        _ssl_ready = True
+
+def ssl_ready():
+    return _ssl_ready
+
+def start_warmup(steps):
+    """
+    Runs the warm-up steps on a daemon thread. Called from the app's startup
+    hook, which returns immediately so uvicorn can bind the port while the
+    models load.
+    """
+    if not _warmup["enabled"]:
+        return None
+
+    def run():
+        _warmup["started"] = _since_start()
+        try:
+            for step in steps:
+                step()
+        except Exception as e:
+            # Anything that failed here is simply loaded again on first use
+            _warmup["error"] = str(e)
+        _warmup["finished"] = _since_start()
+        print(f"🔥 Warm-up finished in {_warmup['finished'] - _warmup['started']:.2f}s")
+
+    thread = threading.Thread(target=run, name="ulinzi-warmup", daemon=True)
+    thread.start()
+    return thread
+
+def record(name, seconds, phase):
+    """Adds a non-import step (e.g. fitting a model) to the profile."""
+    with _lock:
+        _profile.append({"module": name, "seconds": round(seconds, 4), "phase": phase,
+                         "at_s": _since_start(), "thread": threading.current_thread().name})
+
+def report(app_ready_s=None):
+    with _lock:
+        modules = sorted(_profile, key=lambda p: p["seconds"], reverse=True)
+        return {
+            "app_ready_s": app_ready_s,
+            "uptime_s": _since_start(),
+            "warmup": dict(_warmup),
+            "modules": modules,
+        }
@@ -0,0 +1,216 @@
+"""
+Streaming anomaly detector for live cattle telemetry (Half-Space Trees,
+Tan, Ting & Liu 2011).
+
+Unlike the batch IsolationForest, which is fitted once, this model keeps
+learning from the telemetry it scores. Each observation costs
+O(n_trees * depth) and memory is fixed: two mass counters per tree node.
+Masses are counted in a "latest" window and swapped into the "reference"
+window every `window_size` observations, so the model follows seasonal and
+regional drift while forgetting old behaviour.
+"""
+import os
+import tempfile
+import threading
+import numpy as np
+
+# Features scored, and the range each is expected to live in
+FEATURES = ("speed_kmh", "hour_of_day")
+FEATURE_RANGES = ((0.0, 30.0), (0.0, 24.0))
+
+class HalfSpaceTrees:
+    def __init__(self, n_trees=25, depth=8, window_size=250, size_limit=None,
+                 feature_ranges=FEATURE_RANGES, threshold=0.01, seed=42):
+        self.n_trees = n_trees
+        self.depth = depth
+        self.window_size = window_size
+        self.size_limit = size_limit if size_limit is not None else 0.1 * window_size
+        self.threshold = threshold  # normalised mass below which a point is anomalous
+        self.n_features = len(feature_ranges)
+
+        n_nodes = 2 ** (depth + 1) - 1
+        self.split_dim, self.split_val = self._build(np.asarray(feature_ranges, dtype=float), n_nodes, seed)
+        self.ref_mass = np.zeros((n_trees, n_nodes), dtype=np.float64)
+        self.latest_mass = np.zeros((n_trees, n_nodes), dtype=np.float64)
+        self.window_count = 0
+        self.n_seen = 0
+        self._trees = np.arange(n_trees)[:, None]
+        self._lock = threading.Lock()
+
+    def _build(self, ranges, n_nodes, seed):
+        """Random work-space per tree, then halve a random dimension at every internal node."""
+        rng = np.random.default_rng(seed)
+        lo, hi = ranges[:, 0], ranges[:, 1]
+        s = rng.uniform(lo, hi, size=(self.n_trees, self.n_features))
+        r = 2 * np.maximum(s - lo, hi - s)
+        node_min = np.zeros((self.n_trees, n_nodes, self.n_features))
+        node_max = np.zeros((self.n_trees, n_nodes, self.n_features))
+        node_min[:, 0], node_max[:, 0] = s - r, s + r
+
+        split_dim = np.zeros((self.n_trees, n_nodes), dtype=np.int64)
+        split_val = np.zeros((self.n_trees, n_nodes), dtype=np.float64)
+        trees = np.arange(self.n_trees)
+        for node in range(2 ** self.depth - 1):
+            dim = rng.integers(0, self.n_features, size=self.n_trees)
+            mid = (node_min[trees, node, dim] + node_max[trees, node, dim]) / 2
+            split_dim[:, node], split_val[:, node] = dim, mid
+            left, right = 2 * node + 1, 2 * node + 2
+            node_min[:, left], node_max[:, left] = node_min[:, node], node_max[:, node]
+            node_min[:, right], node_max[:, right] = node_min[:, node], node_max[:, node]
+            node_max[trees, left, dim] = mid
+            node_min[trees, right, dim] = mid
+        return split_dim, split_val
+
+    def _paths(self, X):
+        """Yields (level, node index per tree and point) from the root to the leaves."""
+        nodes = np.zeros((self.n_trees, len(X)), dtype=np.int64)
+        points = np.arange(len(X))[None, :]
+        for level in range(self.depth + 1):
+            yield level, nodes
+            if level == self.depth:
+                break
+            right = X[points, self.split_dim[self._trees, nodes]] >= self.split_val[self._trees, nodes]
+            nodes = 2 * nodes + 1 + right
+
+    def score(self, X):
+        """
+        Mass score of each point averaged over trees, normalised to [0, 1] by
+        its maximum (a whole window in one leaf). Dense regions score high,
+        regions the reference window barely saw score near 0.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        with self._lock:
+            score = np.zeros((self.n_trees, len(X)))
+            done = np.zeros((self.n_trees, len(X)), dtype=bool)
+            for level, nodes in self._paths(X):
+                mass = self.ref_mass[self._trees, nodes]
+                terminal = ~done & ((mass < self.size_limit) | (level == self.depth))
+                score[terminal] = mass[terminal] * 2.0 ** level
+                done |= terminal
+        return score.mean(axis=0) / (self.window_size * 2.0 ** self.depth)
+
+    def predict(self, X):
+        """Same convention as sklearn's IsolationForest: -1 anomalous, 1 normal."""
+        return np.where(self.score(X) < self.threshold, -1, 1)
+
+    def learn(self, X):
+        """Adds observations to the latest window, swapping windows when it fills."""
+        X = np.asarray(X, dtype=np.float64)
+        with self._lock:
+            while len(X):
+                take = self.window_size - self.window_count
+                chunk, X = X[:take], X[take:]
+                for _, nodes in self._paths(chunk):
+                    np.add.at(self.latest_mass, (np.broadcast_to(self._trees, nodes.shape), nodes), 1)
+                self.window_count += len(chunk)
+                self.n_seen += len(chunk)
+                if self.window_count >= self.window_size:
+                    self.ref_mass, self.latest_mass = self.latest_mass, np.zeros_like(self.latest_mass)
+                    self.window_count = 0
+
+    # --- Checkpointing ---
+    def save(self, path):
+        """Atomically writes the model state to an .npz file."""
+        with self._lock:
+            state = {
+                "params": np.array([self.n_trees, self.depth, self.window_size, self.n_features]),
+                "size_limit": np.array(self.size_limit),
+                "threshold": np.array(self.threshold),
+                "split_dim": self.split_dim,
+                "split_val": self.split_val,
+                "ref_mass": self.ref_mass,
+                "latest_mass": self.latest_mass,
+                "counts": np.array([self.window_count, self.n_seen]),
+            }
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # Unique temp file: concurrent saves (threads, or workers sharing STATE_DIR) never share one
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **state)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as state:
+            n_trees, depth, window_size, n_features = (int(v) for v in state["params"])
+            model = cls.__new__(cls)
+            model.n_trees, model.depth, model.window_size, model.n_features = n_trees, depth, window_size, n_features
+            model.size_limit = float(state["size_limit"])
+            model.threshold = float(state["threshold"])
+            model.split_dim = state["split_dim"]
+            model.split_val = state["split_val"]
+            model.ref_mass = state["ref_mass"]
+            model.latest_mass = state["latest_mass"]
+            model.window_count, model.n_seen = (int(v) for v in state["counts"])
+        model._trees = np.arange(n_trees)[:, None]
+        model._lock = threading.Lock()
+        return model
+
+    def stats(self):
+        return {
+            "n_trees": self.n_trees,
+            "depth": self.depth,
+            "window_size": self.window_size,
+            "window_fill": self.window_count,
+            "observations_seen": self.n_seen,
+            "threshold": self.threshold,
+            "memory_bytes": int(self.ref_mass.nbytes + self.latest_mass.nbytes
+                                + self.split_dim.nbytes + self.split_val.nbytes),
+        }
+
+# --- Live model ---
+CHECKPOINT_NAME = "half_space_trees.npz"
+
+class StreamingDetector:
+    """
+    The live model plus its checkpointing: loads the last checkpoint (or seeds
+    from synthetic normal grazing), learns from scored telemetry and writes a
+    checkpoint every `checkpoint_every` learned observations.
+    """
+    def __init__(self, state_dir, checkpoint_every=500):
+        self.path = os.path.join(state_dir, CHECKPOINT_NAME)
+        self.checkpoint_every = checkpoint_every
+        self._since_checkpoint = 0
+        self._lock = threading.Lock()  # guards _since_checkpoint
+        self._save_lock = threading.Lock()  # one checkpoint write at a time
+        if os.path.exists(self.path):
+            self.model = HalfSpaceTrees.load(self.path)
+            self.source = "checkpoint"
+        else:
+            from .logic import get_cattle_data
+            self.model = HalfSpaceTrees()
+            seed = get_cattle_data("Normal", num_cows=2 * self.model.window_size, center_lat=0, center_lon=0)
+            self.model.learn(seed[list(FEATURES)].to_numpy())
+            self.source = "synthetic_seed"
+
+    def predict(self, X):
+        return self.model.predict(X)
+
+    def learn(self, X):
+        if len(X) == 0:
+            return
+        self.model.learn(X)
+        with self._lock:
+            self._since_checkpoint += len(X)
+            due = self._since_checkpoint >= self.checkpoint_every
+            if due:
+                self._since_checkpoint = 0
+        if due:
+            self._save()
+
+    def checkpoint(self):
+        with self._lock:
+            self._since_checkpoint = 0
+        self._save()
+
+    def _save(self):
+        with self._save_lock:
+            self.model.save(self.path)
+
+    def stats(self):
+        return {**self.model.stats(), "source": self.source, "checkpoint": self.path}
@@ -4,21 +4,73 @@ Replaces n8n webhook with direct Telegram API calls
 Supports multi-user verification with consensus voting
 """
 
+import time
 import asyncio
-import ssl
-import certifi
-import os
-import truststore
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.request import HTTPXRequest
 from telegram.error import TelegramError
 from datetime import datetime
 
-# Inject truststore to use system certificate store
-truststore.inject_into_ssl()
-
-# Set SSL certificate file to certifi's bundle as fallback
-os.environ['SSL_CERT_FILE'] = certifi.where()
+from .config import TELEGRAM_API_BASE_URL, PROVIDER_MAX_CONNECTIONS
+from .startup import ensure_ssl
+from .metrics import observe_provider
+
+# Use system certificate store (truststore), certifi's bundle as fallback
+ensure_ssl()
+
+# One Bot (and its pooled HTTP client) per token, reused across requests on the app's event loop.
+# Bots are reference-counted: one pushed out of the cache is shut down once no request uses it.
+class _CachedBot:
+    def __init__(self, bot):
+        self.bot = bot
+        self.users = 0
+        self.evicted = False
+
+_bots = OrderedDict()  # token -> _CachedBot
+MAX_BOTS = 16
+
+@asynccontextmanager
+async def bot_session(bot_token: str):
+    """The token's shared Bot, held for the duration of the block."""
+    entry = _bots.get(bot_token)
+    if entry is None:
+        entry = _bots[bot_token] = _CachedBot(Bot(token=bot_token, base_url=TELEGRAM_API_BASE_URL,
+                                                  request=HTTPXRequest(connection_pool_size=PROVIDER_MAX_CONNECTIONS)))
+    else:
+        _bots.move_to_end(bot_token)
+    entry.users += 1
+    try:
+        while len(_bots) > MAX_BOTS:
+            _, old = _bots.popitem(last=False)
+            old.evicted = True
+            if old.users == 0:
+                await old.bot.shutdown()
+        yield entry.bot
+    finally:
+        entry.users -= 1
+        if entry.evicted and entry.users == 0:
+            await entry.bot.shutdown()
+
+async def aclose():
+    """Closes every cached Bot's connections (app shutdown)."""
+    while _bots:
+        _, entry = _bots.popitem()
+        entry.evicted = True  # one still in use is shut down when its request ends
+        if entry.users == 0:
+            await entry.bot.shutdown()
+
+async def _timed(call):
+    """Awaits a Bot API call, recording its latency and outcome as provider 'telegram'."""
+    t0 = time.perf_counter()
+    try:
+        result = await call
+    except Exception:
+        observe_provider("telegram", time.perf_counter() - t0, ok=False)
+        raise
+    observe_provider("telegram", time.perf_counter() - t0, ok=True)
+    return result
 
 async def send_telegram_alert_async(bot_token: str, chat_id: str, message: str, 
                                     region: str = "", threat_level: str = "", 
@@ -28,9 +80,6 @@ async def send_telegram_alert_async(bot_token: str, chat_id: str, message: str,
     Uses async to avoid blocking.
     """
     try:
-        # Bot uses certifi by default, and we've set SSL_CERT_FILE env var
-        bot = Bot(token=bot_token)
-        
         # Format message with Markdown
         formatted_message = f"""
 🚨 *ULINZI ALERT SYSTEM* 🚨
@@ -51,12 +100,13 @@ _Click a button below to verify:_
         ]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await bot.send_message(
-            chat_id=chat_id,
-            text=formatted_message.strip(),
-            parse_mode='Markdown',
-            reply_markup=reply_markup
-        )
+        async with bot_session(bot_token) as bot:
+            await _timed(bot.send_message(
+                chat_id=chat_id,
+                text=formatted_message.strip(),
+                parse_mode='Markdown',
+                reply_markup=reply_markup
+            ))
         
         return True, "Telegram alert sent successfully"
         
@@ -73,7 +123,6 @@ async def send_telegram_to_multiple_async(bot_token: str, chat_ids: list, messag
     Send alert to multiple Telegram users with interactive buttons.
     Returns success count and any errors.
     """
-    bot = Bot(token=bot_token)
     results = {"success": 0, "failed": 0, "errors": []}
     
     formatted_message = f"""
@@ -95,18 +144,23 @@ _Click a button below to verify:_
     ]]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    for chat_id in chat_ids:
-        try:
-            await bot.send_message(
+    # All chats at once; total time is the slowest send, not the sum
+    async with bot_session(bot_token) as bot:
+        sends = await asyncio.gather(*(
+            _timed(bot.send_message(
                 chat_id=chat_id.strip(),
                 text=formatted_message.strip(),
                 parse_mode='Markdown',
                 reply_markup=reply_markup
-            )
-            results["success"] += 1
-        except Exception as e:
+            ))
+            for chat_id in chat_ids
+        ), return_exceptions=True)
+    for chat_id, sent in zip(chat_ids, sends):
+        if isinstance(sent, Exception):
             results["failed"] += 1
-            results["errors"].append(f"Chat {chat_id}: {str(e)}")
+            results["errors"].append(f"Chat {chat_id}: {str(sent)}")
+        else:
+            results["success"] += 1
     
     return results
 
@@ -116,15 +170,17 @@ async def check_telegram_responses_async(bot_token: str, chat_ids: list, min_tim
     Check for responses from Telegram users.
     Similar to SMS checking - looks for keywords in recent messages.
     """
-    bot = Bot(token=bot_token)
     responses = []
     
     try:
+        # One getUpdates call serves every chat
+        try:
+            async with bot_session(bot_token) as bot:
+                updates = await _timed(bot.get_updates(allowed_updates=["message"]))
+        except Exception:
+            updates = []
         for chat_id in chat_ids:
             try:
-                # Get recent updates for this chat
-                updates = await bot.get_updates(allowed_updates=["message"])
-                
                 for update in updates:
                     if update.message and str(update.message.chat.id) == str(chat_id).strip():
                         msg_text = update.message.text.upper() if update.message.text else ""
@@ -153,51 +209,24 @@ async def check_telegram_responses_async(bot_token: str, chat_ids: list, min_tim
         return False, f"Error checking responses: {str(e)}"
 
 
-def send_telegram_alert(bot_token: str, chat_id: str, message: str,
-                       region: str = "", threat_level: str = "", 
-                       timestamp: str = ""):
-    """
-    Synchronous wrapper for sending Telegram alerts.
-    Creates new event loop to run async function.
-    """
+async def send_telegram_alert(bot_token: str, chat_id: str, message: str,
+                              region: str = "", threat_level: str = "",
+                              timestamp: str = ""):
+    """Sends one alert, returning (success, message)."""
     if not bot_token or not chat_id:
         return False, "Missing bot token or chat ID"
-    
-    try:
-        # Create new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        # Run async function
-        success, msg = loop.run_until_complete(
-            send_telegram_alert_async(bot_token, chat_id, message, region, threat_level, timestamp)
-        )
-        
-        loop.close()
-        return success, msg
-        
-    except Exception as e:
-        return False, f"Failed to send Telegram alert: {str(e)}"
+    return await send_telegram_alert_async(bot_token, chat_id, message, region, threat_level, timestamp)
 
 
-def send_telegram_to_multiple(bot_token: str, chat_ids: list, message: str,
-                              region: str = "", threat_level: str = "",
-                              timestamp: str = ""):
-    """
-    Synchronous wrapper for sending to multiple users.
-    """
+async def send_telegram_to_multiple(bot_token: str, chat_ids: list, message: str,
+                                    region: str = "", threat_level: str = "",
+                                    timestamp: str = ""):
+    """Sends to every chat concurrently, returning (success, summary)."""
     if not bot_token or not chat_ids:
         return False, "Missing bot token or chat IDs"
     
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        results = loop.run_until_complete(
-            send_telegram_to_multiple_async(bot_token, chat_ids, message, region, threat_level, timestamp)
-        )
-        
-        loop.close()
+        results = await send_telegram_to_multiple_async(bot_token, chat_ids, message, region, threat_level, timestamp)
         
         if results["success"] > 0:
             return True, f"Sent to {results['success']}/{len(chat_ids)} users"
@@ -208,28 +237,12 @@ def send_telegram_to_multiple(bot_token: str, chat_ids: list, message: str,
         return False, f"Failed: {str(e)}"
 
 
-def check_telegram_responses(bot_token: str, chat_ids: list, min_timestamp=None):
-    """
-    Synchronous wrapper for checking Telegram responses.
-    """
+async def check_telegram_responses(bot_token: str, chat_ids: list, min_timestamp=None):
+    """Checks for verification replies, returning (success, responses or error)."""
     if not bot_token or not chat_ids:
-        return False, "Missing bot token or chat IDs", []
+        return False, "Missing bot token or chat IDs"
     
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        success, responses = loop.run_until_complete(
-            check_telegram_responses_async(bot_token, chat_ids, min_timestamp)
-        )
-        
-        loop.close()
-        
-        if success:
-            return True, responses
-        else:
-            return False, responses
-        
+        return await check_telegram_responses_async(bot_token, chat_ids, min_timestamp)
     except Exception as e:
         return False, f"Error: {str(e)}"
-
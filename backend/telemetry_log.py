@@ -0,0 +1,130 @@
+"""
+Telemetry recorder for incident reproduction and detector comparisons.
+
+When ULINZI_RECORD_DIR is set, every batch scored by /cattle/predict is
+buffered with its verdicts and written as a compressed columnar segment
+(.npz, one array per column) every `segment_rows` fixes or
+`segment_seconds`, whichever comes first, and at shutdown. A segment only
+holds batches with the same columns; a schema change starts a new one.
+
+replay.py reads the segments back (read_batches) and pushes them into a
+backend at the original pace, N times faster, or as fast as it can.
+"""
+import os
+import glob
+import json
+import time
+import threading
+import numpy as np
+
+def _column(values):
+    a = np.asarray(values)
+    if a.dtype != object:
+        return a
+    if any(isinstance(v, (list, dict)) for v in a):  # nested fields are stored as JSON text
+        return np.array([json.dumps(v, default=str) if isinstance(v, (list, dict)) else str(v) for v in a], dtype=str)
+    return a.astype(str)
+
+class TelemetryRecorder:
+    def __init__(self, directory, segment_rows=50_000, segment_seconds=60.0):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.segment_seconds = segment_seconds
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._segments = 0
+        self._reset()
+
+    def _reset(self):
+        self._schema = None
+        self._batches = []
+        self._rows = 0
+        self._opened = time.time()
+
+    def record(self, df, verdicts, region=None, herd=None, received_at=None, latency_ms=None):
+        """Buffers one scored batch (DataFrame + bool verdict per row)."""
+        schema = tuple(df.columns)
+        batch = {
+            "columns": {c: _column(df[c].to_numpy()) for c in schema},
+            "verdict": np.asarray(verdicts, dtype=bool),
+            "received_at": received_at if received_at is not None else time.time(),
+            "latency_ms": latency_ms if latency_ms is not None else np.nan,
+            "region": region or "",
+            "herd": herd or "",
+        }
+        full = []  # segments ready to write, each with a single schema
+        with self._lock:
+            if self._schema is not None and schema != self._schema:
+                full.append(self._take())
+            self._schema = schema
+            batch["seq"] = self._seq
+            self._seq += 1
+            self._batches.append(batch)
+            self._rows += len(df)
+            if self._rows >= self.segment_rows or time.time() - self._opened >= self.segment_seconds:
+                full.append(self._take())
+        for batches in full:
+            self._write(batches)
+
+    def _take(self):
+        batches = self._batches
+        self._reset()
+        return batches
+
+    def flush(self):
+        with self._lock:
+            batches = self._take()
+        if batches:
+            self._write(batches)
+
+    def _write(self, batches):
+        arrays = {
+            "batch_seq": np.array([b["seq"] for b in batches], dtype=np.int64),
+            "batch_received_at": np.array([b["received_at"] for b in batches], dtype=np.float64),
+            "batch_latency_ms": np.array([b["latency_ms"] for b in batches], dtype=np.float64),
+            "batch_rows": np.array([len(b["verdict"]) for b in batches], dtype=np.int64),
+            "batch_region": np.array([b["region"] for b in batches], dtype=str),
+            "batch_herd": np.array([b["herd"] for b in batches], dtype=str),
+            "verdict": np.concatenate([b["verdict"] for b in batches]),
+        }
+        for name in batches[0]["columns"]:
+            arrays[f"col__{name}"] = np.concatenate([b["columns"][name] for b in batches])
+
+        with self._lock:
+            self._segments += 1
+            name = f"segment-{int(batches[0]['received_at'] * 1000)}-{os.getpid()}-{self._segments:05d}.npz"
+        path = os.path.join(self.directory, name)
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+
+def read_batches(directory):
+    """
+    Returns the recorded batches in the order they were received, across
+    all segments (and all worker processes) in `directory`.
+    """
+    batches = []
+    for path in sorted(glob.glob(os.path.join(directory, "segment-*.npz"))):
+        with np.load(path) as npz:
+            seg = {k: npz[k] for k in npz.files}  # each npz[k] access decompresses again
+        columns = {k[len("col__"):]: v for k, v in seg.items() if k.startswith("col__")}
+        bounds = np.concatenate([[0], np.cumsum(seg["batch_rows"])])
+        for i in range(len(seg["batch_rows"])):
+            lo, hi = bounds[i], bounds[i + 1]
+            batches.append({
+                "seq": int(seg["batch_seq"][i]),
+                "received_at": float(seg["batch_received_at"][i]),
+                "latency_ms": float(seg["batch_latency_ms"][i]),
+                "region": str(seg["batch_region"][i]) or None,
+                "herd": str(seg["batch_herd"][i]) or None,
+                "columns": {k: v[lo:hi] for k, v in columns.items()},
+                "verdict": seg["verdict"][lo:hi],
+            })
+    batches.sort(key=lambda b: b["received_at"])
+    return batches
+
+def to_records(columns):
+    """Columns of one batch -> JSON-ready list of dicts."""
+    lists = {k: v.tolist() for k, v in columns.items()}
+    return [dict(zip(lists, row)) for row in zip(*lists.values())]
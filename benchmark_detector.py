@@ -0,0 +1,215 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import platform
+from datetime import datetime
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+from detector import resolve_model_path
+
+# Accuracy + latency benchmark for the herd detector over valid/ and test/.
+# Results are written as JSON so two model versions (or two runs of the same
+# one) can be compared with --compare.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_YAML = os.path.join(SCRIPT_DIR, "data.yaml")
+SPLITS = {"valid": "val", "test": "test"}  # folder -> data.yaml key
+
+def file_digest(path):
+    """sha256 of a model file, or of every file in an exported model directory."""
+    h = hashlib.sha256()
+    paths = sorted(glob.glob(os.path.join(path, "**", "*"), recursive=True)) if os.path.isdir(path) else [path]
+    for p in paths:
+        if os.path.isfile(p):
+            with open(p, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+    return h.hexdigest()[:16]
+
+def load_split_images(split, limit=None):
+    files = sorted(glob.glob(os.path.join(SCRIPT_DIR, split, "images", "*")))[:limit]
+    return [cv2.imread(f) for f in files]
+
+def percentiles(samples_ms):
+    a = np.asarray(samples_ms)
+    return {
+        "p50_ms": round(float(np.percentile(a, 50)), 2),
+        "p95_ms": round(float(np.percentile(a, 95)), 2),
+        "p99_ms": round(float(np.percentile(a, 99)), 2),
+        "mean_ms": round(float(a.mean()), 2),
+    }
+
+def measure_accuracy(model_path, split, imgsz):
+    metrics = YOLO(model_path, task="detect").val(
+        data=DATA_YAML, split=SPLITS[split], imgsz=imgsz, batch=1, device="cpu", plots=False, verbose=False
+    )
+    return {
+        "split": split,
+        "imgsz": imgsz,
+        "map50": round(float(metrics.box.map50), 4),
+        "map50_95": round(float(metrics.box.map), 4),
+    }
+
+def measure_latency(model, images, imgsz, batch, repeats=3, warmup=2):
+    """
+    Times model.predict end to end (preprocess + inference + NMS) per batch.
+    Returns batch latency percentiles and throughput in images/second.
+    """
+    batches = [images[i:i + batch] for i in range(0, len(images), batch)]
+    batches = [b for b in batches if len(b) == batch] or batches[:1]
+
+    for b in batches[:warmup]:
+        model.predict(b, imgsz=imgsz, batch=len(b), device="cpu", verbose=False)
+
+    samples, n_images = [], 0
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for b in batches:
+            t0 = time.perf_counter()
+            model.predict(b, imgsz=imgsz, batch=len(b), device="cpu", verbose=False)
+            samples.append((time.perf_counter() - t0) * 1000)
+            n_images += len(b)
+    elapsed = time.perf_counter() - start
+
+    return {
+        **percentiles(samples),
+        "per_image_p50_ms": round(float(np.percentile(samples, 50)) / batch, 2),
+        "images_per_s": round(n_images / elapsed, 2),
+        "batches": len(samples),
+    }
+
+def run_benchmark(model_path, batch_sizes=(1, 4, 8), imgszs=(640,), threads=(1, 2, 4),
+                  splits=("valid", "test"), limit=None, repeats=3):
+    report = {
+        "model": os.path.relpath(os.path.abspath(model_path), SCRIPT_DIR),
+        "model_digest": file_digest(model_path),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "platform": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "torch": torch.__version__,
+        },
+        "accuracy": [],
+        "latency": [],
+    }
+
+    for split in splits:
+        for imgsz in imgszs:
+            print(f"📊 Accuracy: {split} @ {imgsz}")
+            try:
+                report["accuracy"].append(measure_accuracy(model_path, split, imgsz))
+            except Exception as e:
+                report["accuracy"].append({"split": split, "imgsz": imgsz, "error": str(e)})
+
+    # Latency is measured on the test split (the larger one)
+    images = load_split_images("test", limit)
+    model = YOLO(model_path, task="detect")
+    default_threads = torch.get_num_threads()
+    try:
+        for n_threads in threads:
+            # Thread count applies to the PyTorch backend; ONNX Runtime / OpenVINO manage their own pools
+            torch.set_num_threads(n_threads)
+            for imgsz in imgszs:
+                for batch in batch_sizes:
+                    print(f"⏱️  Latency: threads={n_threads} imgsz={imgsz} batch={batch}")
+                    row = {"threads": n_threads, "imgsz": imgsz, "batch": batch}
+                    try:
+                        row.update(measure_latency(model, images, imgsz, batch, repeats=repeats))
+                    except Exception as e:
+                        # Static-shape exports only accept their export size/batch
+                        row["error"] = str(e)
+                    report["latency"].append(row)
+    finally:
+        torch.set_num_threads(default_threads)
+
+    return report
+
+def compare(baseline, current, map_tolerance=0.01, latency_tolerance=0.10):
+    """
+    Prints accuracy and latency deltas between two reports and returns the
+    list of regressions (mAP drop > map_tolerance, p95 up > latency_tolerance).
+    """
+    regressions = []
+
+    def key_acc(r):
+        return (r["split"], r["imgsz"])
+
+    def key_lat(r):
+        return (r["threads"], r["imgsz"], r["batch"])
+
+    base_acc = {key_acc(r): r for r in baseline["accuracy"] if "error" not in r}
+    for r in current["accuracy"]:
+        b = base_acc.get(key_acc(r))
+        if b is None or "error" in r:
+            continue
+        for metric in ("map50", "map50_95"):
+            delta = r[metric] - b[metric]
+            print(f"{r['split']:<6} imgsz={r['imgsz']:<5} {metric:<9} {b[metric]:.4f} -> {r[metric]:.4f} ({delta:+.4f})")
+            if delta < -map_tolerance:
+                regressions.append(f"{metric} on {r['split']}@{r['imgsz']} dropped {delta:+.4f}")
+
+    base_lat = {key_lat(r): r for r in baseline["latency"] if "error" not in r}
+    for r in current["latency"]:
+        b = base_lat.get(key_lat(r))
+        if b is None or "error" in r:
+            continue
+        change = r["p95_ms"] / b["p95_ms"] - 1
+        print(f"threads={r['threads']} imgsz={r['imgsz']} batch={r['batch']:<3} "
+              f"p95 {b['p95_ms']:.1f} -> {r['p95_ms']:.1f} ms ({change:+.1%}), "
+              f"{b['images_per_s']:.1f} -> {r['images_per_s']:.1f} img/s")
+        if change > latency_tolerance:
+            regressions.append(f"p95 latency threads={r['threads']} imgsz={r['imgsz']} batch={r['batch']} up {change:+.1%}")
+
+    return regressions
+
+def _ints(text):
+    return tuple(int(v) for v in text.split(","))
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark herd detector accuracy and latency")
+    parser.add_argument("--model", default=None, help="Model artifact (defaults to the one detector.py would load)")
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    parser.add_argument("--imgsz", default="640")
+    parser.add_argument("--threads", default="1,2,4")
+    parser.add_argument("--limit", type=int, default=None, help="Max test images used for latency")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_detector.json")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to compare against; exits 1 on regression")
+    args = parser.parse_args()
+
+    model_path = args.model or resolve_model_path()
+    if not os.path.exists(model_path):
+        print(f"⚠️ {model_path} not found. Train or export a model first.")
+        sys.exit(1)
+
+    report = run_benchmark(
+        model_path,
+        batch_sizes=_ints(args.batch_sizes),
+        imgszs=_ints(args.imgsz),
+        threads=_ints(args.threads),
+        limit=args.limit,
+        repeats=args.repeats,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report)
+        if regressions:
+            print("❌ Regressions:")
+            for r in regressions:
+                print(f"   - {r}")
+            sys.exit(1)
+        print("✅ No regressions")
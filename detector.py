@@ -1,13 +1,36 @@
 from ultralytics import YOLO
 import cv2
 import os
+import hashlib
+import threading
 import numpy as np
 from PIL import Image
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Exported artifacts (see export_model.py), fastest on CPU first.
+# ULINZI_DETECTOR_MODEL forces a specific one.
+MODEL_CANDIDATES = [
+    "yolo_model_int8_openvino_model",
+    "yolo_model_openvino_model",
+    "yolo_model_int8.onnx",
+    "yolo_model.onnx",
+    "yolo_model.pt",
+]
+
+def resolve_model_path():
+    override = os.getenv("ULINZI_DETECTOR_MODEL")
+    if override:
+        return override
+    for candidate in MODEL_CANDIDATES:
+        if os.path.exists(candidate):
+            return candidate
+    return "yolo_model.pt"
 
 # Check if model exists to prevent crashes
-model_path = "yolo_model.pt"
+model_path = resolve_model_path()
 if os.path.exists(model_path):
-    model = YOLO(model_path)
+    model = YOLO(model_path, task="detect")
 else:
     print(f"⚠️ Warning: {model_path} not found. Training needed.")
     model = None
@@ -28,32 +51,304 @@ def detect_objects(image: Image.Image):
     
     return image_with_boxes
 
-def find_anomalies_yolo(new_image_path):
+# --- Detection output ---
+# Detections come back as a structured array (one row per box) rather than a
+# list of tuples, so callers can slice columns without Python loops.
+DETECTION_DTYPE = np.dtype([
+    ("x1", "f4"), ("y1", "f4"), ("x2", "f4"), ("y2", "f4"),
+    ("cx", "f4"), ("cy", "f4"), ("conf", "f4"), ("cls", "i2"),
+])
+GEO_DETECTION_DTYPE = np.dtype(DETECTION_DTYPE.descr + [("lon", "f8"), ("lat", "f8")])
+
+ANNOTATION_FORMATS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", None),
+}
+
+_thread_models = threading.local()
+
+def _get_thread_model():
+    # Ultralytics predictors are not thread-safe, so each thread gets its own copy
+    if not hasattr(_thread_models, "model"):
+        _thread_models.model = YOLO(model_path, task="detect")
+    return _thread_models.model
+
+# Long-lived tile pools (one per worker count), so each thread loads its model once, not once per scan
+_tile_pools = {}
+_tile_pools_lock = threading.Lock()
+
+def _tile_pool(workers):
+    with _tile_pools_lock:
+        pool = _tile_pools.get(workers)
+        if pool is None:
+            pool = _tile_pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ulinzi-tiles")
+        return pool
+
+def to_detections(xyxy, conf, cls, dtype=DETECTION_DTYPE):
+    """Packs box, confidence and class arrays into a structured detection array."""
+    out = np.zeros(len(xyxy), dtype=dtype)
+    if len(xyxy):
+        out["x1"], out["y1"], out["x2"], out["y2"] = xyxy.T
+        out["cx"] = (xyxy[:, 0] + xyxy[:, 2]) / 2
+        out["cy"] = (xyxy[:, 1] + xyxy[:, 3]) / 2
+        out["conf"] = conf
+        out["cls"] = cls
+    return out
+
+def encode_annotated(image_bgr, fmt="jpeg", quality=85):
+    """Encodes an annotated BGR image to an in-memory buffer (jpeg, webp or png)."""
+    if fmt not in ANNOTATION_FORMATS:
+        raise ValueError(f"Unsupported annotation format: {fmt}")
+    ext, quality_flag = ANNOTATION_FORMATS[fmt]
+    params = [quality_flag, int(quality)] if quality_flag is not None else []
+    ok, buf = cv2.imencode(ext, image_bgr, params)
+    if not ok:
+        raise ValueError(f"Could not encode annotated image as {fmt}")
+    return buf.tobytes()
+
+def save_annotated(encoded, output_dir, fmt="jpeg"):
+    """
+    Writes an encoded image to a content-addressed path inside output_dir.
+    Identical scans map to the same file, different scans never collide.
+    """
+    digest = hashlib.sha256(encoded).hexdigest()[:16]
+    path = os.path.join(output_dir, f"annotated_{digest}{ANNOTATION_FORMATS[fmt][0]}")
+    if not os.path.exists(path):
+        os.makedirs(output_dir, exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded)
+        os.replace(tmp_path, path)
+    return path
+
+def find_anomalies_yolo(new_image_path, annotate=None, quality=85, output_dir=None):
+    """
+    Runs the detector on one image and returns (detections, annotated).
+
+    detections is a DETECTION_DTYPE structured array of class-0 boxes.
+    annotated is None unless `annotate` names a format ("jpeg", "webp",
+    "png"): then it is the encoded image bytes, or, when `output_dir` is
+    given, the content-addressed path the image was written to.
+    """
     if model is None:
-        return [], new_image_path
+        return to_detections(np.empty((0, 4)), [], []), None
 
     # Run inference
-    results = model.predict(new_image_path)
-    result = results[0]
-    
-    # Draw boxes
-    image_with_boxes = result.plot()
-    
-    # Save output (Linux path handling)
-    annotated_path = "annotated_scan.png"
-    cv2.imwrite(annotated_path, image_with_boxes)
-    
-    detected_anomalies = []
-    
+    result = _get_thread_model().predict(new_image_path, verbose=False)[0]
+
     # Extract data
     boxes = result.boxes.cpu().numpy()
-    for box in boxes:
-        # Assuming class 0 is the target
-        if int(box.cls[0]) == 0:
-            x1, y1, x2, y2 = box.xyxy[0].astype(int)
-            cX = int((x1 + x2) / 2)
-            cY = int((y1 + y2) / 2)
-            confidence = float(box.conf[0])
-            detected_anomalies.append((cX, cY, confidence))
-            
-    return detected_anomalies, annotated_path
\ No newline at end of file
+    # Assuming class 0 is the target
+    mask = boxes.cls.astype(int) == 0
+    detections = to_detections(boxes.xyxy[mask], boxes.conf[mask], boxes.cls[mask])
+
+    if annotate is None:
+        return detections, None
+
+    # Draw boxes only when someone asked for the picture
+    encoded = encode_annotated(result.plot(), annotate, quality)
+    if output_dir is not None:
+        return detections, save_annotated(encoded, output_dir, annotate)
+    return detections, encoded
+
+# --- Tiled inference (large drone / satellite orthomosaics) ---
+# The model is trained at imgsz=640, so a whole orthomosaic squeezed into one
+# 640px frame shrinks a cow to a pixel or two. Slice the raster into
+# overlapping model-sized tiles instead and merge the detections afterwards.
+TILE_SIZE = 640
+TILE_OVERLAP = 128
+
+def _read_world_file(image_path):
+    """
+    Reads an ESRI world file (.jgw/.pgw/.tfw/.wld) next to the image and
+    returns it as a GDAL-style geotransform, or None if there isn't one.
+    """
+    root, ext = os.path.splitext(image_path)
+    candidates = [root + ext[:2] + ext[-1] + "w", root + ext + "w", root + ".wld"]
+    for world_path in candidates:
+        if os.path.exists(world_path):
+            with open(world_path) as f:
+                a, d, b, e, c, f_ = [float(line) for line in f.read().split()[:6]]
+            # World files reference the centre of the top-left pixel, GDAL the corner
+            return (c - a / 2 - b / 2, a, b, f_ - d / 2 - e / 2, d, e)
+    return None
+
+# Pillow decodes a whole file at once; larger scenes must be GeoTIFF or .npy
+PILLOW_MAX_PIXELS = Image.MAX_IMAGE_PIXELS or 178_956_970
+
+def _bgr(rgb):
+    return np.ascontiguousarray(rgb[..., ::-1])
+
+@contextmanager
+def open_raster(image_path):
+    """
+    Opens a raster for windowed reads without decoding the whole scene.
+    Context manager yielding (read_window, width, height, geotransform),
+    where read_window(x, y, w, h) gives a BGR uint8 array for that window
+    (channel order of cv2.imread, which is what YOLO assumes for numpy input).
+    The file is closed on exit.
+
+    - .npy arrays (RGB) are memory-mapped.
+    - GeoTIFFs are read window-by-window through rasterio.
+    - Anything else goes through Pillow, which decodes the file in its own
+      mode once and converts per window. Above PILLOW_MAX_PIXELS that is
+      refused: convert the scene to a GeoTIFF or .npy.
+    """
+    ext = os.path.splitext(image_path)[1].lower()
+
+    if ext == ".npy":
+        arr = np.load(image_path, mmap_mode="r")
+        if arr.ndim == 2:
+            arr = arr[:, :, None]
+        height, width = arr.shape[:2]
+
+        def read_window(x, y, w, h):
+            tile = np.asarray(arr[y:y + h, x:x + w])
+            return np.repeat(tile, 3, axis=2) if tile.shape[2] == 1 else _bgr(tile[:, :, :3])
+
+        yield read_window, width, height, _read_world_file(image_path)
+        return
+
+    if ext in (".tif", ".tiff"):
+        try:
+            import rasterio
+            from rasterio.windows import Window
+        except ImportError:
+            rasterio = None
+
+        if rasterio is not None:
+            with rasterio.open(image_path) as ds:
+                bands = [1, 2, 3] if ds.count >= 3 else [1]
+                geotransform = None if ds.transform.is_identity else ds.transform.to_gdal()
+                ds_lock = threading.Lock()  # a rasterio dataset must not be read from two threads at once
+
+                def read_window(x, y, w, h):
+                    with ds_lock:
+                        tile = ds.read(bands, window=Window(x, y, w, h))  # (bands, h, w)
+                    tile = np.moveaxis(tile, 0, -1)
+                    if tile.dtype != np.uint8:
+                        tile = np.clip(tile, 0, 255).astype(np.uint8)
+                    return np.repeat(tile, 3, axis=2) if tile.shape[2] == 1 else _bgr(tile)
+
+                yield read_window, ds.width, ds.height, geotransform or _read_world_file(image_path)
+            return
+
+    too_large = (f"{image_path} is too large to decode with Pillow (limit {PILLOW_MAX_PIXELS:,} px). "
+                 "Convert it to a GeoTIFF or a .npy array, which are read window by window.")
+    try:
+        img = Image.open(image_path)
+    except Image.DecompressionBombError:
+        raise ValueError(too_large) from None
+    with img:
+        width, height = img.size
+        if width * height > PILLOW_MAX_PIXELS:
+            raise ValueError(too_large)
+        img_lock = threading.Lock()  # Pillow images are not thread-safe
+
+        def read_window(x, y, w, h):
+            with img_lock:
+                tile = img.crop((x, y, x + w, y + h)).convert("RGB")
+            return _bgr(np.asarray(tile))
+
+        yield read_window, width, height, _read_world_file(image_path)
+
+def tile_windows(width, height, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """
+    Returns (x, y, w, h) windows covering the raster. The last row/column is
+    aligned to the raster edge so no tile is narrower than it has to be.
+    """
+    stride = max(1, tile_size - overlap)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        s = list(range(0, length - tile_size, stride))
+        s.append(length - tile_size)
+        return s
+
+    return [
+        (x, y, min(tile_size, width - x), min(tile_size, height - y))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+def nms(boxes, scores, classes, iou_threshold=0.5):
+    """
+    Class-aware greedy non-maximum suppression.
+    boxes: (N, 4) xyxy array. Returns the indices to keep, best score first.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=int)
+
+    # Offset each class into its own coordinate range so classes never suppress each other
+    offsets = classes.astype(float)[:, None] * (boxes.max() + 1)
+    b = boxes + offsets
+    areas = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(b[i, 0], b[rest, 0])
+        yy1 = np.maximum(b[i, 1], b[rest, 1])
+        xx2 = np.minimum(b[i, 2], b[rest, 2])
+        yy2 = np.minimum(b[i, 3], b[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=int)
+
+def pixel_to_geo(x, y, geotransform):
+    """Maps pixel coordinates to (lon, lat) using a GDAL-style geotransform."""
+    x0, px_w, row_rot, y0, col_rot, px_h = geotransform
+    lon = x0 + x * px_w + y * row_rot
+    lat = y0 + x * col_rot + y * px_h
+    return lon, lat
+
+def _detect_tile(read_window, window, tile_size, conf):
+    x, y, w, h = window
+    tile = read_window(x, y, w, h)
+    result = _get_thread_model().predict(tile, imgsz=tile_size, conf=conf, verbose=False)[0]
+    boxes = result.boxes.cpu().numpy()
+    xyxy = boxes.xyxy.astype(float) + np.array([x, y, x, y], dtype=float)
+    return xyxy, boxes.conf.astype(float), boxes.cls.astype(int)
+
+def find_anomalies_yolo_tiled(image_path, tile_size=TILE_SIZE, overlap=TILE_OVERLAP,
+                              workers=None, conf=0.25, iou_threshold=0.5, geotransform=None):
+    """
+    Tiled version of find_anomalies_yolo for scenes much larger than the
+    training resolution. Tiles are read lazily and run on a thread pool,
+    then detections on tile seams are merged with NMS.
+
+    Returns a GEO_DETECTION_DTYPE structured array in full-raster pixel
+    coordinates. lon/lat are NaN unless the raster is geo-referenced
+    (GeoTIFF, world file, or an explicit GDAL-style `geotransform`).
+    """
+    if model is None:
+        return to_detections(np.empty((0, 4)), [], [], dtype=GEO_DETECTION_DTYPE)
+
+    with open_raster(image_path) as (read_window, width, height, raster_transform):
+        geotransform = geotransform or raster_transform
+        windows = tile_windows(width, height, tile_size, overlap)
+        pool = _tile_pool(workers or min(4, os.cpu_count() or 1))
+        tile_results = list(pool.map(lambda win: _detect_tile(read_window, win, tile_size, conf), windows))
+
+    boxes = np.concatenate([r[0] for r in tile_results]) if tile_results else np.empty((0, 4))
+    scores = np.concatenate([r[1] for r in tile_results]) if tile_results else np.empty(0)
+    classes = np.concatenate([r[2] for r in tile_results]) if tile_results else np.empty(0, dtype=int)
+
+    keep = nms(boxes, scores, classes, iou_threshold)
+    # Assuming class 0 is the target
+    keep = keep[classes[keep] == 0]
+
+    detections = to_detections(boxes[keep], scores[keep], classes[keep], dtype=GEO_DETECTION_DTYPE)
+    if geotransform:
+        detections["lon"], detections["lat"] = pixel_to_geo(detections["cx"], detections["cy"], geotransform)
+    else:
+        detections["lon"] = detections["lat"] = np.nan
+    return detections
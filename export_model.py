@@ -0,0 +1,151 @@
+import os
+import glob
+import json
+import shutil
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+# Exports yolo_model.pt into CPU-friendly runtimes and reports accuracy vs latency.
+# detector.py picks up whichever of these artifacts is present (fastest first).
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_MODEL = os.path.join(SCRIPT_DIR, "yolo_model.pt")
+IMGSZ = 640
+
+def dataset_yaml():
+    # data.yaml uses paths relative to itself, so it works from any checkout
+    return os.path.join(SCRIPT_DIR, "data.yaml")
+
+def letterbox(img, size=IMGSZ, color=(114, 114, 114)):
+    """Resize keeping aspect ratio and pad to a size x size square (YOLO preprocessing)."""
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top = (size - new_h) // 2
+    left = (size - new_w) // 2
+    return cv2.copyMakeBorder(img, top, size - new_h - top, left, size - new_w - left,
+                              cv2.BORDER_CONSTANT, value=color)
+
+def calibration_images(split="valid", limit=300):
+    files = sorted(glob.glob(os.path.join(SCRIPT_DIR, split, "images", "*")))
+    return files[:limit]
+
+def export_onnx(model):
+    print("📦 Exporting ONNX...")
+    return model.export(format="onnx", imgsz=IMGSZ, simplify=True)
+
+def export_onnx_int8(onnx_path, split="valid"):
+    """
+    Post-training static INT8 quantization of the ONNX model with
+    onnxruntime, calibrated on images from the given split.
+    """
+    try:
+        import onnxruntime as ort
+        from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    except ImportError:
+        print("⚠️ onnxruntime not installed, skipping ONNX INT8.")
+        return None
+
+    input_name = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class ValidSplitReader(CalibrationDataReader):
+        def __init__(self, files):
+            self.files = iter(files)
+
+        def get_next(self):
+            path = next(self.files, None)
+            if path is None:
+                return None
+            img = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB)
+            x = letterbox(img).transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+            return {input_name: x}
+
+    out_path = os.path.join(SCRIPT_DIR, "yolo_model_int8.onnx")
+    print(f"📦 Quantizing ONNX to INT8 (calibrating on {split}/)...")
+    quantize_static(
+        onnx_path,
+        out_path,
+        ValidSplitReader(calibration_images(split)),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    return out_path
+
+def export_openvino(model, data_yaml, int8=False):
+    print(f"📦 Exporting OpenVINO IR{' (INT8)' if int8 else ''}...")
+    if not int8:
+        return model.export(format="openvino", imgsz=IMGSZ)
+
+    # Ultralytics calibrates INT8 with NNCF on the data.yaml 'val' split (valid/)
+    out = model.export(format="openvino", imgsz=IMGSZ, int8=True, data=data_yaml)
+    target = os.path.join(SCRIPT_DIR, "yolo_model_int8_openvino_model")
+    if os.path.abspath(out) != target:
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.move(out, target)
+    return target
+
+def evaluate(artifact, data_yaml, split="val"):
+    """Runs ultralytics validation on CPU and returns mAP and per-image latency."""
+    metrics = YOLO(artifact, task="detect").val(
+        data=data_yaml, split=split, imgsz=IMGSZ, batch=1, device="cpu", plots=False, verbose=False
+    )
+    return {
+        "artifact": os.path.relpath(artifact, SCRIPT_DIR),
+        "map50": round(float(metrics.box.map50), 4),
+        "map50_95": round(float(metrics.box.map), 4),
+        "preprocess_ms": round(metrics.speed["preprocess"], 2),
+        "inference_ms": round(metrics.speed["inference"], 2),
+        "postprocess_ms": round(metrics.speed["postprocess"], 2),
+    }
+
+def export_all(formats=("onnx", "openvino"), int8=False, report_path="export_report.json"):
+    if not os.path.exists(SOURCE_MODEL):
+        print(f"⚠️ {SOURCE_MODEL} not found. Run train_model.py first.")
+        return None
+
+    data_yaml = dataset_yaml()
+    variants = {"pytorch": SOURCE_MODEL}
+
+    if "onnx" in formats:
+        onnx_path = export_onnx(YOLO(SOURCE_MODEL))
+        variants["onnx"] = onnx_path
+        if int8:
+            int8_path = export_onnx_int8(onnx_path)
+            if int8_path:
+                variants["onnx_int8"] = int8_path
+
+    if "openvino" in formats:
+        try:
+            variants["openvino"] = export_openvino(YOLO(SOURCE_MODEL), data_yaml)
+            if int8:
+                variants["openvino_int8"] = export_openvino(YOLO(SOURCE_MODEL), data_yaml, int8=True)
+        except Exception as e:
+            print(f"⚠️ OpenVINO export failed: {e}")
+
+    print("📊 Evaluating variants on valid/ ...")
+    report = []
+    for name, artifact in variants.items():
+        row = {"variant": name, **evaluate(artifact, data_yaml)}
+        report.append(row)
+
+    print(f"\n{'variant':<15}{'mAP50':>8}{'mAP50-95':>10}{'infer ms':>10}")
+    for row in report:
+        print(f"{row['variant']:<15}{row['map50']:>8.3f}{row['map50_95']:>10.3f}{row['inference_ms']:>10.1f}")
+
+    with open(os.path.join(SCRIPT_DIR, report_path), "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Report written to {report_path}")
+    return report
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the herd detector for CPU serving")
+    parser.add_argument("--formats", default="onnx,openvino", help="Comma separated: onnx,openvino")
+    parser.add_argument("--int8", action="store_true", help="Also build INT8 variants calibrated on valid/")
+    args = parser.parse_args()
+
+    export_all(formats=tuple(f.strip() for f in args.formats.split(",")), int8=args.int8)
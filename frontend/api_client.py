@@ -0,0 +1,119 @@
+"""
+Shared access to the Ulinzi backend for the Streamlit pages.
+
+Streamlit re-runs the whole script on every interaction, so plain
+requests.get/post calls hit the backend again each time a selectbox is
+touched. All pages go through this module instead:
+
+- one keep-alive requests.Session (connection pool) per Streamlit process
+- an in-process TTL cache keyed by (method, endpoint, params, body), so a
+  rerun that asks for the same view gets the same response without a call
+- explicit invalidation by endpoint, used after training and alert actions
+
+Only successful (200) responses are cached. Calls with ttl=None (the
+default) always go to the backend.
+"""
+import json
+import time
+import hashlib
+import threading
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+from config_loader import get_config
+
+API_URL = get_config("API_URL", "http://127.0.0.1:8000")
+API_TIMEOUT = float(get_config("API_TIMEOUT", 30))
+API_POOL_SIZE = int(get_config("API_POOL_SIZE", 10))
+
+# --- Cache lifetimes (seconds) ---
+HISTORY_TTL = float(get_config("API_HISTORY_TTL", 300))  # /history/data, /history/predict
+LIVE_TTL = float(get_config("API_LIVE_TTL", 15))  # /cattle/data, /cattle/predict
+SMS_CHECK_TTL = float(get_config("API_SMS_CHECK_TTL", 3))  # dedupes reruns between polls
+
+class _State:
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=API_POOL_SIZE, pool_maxsize=API_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.cache = {}  # key -> (expires_at, endpoint, response)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.hits = 0
+
+@st.cache_resource
+def _state():
+    # Shared by every session and rerun of this Streamlit process
+    return _State()
+
+def _key(method, endpoint, params, body):
+    blob = json.dumps([method, endpoint, params, body], sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+def request(method, endpoint, params=None, json=None, ttl=None):
+    """
+    Calls `endpoint` (e.g. "/history/data") on the backend and returns the
+    requests.Response. With a ttl, a 200 response is reused for that many
+    seconds for identical calls. Raises requests.RequestException on
+    connection errors, like requests itself.
+    """
+    state = _state()
+    key = _key(method, endpoint, params, json) if ttl else None
+    if key:
+        with state.lock:
+            entry = state.cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                state.hits += 1
+                return entry[2]
+
+    resp = state.session.request(method, f"{API_URL}{endpoint}", params=params, json=json, timeout=API_TIMEOUT)
+    with state.lock:
+        state.calls += 1
+        if key and resp.status_code == 200:
+            now = time.monotonic()
+            if len(state.cache) >= 512:
+                state.cache = {k: v for k, v in state.cache.items() if v[0] > now}
+            state.cache[key] = (now + ttl, endpoint, resp)
+    return resp
+
+def get(endpoint, params=None, ttl=None):
+    return request("GET", endpoint, params=params, ttl=ttl)
+
+def post(endpoint, json=None, params=None, ttl=None):
+    return request("POST", endpoint, params=params, json=json, ttl=ttl)
+
+def stream(endpoint, payload=None, params=None):
+    """
+    POSTs to a streaming endpoint (NDJSON, e.g. "/alerts/dispatch") and
+    yields each event as the backend sends it. Never cached. Raises
+    requests.HTTPError with the backend's message on an error status.
+    """
+    state = _state()
+    with state.session.post(f"{API_URL}{endpoint}", params=params, json=payload, timeout=API_TIMEOUT, stream=True) as resp:
+        with state.lock:
+            state.calls += 1
+        if resp.status_code != 200:
+            raise requests.HTTPError(resp.text, response=resp)
+        for line in resp.iter_lines():
+            if line:
+                yield json.loads(line)
+
+def invalidate(*endpoints):
+    """Drops cached responses for the given endpoints (all of them if none given)."""
+    state = _state()
+    with state.lock:
+        if not endpoints:
+            state.cache.clear()
+            return
+        for key in [k for k, (_, endpoint, _) in state.cache.items() if endpoint in endpoints]:
+            del state.cache[key]
+
+def stats():
+    state = _state()
+    with state.lock:
+        now = time.monotonic()
+        live = sum(expires > now for expires, _, _ in state.cache.values())
+        return {"backend_calls": state.calls, "cache_hits": state.hits, "cached_responses": live}
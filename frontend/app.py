@@ -8,7 +8,7 @@ import numpy as np
 import altair as alt
 import folium
 from streamlit_folium import st_folium
-import requests
+import api_client
 from grazing_guard import render_grazing_guard
 from datetime import datetime, timedelta
 import extra_streamlit_components as stx
@@ -28,10 +28,6 @@ def get_resized_img_as_base64(file, max_width=1920):
             img = img.resize((new_width, new_height))
         
         buffered = io.BytesIO()
-from config_loader import get_config
-
-# Default to local, but allow Env Var override (e.g. for Streamlit Cloud connecting to Render)
-API_URL = get_config("API_URL", "http://127.0.0.1:8000")
 
 # --- Authentication with Persistence ---
 def get_manager():
@@ -76,7 +72,7 @@ def login():
         
         if st.button("AUTHENTICATE"):
             try:
-                resp = requests.post(f"{API_URL}/auth/login", json={"username": username, "password": password})
+                resp = api_client.post("/auth/login", json={"username": username, "password": password})
                 if resp.status_code == 200:
                     st.session_state.logged_in = True
                     cookie_manager.set("ulinzi_auth", "true", expires_at=datetime.now() + timedelta(days=7))
@@ -188,6 +184,17 @@ elif page == "Regional Dashboard":
         icon=folium.Icon(color="green", icon="info-sign")
     ).add_to(m)
     
+    # Heatmap overlays rendered and cached by the backend (/tiles/...)
+    for layer, label in [("herd_density", "Herd Density"), ("incidents", "Incident Intensity")]:
+        folium.TileLayer(
+            tiles=f"{api_client.API_URL}/tiles/{layer}/{{z}}/{{x}}/{{y}}.png",
+            attr="Ulinzi",
+            name=label,
+            overlay=True,
+            opacity=0.8
+        ).add_to(m)
+    folium.LayerControl().add_to(m)
+    
     # Render Map
     st_folium(m, width=1200, height=400)
     
@@ -196,7 +203,8 @@ elif page == "Regional Dashboard":
     
     # Fetch Data from API
     try:
-        resp = requests.get(f"{API_URL}/history/data", params={"locations": selected_location, "days": 60})
+        resp = api_client.get("/history/data", params={"locations": selected_location, "days": 60},
+                              ttl=api_client.HISTORY_TTL)
         if resp.status_code == 200:
             hist_data = pd.DataFrame(resp.json())
             hist_data['Date'] = pd.to_datetime(hist_data['Date'])
@@ -207,7 +215,9 @@ elif page == "Regional Dashboard":
                     # Convert Date back to string for JSON serialization
                     train_data = hist_data.copy()
                     train_data['Date'] = train_data['Date'].dt.strftime('%Y-%m-%d')
-                    train_resp = requests.post(f"{API_URL}/history/train", json=train_data.to_dict(orient="records"), params={"location": selected_location})
+                    train_resp = api_client.post("/history/train", json=train_data.to_dict(orient="records"), params={"location": selected_location})
+                    # A new model makes cached forecasts stale
+                    api_client.invalidate("/history/predict")
                     if train_resp.status_code == 200 and train_resp.json().get("status") == "trained":
                         st.success("Model Trained Successfully")
                     else:
@@ -257,7 +267,8 @@ elif page == "Regional Dashboard":
                 # Get last 10 days of raw daily data
                 recent_data = hist_data['Incident_Count'].values[-10:].tolist()
                 try:
-                    pred_resp = requests.post(f"{API_URL}/history/predict", json=recent_data, params={"location": selected_location})
+                    pred_resp = api_client.post("/history/predict", json=recent_data, params={"location": selected_location},
+                                                ttl=api_client.HISTORY_TTL)
                     if pred_resp.status_code == 200:
                         prediction = pred_resp.json().get("prediction")
                         current_val = hist_data['Incident_Count'].iloc[-1]
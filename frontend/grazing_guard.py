@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import time
-import requests
+import api_client
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
@@ -12,28 +12,7 @@ from config_loader import get_config
 # Load environment variables
 load_dotenv()
 
-
-API_URL = get_config("API_URL", "http://127.0.0.1:8000")
-
 # --- SMS CONFIGURATION (TextBee) ---
-def send_alert_sms(api_key, device_id, recipients, message):
-    try:
-        # Ensure recipients is a list
-        if isinstance(recipients, str):
-            recipients = [recipients]
-            
-        resp = requests.post(f"{API_URL}/sms/send", json={
-            "recipients": recipients,
-            "message": message
-        }, params={"api_key": api_key, "device_id": device_id})
-        
-        if resp.status_code == 200:
-            return True, resp.json()
-        else:
-            return False, resp.text
-    except Exception as e:
-        return False, str(e)
-
 def check_for_sms_reply(api_key, device_id, sender_phone, min_timestamp=None):
     try:
         # sender_phone is list or str, convert to comma string for query param
@@ -50,7 +29,7 @@ def check_for_sms_reply(api_key, device_id, sender_phone, min_timestamp=None):
         if min_timestamp:
             params["min_timestamp"] = str(min_timestamp)
             
-        resp = requests.get(f"{API_URL}/sms/check", params=params)
+        resp = api_client.get("/sms/check", params=params, ttl=api_client.SMS_CHECK_TTL)
         if resp.status_code == 200:
             data = resp.json()
             return data["found"], data["result"], data["debug"]
@@ -59,15 +38,18 @@ def check_for_sms_reply(api_key, device_id, sender_phone, min_timestamp=None):
     except Exception as e:
         return False, str(e), []
 
+# Above this many animals the map shows server-side clusters (/map/points) instead of every cow
+MAP_CLIENT_POINTS = 1000
+
 # --- 1. THE DATA SIMULATOR (Via API) ---
 def get_cattle_data(mode="Normal", num_cows=50, center_lat=1.433, center_lon=35.115):
     try:
-        resp = requests.post(f"{API_URL}/cattle/data", json={
+        resp = api_client.post("/cattle/data", json={
             "mode": mode,
             "num_cows": num_cows,
             "center_lat": center_lat,
             "center_lon": center_lon
-        })
+        }, ttl=api_client.LIVE_TTL)
         if resp.status_code == 200:
             return pd.DataFrame(resp.json())
         else:
@@ -77,6 +59,23 @@ def get_cattle_data(mode="Normal", num_cows=50, center_lat=1.433, center_lon=35.
         st.error(f"Connection Error: {e}")
         return pd.DataFrame()
 
+def get_map_view(source, live_data, zoom=12):
+    """Clusters / thinned points of the last scored batch, for the viewport covering the herd."""
+    try:
+        resp = api_client.get("/map/points", params={
+            "source": source,
+            "west": live_data["lon"].min(),
+            "south": live_data["lat"].min(),
+            "east": live_data["lon"].max(),
+            "north": live_data["lat"].max(),
+            "zoom": zoom
+        }, ttl=api_client.LIVE_TTL)
+        if resp.status_code == 200:
+            return resp.json()
+    except Exception:
+        pass
+    return None
+
 def render_grazing_guard(region_name="West Pokot", region_coords=[1.433, 35.115]):
     # --- 3. STREAMLIT DASHBOARD UI (NSA THEME) ---
     
@@ -212,6 +211,7 @@ def render_grazing_guard(region_name="West Pokot", region_coords=[1.433, 35.115]
     elder_phones = [p.strip() for p in elder_phones_input.split(",") if p.strip()]
     
     sim_mode = st.sidebar.radio("Herd Activity State:", ["Normal Grazing", "Active Raid Simulation"])
+    herd_size = st.sidebar.select_slider("Tracked Animals:", options=[50, 500, 5000, 50000], value=50)
 
     # Reset state if simulation mode changes to Normal
     if sim_mode == "Normal Grazing" and st.session_state.incident_state != "MONITORING":
@@ -225,6 +225,7 @@ def render_grazing_guard(region_name="West Pokot", region_coords=[1.433, 35.115]
     # Use the passed region_coords (lat, lon)
     live_data = get_cattle_data(
         "Normal" if sim_mode == "Normal Grazing" else "Raid", 
+        num_cows=herd_size,
         center_lat=region_coords[0], 
         center_lon=region_coords[1]
     )
@@ -232,7 +233,8 @@ def render_grazing_guard(region_name="West Pokot", region_coords=[1.433, 35.115]
     if not live_data.empty:
         # Run AI Prediction via API
         try:
-            pred_resp = requests.post(f"{API_URL}/cattle/predict", json=live_data.to_dict(orient="records"))
+            pred_resp = api_client.post("/cattle/predict", json=live_data.to_dict(orient="records"),
+                                        params={"region": region_name}, ttl=api_client.LIVE_TTL)
             if pred_resp.status_code == 200:
                 live_data['status'] = pred_resp.json()
             else:
@@ -260,18 +262,52 @@ def render_grazing_guard(region_name="West Pokot", region_coords=[1.433, 35.115]
         with col1:
             st.subheader(f"📍 LIVE GEOSPATIAL TRACKING ({region_name.upper()})")
             
-            # Using Plotly for the Map
-            fig = px.scatter_mapbox(
-                live_data, 
-                lat="lat", 
-                lon="lon", 
-                color="status",
-                color_discrete_map={"Safe": "#00FF41", "THREAT DETECTED": "#FF0000"}, # Neon Green / Neon Red
-                zoom=12, 
-                height=500,
-                size="speed_kmh", # Faster cows appear larger
-                hover_data=["speed_kmh", "id"]
-            )
+            # Large herds: let the backend cluster them so the browser gets a bounded payload
+            map_view = get_map_view(region_name, live_data) if len(live_data) > MAP_CLIENT_POINTS else None
+            if map_view and map_view["mode"] == "clusters":
+                clusters = pd.DataFrame(map_view["clusters"])
+                clusters["status"] = clusters["threats"].gt(0).map({True: "THREAT DETECTED", False: "Safe"})
+                fig = px.scatter_mapbox(
+                    clusters,
+                    lat="lat",
+                    lon="lon",
+                    color="status",
+                    color_discrete_map={"Safe": "#00FF41", "THREAT DETECTED": "#FF0000"},
+                    zoom=12,
+                    height=500,
+                    size="count",
+                    hover_data=["count", "threats", "safe", "max_speed_kmh"]
+                )
+                st.caption(f"{map_view['total']} animals in {len(clusters)} clusters")
+            elif map_view:
+                points = pd.DataFrame(map_view["points"])
+                points["status"] = points["threat"].map({True: "THREAT DETECTED", False: "Safe"})
+                fig = px.scatter_mapbox(
+                    points,
+                    lat="lat",
+                    lon="lon",
+                    color="status",
+                    color_discrete_map={"Safe": "#00FF41", "THREAT DETECTED": "#FF0000"},
+                    zoom=12,
+                    height=500,
+                    size="speed_kmh",
+                    hover_data=["speed_kmh", "id"]
+                )
+                if map_view["decimated"]:
+                    st.caption(f"Showing {len(points)} of {map_view['total']} animals")
+            else:
+                # Using Plotly for the Map
+                fig = px.scatter_mapbox(
+                    live_data, 
+                    lat="lat", 
+                    lon="lon", 
+                    color="status",
+                    color_discrete_map={"Safe": "#00FF41", "THREAT DETECTED": "#FF0000"}, # Neon Green / Neon Red
+                    zoom=12, 
+                    height=500,
+                    size="speed_kmh", # Faster cows appear larger
+                    hover_data=["speed_kmh", "id"]
+                )
             fig.update_layout(mapbox_style="carto-darkmatter") # Dark Theme
             fig.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
             st.plotly_chart(fig, use_container_width=True)
@@ -305,45 +341,60 @@ def render_grazing_guard(region_name="West Pokot", region_coords=[1.433, 35.115]
                     msg = f"ULINZI ALERT: Suspected Raid in {region_name}. Please CONFIRM status immediately."
                     alerts_sent = []
                     
-                    # Send SMS if method includes SMS
+                    # One incident, every channel at once (the backend fans out and streams results)
+                    dispatch_payload = {
+                        "message": msg,
+                        "region": region_name,
+                        "threat_level": "HIGH",
+                        "timestamp": str(datetime.now())
+                    }
+                    
+                    # SMS if method includes SMS
                     if "SMS" in alert_method or "Both" in alert_method:
                         if elder_phones:
-                            with st.spinner(f"Sending SMS to {len(elder_phones)} recipients..."):
-                                success, resp = send_alert_sms(TEXTBEE_API_KEY, TEXTBEE_DEVICE_ID, elder_phones, msg)
-                                if success:
-                                    alerts_sent.append(f"SMS to {len(elder_phones)} recipients")
-                                    add_log(f"📱 SMS Alert sent to {len(elder_phones)} recipients.", "warning")
-                                else:
-                                    st.error(f"SMS Failed: {resp}")
+                            dispatch_payload.update({
+                                "phones": elder_phones,
+                                "textbee_api_key": TEXTBEE_API_KEY,
+                                "textbee_device_id": TEXTBEE_DEVICE_ID
+                            })
                         else:
                             st.error("Please enter at least one Phone Number for SMS.")
                     
-                    # Send Telegram if method includes Telegram
+                    # Telegram if method includes Telegram
                     if "Telegram" in alert_method or "Both" in alert_method:
                         # Use Env var if available, otherwise check if user entered it (disabled now)
                         token_to_use = TELEGRAM_BOT_TOKEN
                         
                         if token_to_use and telegram_chat_ids:
-                            try:
-                                telegram_payload = {
-                                    "bot_token": token_to_use,
-                                    "chat_ids": telegram_chat_ids,
-                                    "message": msg,
-                                    "region": region_name,
-                                    "threat_level": "HIGH",
-                                    "timestamp": str(datetime.now())
-                                }
-                                resp = requests.post(f"{API_URL}/alerts/telegram", json=telegram_payload)
-                                if resp.status_code == 200:
-                                    alerts_sent.append(f"Telegram to {len(telegram_chat_ids)} users")
-                                    add_log(f"📱 Telegram sent to {len(telegram_chat_ids)} users.", "info")
-                                else:
-                                    st.error(f"Telegram Failed: {resp.json().get('detail', resp.text)}")
-                            except Exception as e:
-                                st.error(f"Telegram Error: {e}")
+                            dispatch_payload.update({"bot_token": token_to_use, "chat_ids": telegram_chat_ids})
                         else:
                             st.warning("Telegram: Configuration missing (Bot Token). Check .env file.")
                     
+                    if "phones" in dispatch_payload or "chat_ids" in dispatch_payload:
+                        channel_names = {"sms": "SMS", "telegram": "Telegram"}
+                        channel_labels = {"sms": f"SMS to {len(elder_phones)} recipients",
+                                          "telegram": f"Telegram to {len(telegram_chat_ids)} users"}
+                        with st.status("Dispatching alerts...", expanded=True) as dispatch_status:
+                            try:
+                                # Each channel's result arrives as soon as that channel finishes
+                                for event in api_client.stream("/alerts/dispatch", dispatch_payload):
+                                    if event["event"] != "result":
+                                        continue
+                                    channel = event["channel"]
+                                    if event["ok"]:
+                                        alerts_sent.append(channel_labels[channel])
+                                        st.write(f"✅ {channel_labels[channel]} ({event['send_ms']:.0f} ms)")
+                                        add_log(f"📱 {channel_names[channel]} Alert sent: {channel_labels[channel]}.",
+                                                "warning" if channel == "sms" else "info")
+                                    else:
+                                        st.error(f"{channel_names[channel]} Failed: {event['detail']}")
+                            except Exception as e:
+                                st.error(f"Alert Dispatch Error: {e}")
+                            # Replies are only meaningful relative to the latest alert
+                            api_client.invalidate("/sms/check")
+                            dispatch_status.update(label="Alerts dispatched" if alerts_sent else "Alert dispatch failed",
+                                                   state="complete" if alerts_sent else "error")
+                    
                     # If at least one alert was sent successfully, proceed
                     if alerts_sent:
                         st.session_state.incident_state = "WAITING_FOR_CHIEF"
@@ -428,6 +479,8 @@ def render_grazing_guard(region_name="West Pokot", region_coords=[1.433, 35.115]
                             st.success("✅ CONSENSUS: FALSE ALARM. STANDING DOWN.")
                             if st.button("Reset System"):
                                 st.session_state.incident_state = "MONITORING"
+                                # Incident closed: take a fresh snapshot of the herd
+                                api_client.invalidate("/cattle/data", "/cattle/predict")
                                 st.rerun()
                         else:
                             st.error("🚀 CONSENSUS: THREAT CONFIRMED. POLICE DISPATCHED.")
@@ -456,6 +509,8 @@ def render_grazing_guard(region_name="West Pokot", region_coords=[1.433, 35.115]
                             st.success("✅ CHIEF RULING: STAND DOWN.")
                             if st.button("Reset System"):
                                 st.session_state.incident_state = "MONITORING"
+                                # Incident closed: take a fresh snapshot of the herd
+                                api_client.invalidate("/cattle/data", "/cattle/predict")
                                 st.rerun()
                         elif st.session_state.third_party_vote == "THREAT":
                             st.error("🚀 CHIEF RULING: ACTION AUTHORIZED.")
@@ -479,6 +534,8 @@ def render_grazing_guard(region_name="West Pokot", region_coords=[1.433, 35.115]
                 
                 if st.button("Reset System"):
                     st.session_state.incident_state = "MONITORING"
+                    # Incident closed: take a fresh snapshot of the herd
+                    api_client.invalidate("/cattle/data", "/cattle/predict")
                     st.rerun()
 
     # --- Activity Log ---
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the Ulinzi backend.
+
+Starts local stand-ins for TextBee, Telegram and n8n (with configurable
+latency and error rates), boots the backend pointed at them, drives a mixed
+workload and reports throughput and tail latency per route.
+
+Usage: python load_test.py --duration 30 --workers 16
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import threading
+import subprocess
+from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REGIONS = {
+    "West Pokot": [1.433, 35.115],
+    "Turkana": [3.116, 35.600],
+    "Baringo": [0.669, 35.953],
+    "Samburu": [1.204, 36.926],
+}
+
+# --- 1. PROVIDER STAND-INS ---
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class StubProvider:
+    """
+    A tiny threaded HTTP server that answers like one of the providers.
+    Every request sleeps ~latency_ms (exponential jitter) and fails with
+    HTTP 500 at error_rate.
+    """
+    def __init__(self, name, latency_ms=100.0, error_rate=0.0):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.port = free_port()
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def respond(self, method, path, body):
+        """Returns (status, payload) for a successful call."""
+        if self.name == "textbee":
+            if path.endswith("/send-sms"):
+                return 201, {"data": {"success": True, "smsBatchId": "stub"}}
+            return 200, {"data": []}
+        if self.name == "telegram":
+            if path.endswith("/getUpdates"):
+                return 200, {"ok": True, "result": []}
+            return 200, {"ok": True, "result": {
+                "message_id": random.randint(1, 1_000_000),
+                "date": int(time.time()),
+                "chat": {"id": 1, "type": "private"},
+                "text": "stub",
+            }}
+        return 200, {"status": "ok"}  # n8n webhook
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _serve(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with stub.lock:
+                    stub.requests += 1
+
+                time.sleep(random.expovariate(1.0 / stub.latency_ms) / 1000 if stub.latency_ms > 0 else 0)
+
+                if random.random() < stub.error_rate:
+                    status, payload = 500, {"ok": False, "description": "stub error"}
+                else:
+                    status, payload = stub.respond(method, self.path, body)
+
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+# --- 2. BACKEND UNDER TEST ---
+def start_backend(port, env_overrides, workers=1):
+    env = {**os.environ, **env_overrides}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=SCRIPT_DIR, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Backend exited during startup")
+        try:
+            if requests.get(base, timeout=1).status_code == 200:
+                return proc, base
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("Backend did not become ready within 120s")
+
+# --- 3. WORKLOAD ---
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, session, route, method, url, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            resp = session.request(method, url, timeout=30, **kwargs)
+            ok = resp.status_code < 400
+        except requests.RequestException:
+            resp, ok = None, False
+        elapsed = (time.perf_counter() - t0) * 1000
+        with self.lock:
+            self.samples[route].append(elapsed)
+            if not ok:
+                self.errors[route] += 1
+        return resp if ok else None
+
+class Workload:
+    """Realistic mix of operator traffic against one backend."""
+    def __init__(self, base, stubs, recorder, burst_size=5):
+        self.base = base
+        self.stubs = stubs
+        self.rec = recorder
+        self.burst_size = burst_size
+        self.history_cache = {}
+        self.shared = None  # fixed payloads for shared_view, built on first use
+        self.shared_lock = threading.Lock()
+
+    def cattle_scoring(self, s):
+        region = random.choice(list(REGIONS))
+        lat, lon = REGIONS[region]
+        mode = "Raid" if random.random() < 0.2 else "Normal"
+        resp = self.rec.call(s, "POST /cattle/data", "POST", f"{self.base}/cattle/data",
+                             json={"mode": mode, "num_cows": 50, "center_lat": lat, "center_lon": lon})
+        if resp is not None:
+            self.rec.call(s, "POST /cattle/predict", "POST", f"{self.base}/cattle/predict", json=resp.json())
+
+    def history_read(self, s):
+        region = random.choice(list(REGIONS))
+        resp = self.rec.call(s, "GET /history/data", "GET", f"{self.base}/history/data",
+                             params={"locations": region, "days": 60})
+        if resp is not None:
+            self.history_cache[region] = resp.json()
+
+    def training(self, s):
+        region = random.choice(list(REGIONS))
+        data = self.history_cache.get(region)
+        if data is None:
+            return self.history_read(s)
+        resp = self.rec.call(s, "POST /history/train", "POST", f"{self.base}/history/train",
+                             json=data, params={"location": region})
+        if resp is not None:
+            recent = [row["Threat_Level"] for row in data[-5:]]
+            self.rec.call(s, "POST /history/predict", "POST", f"{self.base}/history/predict",
+                          json=recent, params={"location": region})
+
+    def alert_burst(self, s):
+        region = random.choice(list(REGIONS))
+        msg = f"ULINZI LOAD TEST: Suspected Raid in {region}."
+        for _ in range(self.burst_size):
+            self.rec.call(s, "POST /sms/send", "POST", f"{self.base}/sms/send",
+                          json={"recipients": ["+254700000000"], "message": msg},
+                          params={"api_key": "stub", "device_id": "stub"})
+            self.rec.call(s, "POST /alerts/telegram", "POST", f"{self.base}/alerts/telegram",
+                          json={"bot_token": "123:stub", "chat_ids": ["1", "2"], "message": msg,
+                                "region": region, "threat_level": "HIGH", "timestamp": str(datetime.now())})
+            self.rec.call(s, "POST /alerts/n8n", "POST", f"{self.base}/alerts/n8n",
+                          json={"webhook_url": f"{self.stubs['n8n'].url}/webhook/load-test", "message": msg,
+                                "data": {"region": region}})
+        self.rec.call(s, "GET /sms/check", "GET", f"{self.base}/sms/check",
+                      params={"api_key": "stub", "device_id": "stub", "sender_phone": "+254700000000"})
+
+    def dispatch_burst(self, s):
+        """alert_burst through /alerts/dispatch: each alert is one call fanning out to all three channels."""
+        region = random.choice(list(REGIONS))
+        msg = f"ULINZI LOAD TEST: Suspected Raid in {region}."
+        for _ in range(self.burst_size):
+            self.rec.call(s, "POST /alerts/dispatch", "POST", f"{self.base}/alerts/dispatch",
+                          json={"message": msg, "region": region, "threat_level": "HIGH",
+                                "timestamp": str(datetime.now()),
+                                "phones": ["+254700000000"], "textbee_api_key": "stub", "textbee_device_id": "stub",
+                                "bot_token": "123:stub", "chat_ids": ["1", "2"],
+                                "webhook_url": f"{self.stubs['n8n'].url}/webhook/load-test"})
+        self.rec.call(s, "GET /sms/check", "GET", f"{self.base}/sms/check",
+                      params={"api_key": "stub", "device_id": "stub", "sender_phone": "+254700000000"})
+
+    def _shared_payloads(self, s):
+        with self.shared_lock:
+            if self.shared is None:
+                region = "Turkana"
+                lat, lon = REGIONS[region]
+                history = s.get(f"{self.base}/history/data", params={"locations": region, "days": 60}).json()
+                s.post(f"{self.base}/history/train", json=history, params={"location": region})
+                batch = s.post(f"{self.base}/cattle/data",
+                               json={"mode": "Normal", "num_cows": 500, "center_lat": lat, "center_lon": lon}).json()
+                self.shared = {"region": region, "batch": batch,
+                               "recent": [row["Threat_Level"] for row in history[-5:]]}
+            return self.shared
+
+    def shared_view(self, s):
+        """Operators watching the same region: identical history, forecast and scoring requests."""
+        shared = self._shared_payloads(s)
+        region = shared["region"]
+        self.rec.call(s, "GET /history/data", "GET", f"{self.base}/history/data",
+                      params={"locations": region, "days": 60})
+        self.rec.call(s, "POST /history/predict", "POST", f"{self.base}/history/predict",
+                      json=shared["recent"], params={"location": region})
+        self.rec.call(s, "POST /cattle/predict", "POST", f"{self.base}/cattle/predict",
+                      json=shared["batch"], params={"region": region})
+
+    def run(self, duration, workers, mix):
+        scenarios = [getattr(self, name) for name in mix]
+        weights = list(mix.values())
+        deadline = time.time() + duration
+
+        def worker():
+            s = requests.Session()
+            while time.time() < deadline:
+                random.choices(scenarios, weights)[0](s)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for f in [pool.submit(worker) for _ in range(workers)]:
+                f.result()
+        return time.perf_counter() - start
+
+# --- 4. REPORT ---
+def summarize(recorder, elapsed):
+    rows = []
+    for route, samples in sorted(recorder.samples.items()):
+        a = np.asarray(samples)
+        rows.append({
+            "route": route,
+            "requests": len(a),
+            "errors": recorder.errors[route],
+            "throughput_rps": round(len(a) / elapsed, 2),
+            "p50_ms": round(float(np.percentile(a, 50)), 1),
+            "p95_ms": round(float(np.percentile(a, 95)), 1),
+            "p99_ms": round(float(np.percentile(a, 99)), 1),
+            "max_ms": round(float(a.max()), 1),
+        })
+    return rows
+
+def print_report(rows, elapsed):
+    total = sum(r["requests"] for r in rows)
+    print("\n" + "=" * 96)
+    print(f"{'route':<26}{'reqs':>7}{'errs':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    print("-" * 96)
+    for r in rows:
+        print(f"{r['route']:<26}{r['requests']:>7}{r['errors']:>6}{r['throughput_rps']:>9.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+    print("-" * 96)
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+    print("=" * 96)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load-test the Ulinzi backend against local provider stand-ins")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of traffic")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent simulated operators")
+    parser.add_argument("--backend-workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--url", default=None, help="Use an already running backend instead of starting one")
+    parser.add_argument("--textbee-latency", type=float, default=300, help="Mean TextBee latency (ms)")
+    parser.add_argument("--telegram-latency", type=float, default=150, help="Mean Telegram latency (ms)")
+    parser.add_argument("--n8n-latency", type=float, default=200, help="Mean n8n latency (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Provider error rate (0-1)")
+    parser.add_argument("--burst-size", type=int, default=5, help="Alerts per alert burst")
+    parser.add_argument("--mix", default="cattle_scoring=50,history_read=25,training=5,alert_burst=20",
+                        help="Scenario weights")
+    parser.add_argument("--coalesce", choices=["on", "off"], default="on",
+                        help="Request coalescing / response cache in the started backend (compare with shared_view)")
+    parser.add_argument("--output", default=None, help="Write the per-route report as JSON")
+    args = parser.parse_args()
+
+    mix = {k: float(v) for k, v in (item.split("=") for item in args.mix.split(","))}
+
+    stubs = {
+        "textbee": StubProvider("textbee", args.textbee_latency, args.error_rate).start(),
+        "telegram": StubProvider("telegram", args.telegram_latency, args.error_rate).start(),
+        "n8n": StubProvider("n8n", args.n8n_latency, args.error_rate).start(),
+    }
+    print(f"🧪 Stubs: " + ", ".join(f"{name}={stub.url}" for name, stub in stubs.items()))
+
+    proc = None
+    if args.url:
+        base = args.url.rstrip("/")
+        print("⚠️  Using an external backend: make sure it was started with TEXTBEE_BASE_URL / TELEGRAM_API_BASE_URL pointing at the stubs above.")
+    else:
+        proc, base = start_backend(free_port(), {
+            "TEXTBEE_BASE_URL": stubs["textbee"].url,
+            "TELEGRAM_API_BASE_URL": f"{stubs['telegram'].url}/bot",
+            "ULINZI_COALESCE": "1" if args.coalesce == "on" else "0",
+        }, workers=args.backend_workers)
+        print(f"🚀 Backend: {base}")
+
+    try:
+        recorder = Recorder()
+        print(f"⏳ Driving {args.workers} workers for {args.duration:.0f}s (mix: {mix})")
+        elapsed = Workload(base, stubs, recorder, args.burst_size).run(args.duration, args.workers, mix)
+        rows = summarize(recorder, elapsed)
+        print_report(rows, elapsed)
+        print("Provider calls: " + ", ".join(f"{n}={s.requests}" for n, s in stubs.items()))
+        try:
+            caches = requests.get(f"{base}/cache/stats", timeout=10).json()
+            print("Coalescing: " + ", ".join(f"{route} hit={c['hits']} coalesced={c['coalesced']} computed={c['misses']}"
+                                              for route, c in caches.items()))
+        except (requests.RequestException, ValueError):
+            pass
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"elapsed_s": elapsed, "workers": args.workers, "mix": mix, "routes": rows}, f, indent=2)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        for stub in stubs.values():
+            stub.stop()
@@ -0,0 +1,226 @@
+import os
+import glob
+import json
+import time
+import cv2
+import numpy as np
+
+# Packs the train/valid/test splits into memory-mapped shards so CPU training
+# stops re-decoding and resizing every JPEG each epoch.
+#
+# Layout (all paths in the manifest are relative, so the folder can be moved):
+#   shards/manifest.json
+#   shards/train-000.npy          uint8 (N, imgsz, imgsz, 3) letterboxed BGR images
+#   shards/train-000.meta.npy     int32 (N, 6) top, left, h, w, h0, w0 per image
+#   shards/train-000.labels.npy   float32 (M, 6) image index, class, x, y, w, h (normalized)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SHARD_DIR = os.path.join(SCRIPT_DIR, "shards")
+SPLITS = ("train", "valid", "test")
+IMG_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+def letterbox(img, size, color=(114, 114, 114)):
+    """
+    Resizes the long side to `size` and pads to a square.
+    Returns the padded image and the (top, left, h, w) box of the real content.
+    """
+    h0, w0 = img.shape[:2]
+    r = size / max(h0, w0)
+    w, h = min(int(np.ceil(w0 * r)), size), min(int(np.ceil(h0 * r)), size)
+    if (h, w) != (h0, w0):
+        img = cv2.resize(img, (w, h), interpolation=cv2.INTER_LINEAR)
+    top, left = (size - h) // 2, (size - w) // 2
+    out = np.full((size, size, 3), color, dtype=np.uint8)
+    out[top:top + h, left:left + w] = img
+    return out, (top, left, h, w)
+
+def read_labels(label_path):
+    if not os.path.exists(label_path):
+        return np.zeros((0, 5), dtype=np.float32)
+    rows = [[float(v) for v in line.split()] for line in open(label_path).read().strip().splitlines() if line.strip()]
+    boxes = []
+    for r in rows:
+        if len(r) > 6:
+            # Segment row (class x1 y1 x2 y2 ...): its bounding box, as ultralytics' segments2boxes
+            xy = np.array(r[1:1 + (len(r) - 1) // 2 * 2]).reshape(-1, 2)
+            (x0, y0), (x1, y1) = xy.min(axis=0), xy.max(axis=0)
+            boxes.append([r[0], (x0 + x1) / 2, (y0 + y1) / 2, x1 - x0, y1 - y0])
+        else:
+            boxes.append(r[:5])  # class x y w h
+    return np.array(boxes, dtype=np.float32).reshape(-1, 5)
+
+def pack_split(split, out_dir=SHARD_DIR, imgsz=640, shard_size=256):
+    """Decodes, letterboxes and packs one split. Returns its manifest entry."""
+    image_dir = os.path.join(SCRIPT_DIR, split, "images")
+    files = sorted(f for f in glob.glob(os.path.join(image_dir, "*")) if f.lower().endswith(IMG_EXTENSIONS))
+    if not files:
+        return None
+
+    shards = []
+    for shard_idx, start in enumerate(range(0, len(files), shard_size)):
+        chunk = files[start:start + shard_size]
+        name = f"{split}-{shard_idx:03d}"
+        images = np.lib.format.open_memmap(
+            os.path.join(out_dir, f"{name}.npy"), mode="w+", dtype=np.uint8, shape=(len(chunk), imgsz, imgsz, 3)
+        )
+        meta = np.zeros((len(chunk), 6), dtype=np.int32)
+        labels = []
+
+        for i, path in enumerate(chunk):
+            img = cv2.imread(path)  # BGR, same as the ultralytics loader
+            if img is None:
+                raise ValueError(f"Could not decode {path}")
+            images[i], content = letterbox(img, imgsz)
+            meta[i] = (*content, *img.shape[:2])
+
+            label_path = os.path.join(SCRIPT_DIR, split, "labels", os.path.splitext(os.path.basename(path))[0] + ".txt")
+            lb = read_labels(label_path)
+            labels.append(np.hstack([np.full((len(lb), 1), i, dtype=np.float32), lb]))
+
+        images.flush()
+        del images
+        np.save(os.path.join(out_dir, f"{name}.meta.npy"), meta)
+        np.save(os.path.join(out_dir, f"{name}.labels.npy"), np.concatenate(labels) if labels else np.zeros((0, 6), np.float32))
+        shards.append({
+            "images": f"{name}.npy",
+            "meta": f"{name}.meta.npy",
+            "labels": f"{name}.labels.npy",
+            "count": len(chunk),
+            "files": [os.path.relpath(p, SCRIPT_DIR) for p in chunk],
+        })
+
+    return {"count": len(files), "shards": shards}
+
+def prepare(out_dir=SHARD_DIR, imgsz=640, shard_size=256):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"imgsz": imgsz, "splits": {}}
+    for split in SPLITS:
+        start = time.perf_counter()
+        entry = pack_split(split, out_dir, imgsz, shard_size)
+        if entry:
+            manifest["splits"][split] = entry
+            print(f"📦 {split}: {entry['count']} images in {len(entry['shards'])} shard(s), {time.perf_counter() - start:.1f}s")
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Shards written to {os.path.relpath(out_dir, SCRIPT_DIR)}/")
+    return manifest
+
+# --- Reading shards back ---
+def read_manifest(shard_dir=SHARD_DIR):
+    with open(os.path.join(shard_dir, "manifest.json")) as f:
+        return json.load(f)
+
+class ShardSplit:
+    """Random access to one packed split; images stay memory-mapped."""
+    def __init__(self, split, shard_dir=SHARD_DIR):
+        manifest = read_manifest(shard_dir)
+        if split not in manifest["splits"]:
+            raise KeyError(f"Split '{split}' not found in {shard_dir}/manifest.json")
+        entry = manifest["splits"][split]
+
+        self.imgsz = manifest["imgsz"]
+        self.files, self.images, self.meta, self.labels, self.index = [], [], [], [], []
+        for s, shard in enumerate(entry["shards"]):
+            self.images.append(np.load(os.path.join(shard_dir, shard["images"]), mmap_mode="r"))
+            self.meta.append(np.load(os.path.join(shard_dir, shard["meta"])))
+            lb = np.load(os.path.join(shard_dir, shard["labels"]))
+            self.labels.append([lb[lb[:, 0] == i, 1:] for i in range(shard["count"])])
+            self.files += [os.path.join(SCRIPT_DIR, f) for f in shard["files"]]
+            self.index += [(s, i) for i in range(shard["count"])]
+
+    def __len__(self):
+        return len(self.index)
+
+    def image(self, i):
+        """Returns the resized (unpadded) BGR image plus original and resized (h, w)."""
+        s, j = self.index[i]
+        top, left, h, w, h0, w0 = self.meta[s][j]
+        return np.ascontiguousarray(self.images[s][j, top:top + h, left:left + w]), (int(h0), int(w0)), (int(h), int(w))
+
+    def label(self, i):
+        s, j = self.index[i]
+        return self.labels[s][j]
+
+    def original_shape(self, i):
+        s, j = self.index[i]
+        return int(self.meta[s][j][4]), int(self.meta[s][j][5])
+
+def shard_trainer(shard_dir=SHARD_DIR, split="train"):
+    """
+    Returns an ultralytics DetectionTrainer subclass whose training loader
+    reads images from the shards instead of decoding JPEGs.
+    Validation keeps the stock loader (valid/ is small).
+    """
+    from ultralytics.data.dataset import YOLODataset
+    from ultralytics.models.yolo.detect import DetectionTrainer
+
+    class ShardDataset(YOLODataset):
+        def __init__(self, *args, **kwargs):
+            self.shard = ShardSplit(split, shard_dir)
+            super().__init__(*args, **kwargs)
+
+        def get_img_files(self, img_path):
+            return list(self.shard.files)
+
+        def get_labels(self):
+            labels = []
+            for i, im_file in enumerate(self.shard.files):
+                lb = self.shard.label(i)
+                labels.append({
+                    "im_file": im_file,
+                    "shape": self.shard.original_shape(i),
+                    "cls": lb[:, 0:1],
+                    "bboxes": lb[:, 1:5],
+                    "segments": [],
+                    "keypoints": None,
+                    "normalized": True,
+                    "bbox_format": "xywh",
+                })
+            return labels
+
+        def load_image(self, i, rect_mode=True, resize_short=False):
+            im, hw0, hw = self.shard.image(i)
+            # Mosaic picks its partner images from this buffer
+            if self.augment:
+                self.buffer.append(i)
+                if 1 < len(self.buffer) >= self.max_buffer_length:
+                    self.buffer.pop(0)
+            return im, hw0, hw
+
+    class ShardTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode="train", batch=None):
+            if mode != "train":
+                return super().build_dataset(img_path, mode, batch)
+            packed = read_manifest(shard_dir)["imgsz"]
+            if packed != self.args.imgsz:
+                # The shards hold images letterboxed to `packed`; training at another size would rescale them
+                raise ValueError(f"Shards in {shard_dir} were packed at imgsz={packed} but training uses "
+                                 f"imgsz={self.args.imgsz}. Re-run prepare_dataset.py --imgsz {self.args.imgsz} "
+                                 f"or train with imgsz={packed}.")
+            return ShardDataset(
+                img_path=img_path,
+                imgsz=self.args.imgsz,
+                batch_size=batch,
+                augment=True,
+                hyp=self.args,
+                rect=False,
+                cache=None,
+                single_cls=self.args.single_cls or False,
+                stride=32,
+                pad=0.0,
+                prefix="train (shards): ",
+                task=self.args.task,
+                classes=self.args.classes,
+                data=self.data,
+            )
+
+    return ShardTrainer
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pack the dataset into memory-mapped training shards")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--shard-size", type=int, default=256, help="Images per shard file")
+    args = parser.parse_args()
+
+    prepare(imgsz=args.imgsz, shard_size=args.shard_size)
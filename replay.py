@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Replays recorded telemetry into the Ulinzi backend.
+
+Record a session by running the backend with ULINZI_RECORD_DIR set; every
+batch scored by /cattle/predict is written there with its verdicts (see
+backend/telemetry_log.py). This script pushes the same batches, in the same
+order, into a backend at the recorded pace (--speed 1), N times faster
+(--speed N) or back to back (--speed max). It reports detector throughput,
+alert latency and how many verdicts match the original run.
+
+Usage: python replay.py recordings/ --speed 10
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+
+import numpy as np
+import requests
+
+from backend.telemetry_log import read_batches, to_records
+from load_test import free_port, start_backend
+
+def replay(base, batches, speed=None):
+    """
+    Sends every batch and compares verdicts. speed=None means as fast as
+    possible; otherwise recorded gaps are divided by `speed`.
+    Returns one result dict per batch.
+    """
+    session = requests.Session()
+    results = []
+    t0_recorded = batches[0]["received_at"]
+    start = time.perf_counter()
+
+    for batch in batches:
+        scheduled = None
+        if speed:
+            scheduled = (batch["received_at"] - t0_recorded) / speed
+            wait = scheduled - (time.perf_counter() - start)
+            if wait > 0:
+                time.sleep(wait)
+        sent = time.perf_counter() - start
+
+        params = {k: batch[k] for k in ("region", "herd") if batch[k]}
+        t = time.perf_counter()
+        try:
+            resp = session.post(f"{base}/cattle/predict", json=to_records(batch["columns"]), params=params, timeout=60)
+            ok = resp.status_code == 200
+        except requests.RequestException:
+            resp, ok = None, False
+        latency_ms = (time.perf_counter() - t) * 1000
+
+        expected = batch["verdict"]
+        got = np.array(resp.json()) == "THREAT DETECTED" if ok else np.zeros(len(expected), dtype=bool)
+        results.append({
+            "seq": batch["seq"],
+            "ok": ok,
+            "fixes": len(expected),
+            "latency_ms": latency_ms,
+            "recorded_latency_ms": batch["latency_ms"],
+            "lag_ms": (sent - scheduled) * 1000 if scheduled is not None else 0.0,
+            "expected_threats": int(expected.sum()),
+            "threats": int(got.sum()),
+            "matching": int((got == expected).sum()),
+        })
+    return results, time.perf_counter() - start
+
+def _percentiles(values):
+    if not len(values):
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    a = np.asarray(values)
+    return {f"p{q}_ms": round(float(np.percentile(a, q)), 1) for q in (50, 95, 99)}
+
+def summarize(results, elapsed):
+    fixes = sum(r["fixes"] for r in results)
+    matching = sum(r["matching"] for r in results)
+    # Alert latency: time to a verdict for batches that raised (or should have raised) an alert
+    alerts = [r["latency_ms"] for r in results if r["threats"] or r["expected_threats"]]
+    recorded = [r["recorded_latency_ms"] for r in results if not np.isnan(r["recorded_latency_ms"])]
+    return {
+        "batches": len(results),
+        "fixes": fixes,
+        "errors": sum(not r["ok"] for r in results),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_fixes_s": round(fixes / elapsed, 1),
+        "throughput_batches_s": round(len(results) / elapsed, 2),
+        "latency": _percentiles([r["latency_ms"] for r in results]),
+        "alert_latency": _percentiles(alerts),
+        "recorded_server_latency": _percentiles(recorded),
+        "schedule_lag_p95_ms": round(float(np.percentile([r["lag_ms"] for r in results], 95)), 1),
+        "verdict_match_rate": round(matching / fixes, 4) if fixes else None,
+        "batches_matching": sum(r["matching"] == r["fixes"] for r in results),
+        "mismatches": [
+            {"seq": r["seq"], "expected_threats": r["expected_threats"], "threats": r["threats"]}
+            for r in results if r["matching"] != r["fixes"]
+        ][:20],
+    }
+
+def print_report(summary):
+    print("\n" + "=" * 72)
+    print(f"Batches: {summary['batches']}  Fixes: {summary['fixes']}  Errors: {summary['errors']}")
+    print(f"Throughput: {summary['throughput_fixes_s']:,.0f} fixes/s ({summary['throughput_batches_s']} batches/s) "
+          f"over {summary['elapsed_s']}s")
+    for name in ("latency", "alert_latency", "recorded_server_latency"):
+        p = summary[name]
+        print(f"{name:<26} p50 {p['p50_ms']} ms | p95 {p['p95_ms']} ms | p99 {p['p99_ms']} ms")
+    print(f"Schedule lag p95: {summary['schedule_lag_p95_ms']} ms")
+    print(f"Verdict match: {summary['verdict_match_rate']:.2%} of fixes, "
+          f"{summary['batches_matching']}/{summary['batches']} batches identical")
+    print("=" * 72)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay recorded telemetry into the backend")
+    parser.add_argument("recording", help="Directory written by a backend run with ULINZI_RECORD_DIR")
+    parser.add_argument("--speed", default="1", help="1 = recorded pace, N = N times faster, max = no pauses")
+    parser.add_argument("--url", default=None, help="Replay into an already running backend instead of starting one")
+    parser.add_argument("--state-dir", default=None,
+                        help="ULINZI_STATE_DIR for the started backend (default: a fresh temp dir)")
+    parser.add_argument("--output", default=None, help="Write the summary as JSON")
+    parser.add_argument("--fail-on-mismatch", action="store_true", help="Exit 1 if any verdict differs")
+    args = parser.parse_args()
+
+    batches = read_batches(args.recording)
+    if not batches:
+        print(f"⚠️ No segments found in {args.recording}")
+        sys.exit(1)
+    speed = None if args.speed == "max" else float(args.speed)
+    span = batches[-1]["received_at"] - batches[0]["received_at"]
+    print(f"📼 {len(batches)} batches, {sum(len(b['verdict']) for b in batches)} fixes, {span:.0f}s recorded")
+
+    proc = None
+    if args.url:
+        base = args.url.rstrip("/")
+    else:
+        state_dir = args.state_dir or tempfile.mkdtemp(prefix="ulinzi-replay-")
+        # Not recording the replay itself, and no background warm-up competing for CPU
+        env = {"ULINZI_STATE_DIR": state_dir, "ULINZI_RECORD_DIR": "", "ULINZI_WARMUP": "0"}
+        proc, base = start_backend(free_port(), env)
+        print(f"🚀 Backend: {base} (state: {state_dir})")
+
+    try:
+        print(f"▶️  Replaying at {'max speed' if speed is None else f'{speed:g}x'}")
+        results, elapsed = replay(base, batches, speed)
+        summary = summarize(results, elapsed)
+        print_report(summary)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(summary, f, indent=2)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    if args.fail_on_mismatch and summary["batches_matching"] != summary["batches"]:
+        sys.exit(1)
@@ -1,4 +1,5 @@
 import os
+import time
 from ultralytics import YOLO
 
 def print_deprecation_notice():
@@ -7,29 +8,72 @@ def print_deprecation_notice():
     print("This script is for training a local YOLOv8 model. The project's `detector.py` has been updated to use the Roboflow Hosted API instead. Therefore, running this training script will not affect the main detection logic.")
     print("="*80)
 
-def train_yolo():
+def train_yolo(shards=False, epochs=50, batch=16, name="train"):
     # Load the nano model (fastest for CPU/Laptop)
     model = YOLO('yolov8n.yaml').load('yolov8n.pt')
 
-    print("🚀 Starting training")
+    print(f"🚀 Starting training{' from packed shards' if shards else ''}")
     
     # Get the absolute path to the data.yaml file
     script_dir = os.path.dirname(os.path.abspath(__file__))
     data_yaml_path = os.path.join(script_dir, 'data.yaml')
 
+    # Record wall time per epoch so loaders can be compared
+    epoch_times = []
+    model.add_callback("on_train_epoch_start", lambda trainer: epoch_times.append(time.perf_counter()))
+    model.add_callback("on_train_epoch_end", lambda trainer: epoch_times.__setitem__(-1, time.perf_counter() - epoch_times[-1]))
+
+    # Shards come from prepare_dataset.py (decoded + letterboxed once, memory-mapped)
+    trainer = None
+    if shards:
+        from prepare_dataset import shard_trainer
+        trainer = shard_trainer()
+
     # Train the model
     # Ensure 'data.yaml' exists in the folder from the Roboflow download
     results = model.train(
     data=data_yaml_path,
-    batch=16,
-    epochs=50,
+    batch=batch,
+    epochs=epochs,
     imgsz=640,
-    device="cpu"
+    device="cpu",
+    trainer=trainer,
+    name=name,
+    exist_ok=True
     )
     
+    print(f"⏱️  Epoch times (s): {[round(t, 2) for t in epoch_times]}")
     print("✅ Training complete.")
-    print("⚠️  ACTION REQUIRED: Copy 'runs/detect/train/weights/best.pt' to your main folder and rename it to 'yolo_model.pt'")
+    print(f"⚠️  ACTION REQUIRED: Copy 'runs/detect/{name}/weights/best.pt' to your main folder and rename it to 'yolo_model.pt'")
+    return epoch_times
+
+def compare_loaders(epochs=2, batch=16):
+    """Trains a few epochs with each loader and reports mean epoch time."""
+    jpeg_times = train_yolo(shards=False, epochs=epochs, batch=batch, name="loader_jpeg")
+    shard_times = train_yolo(shards=True, epochs=epochs, batch=batch, name="loader_shards")
+
+    # The first epoch includes warm-up, so compare the rest when there is more than one
+    def steady(times):
+        return sum(times[1:]) / len(times[1:]) if len(times) > 1 else times[0]
+
+    print("="*80)
+    print(f"JPEG loader:   {steady(jpeg_times):.2f}s / epoch")
+    print(f"Shard loader:  {steady(shard_times):.2f}s / epoch")
+    print(f"Speed-up:      {steady(jpeg_times) / steady(shard_times):.2f}x")
+    print("="*80)
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the YOLOv8 herd detector on CPU")
+    parser.add_argument("--shards", action="store_true", help="Train from shards built by prepare_dataset.py")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--compare-loaders", action="store_true", help="Time epochs with the JPEG and shard loaders")
+    args = parser.parse_args()
+
     # print_deprecation_notice() # Commented out as the deprecation notice is no longer needed.
-    train_yolo()
+    if args.compare_loaders:
+        compare_loaders(epochs=max(2, min(args.epochs, 3)), batch=args.batch)
+    else:
+        train_yolo(shards=args.shards, epochs=args.epochs, batch=args.batch)